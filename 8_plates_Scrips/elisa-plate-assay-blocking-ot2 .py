@@ -1,4 +1,5 @@
 from opentrons import protocol_api
+from elisa_ot2.protocols import blocking
 
 #import json
 #with open('C:/Users/ferna/AppData/Roaming/Opentrons/labware/Greiner Bio-One 96 Well Plate Half-Area 175 uL.json') as labware_file:
@@ -18,10 +19,11 @@ metadata = {
 
 
 # REQUIRES
-# TIPRACK 300 ul with column 1 complete with tips in SLOT 11
+# TIPRACK 300 ul with column 1 complete with tips in SLOT 10
 # MULTI p300 PIPETTE mounted on the LEFT side OF OT-2 arm 
 # ELISA PLATES (Greiner Bio-One 96well Half-Area) in SLOTS 1-8
-# NEST 1 reservoir (195 mL) in SLOT 10 
+# NEST 1 reservoir (195 mL) in SLOT 11 
+# (the deck of auto_slots = False below, see python -m elisa_ot2.packing --plates 8 --fixed)
 # filled with blocking solution at the working dilution 
 # the protocol uses 9.6 mL for each plate (76.8 mL for 8)
 # so we need an extra volume in each reservoir to account for bed volume for pipetting and reservoir leftover (about 95 mL total is fine)
@@ -31,60 +33,28 @@ metadata = {
 # e.g. for 90 ml, mix 90 ml TBS and 4.5 g NFDM
 
 # START our opentrons protocol
-# This protocol takes about 10 minutes (last checked 3/8/2021) (Gen 2 pippete)
-
-reservoir_column = 'A1'
+# Run time: python -m elisa_ot2.benchmark "8_plates_Scrips/elisa-plate-assay-blocking-ot2 .py" (estimated for 1 to 9 plates)
+
+# PLATE LAYOUT: wells of every plate that get blocking solution, and the reservoir well it comes from
+plate_layout = """
+{"BLOCKING": ["A1:H12"]}
+"""
+reservoir_layout = """
+{"BLOCKING": ["A1"]}
+"""
+# PLATE ASSIGNMENT: with more than one blocking solution (and a reservoir with more than one well), the plates
+# that get each one, e.g. {"MILK": "1-4", "BSA": "5-8"}; None: every plate gets the one of the plate layout
+plate_assignment = None
+# SET PLATES TO RUN:----------------------------------------------------------------------------------------------------------------------------------------------------
+number_plates = 8 # more plates than fit on the deck run in deck loads, with a pause to swap them (python -m elisa_ot2.batches)
+pipette = 300
+pipette_position = "left"
+dispensevolume = 100
+one_tip = True # one tip for all the plates of a blocking solution (False: a new tip for every plate)
+auto_slots = False # plates in slots 1 to number_plates, tiprack in 10, reservoir in 11 (True: pick the deck slots of plates, tipracks and reservoir)
+log_level = 'INFO' # DEBUG: every aspiration and dispense goes to debug_log (JSON lines), INFO: one summary comment per plate
+debug_log = None # file for the DEBUG events, e.g. 'elisa-debug.jsonl' (None: they become DEBUG comments)
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------
 def run(protocol: protocol_api.ProtocolContext):
-    # LOAD tips and pipette
-    tiprack_11 = protocol.load_labware('opentrons_96_tiprack_300ul', '10')
-    pipette_multi = protocol.load_instrument('p300_multi', 'left', tip_racks=[tiprack_11])
-    # LOAD the reservoir containing the blocking solution
-    stock_reservoir = protocol.load_labware('nest_1_reservoir_195ml', '11')
-    reservoirTotalVolume = 195000 #volume in ul taken from manual
-    reservoirFill = 90000
-    depth = 25 #depth in mm taken from manual
-    aspirationHigh = reservoirFill / reservoirTotalVolume * depth
-    aspirationvolume=200
-    dispensevolume=100
-    bottomCleareance = 3
-    # LOAD our ELISA plates (8) 
-    elisa_plates=[]
-    for plate in range(1,9,1):
-        elisa_plates.append(protocol.load_labware('greinerbioone_96_wellplate_175ul', plate, label="ELISA Plate {}".format(plate)))
-
-        
-    pipette_multi.pick_up_tip()
-    aspiration_count = 0
-    aspirated = 0
-    for plate in elisa_plates:
-        aspirated = 200
-        aspirationRate = 0.2 + reservoirFill / 90000 * 0.8
-        if aspirationHigh < bottomCleareance + 0.1:
-            aspirationHigh = bottomCleareance + 0.1
-        aspiration_count += 1
-        # first time we aspirate an extra 50 ul which will be our safety / disposal volume
-        protocol.comment("DEBUG: aspirating at {}".format(aspirationHigh)+" high and at {}".format(aspirationRate)+" rate")
-        pipette_multi.aspirate(250,stock_reservoir.wells_by_name()[reservoir_column].bottom(aspirationHigh-bottomCleareance),rate=aspirationRate)
-        count = 0
-        # we keep track of how many times we dispense with each aspiration
-        # then we keep aspirating what we dispense
-        reservoirFill = reservoirFill - aspirated * 8
-        aspirationHigh = reservoirFill / reservoirTotalVolume * depth 
-        for well in range(1,13):
-            if count == aspirated/dispensevolume:
-                aspirationRate = 0.2 + reservoirFill / 90000 * 0.8
-                if aspirationHigh < bottomCleareance + 0.1:
-                    aspirationHigh = bottomCleareance + 0.1
-                protocol.comment("DEBUG: aspirating at {}".format(aspirationHigh)+" high and at {}".format(aspirationRate)+" rate")
-                pipette_multi.aspirate(aspirationvolume,stock_reservoir.wells_by_name()[reservoir_column].bottom(aspirationHigh-bottomCleareance),rate=aspirationRate)
-                aspirated = aspirationvolume
-                reservoirFill = reservoirFill - aspirated * 8
-                aspirationHigh = reservoirFill / reservoirTotalVolume * depth 
-                aspiration_count += 1
-                count = 0
-            pipette_multi.dispense(dispensevolume,plate.wells_by_name()['A{}'.format(well)])
-            count += 1
-        
-        pipette_multi.blow_out(stock_reservoir.wells_by_name()[reservoir_column]) #This should't be done after every single plate but after the end of all of theme. This is a fix for P300 pipette tips problem.
-    # dispose the tips
-    pipette_multi.drop_tip()
+    # the protocol itself is in elisa_ot2/protocols/blocking.py, shared with Multiple_Plates_Scripts
+    blocking.run(protocol, globals())
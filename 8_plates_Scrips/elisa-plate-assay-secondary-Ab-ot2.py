@@ -1,4 +1,5 @@
 from opentrons import protocol_api
+from elisa_ot2.protocols import secondary
 
 #import json
 #with open('C:/Users/ferna/AppData/Roaming/Opentrons/labware/Greiner Bio-One 96 Well Plate Half-Area 175 uL.json') as labware_file:
@@ -24,84 +25,46 @@ metadata = {
 
 
 # REQUIRES
-# TIPRACK 300 ul with column 1 complete with tips in SLOT 11
+# TIPRACK 300 ul with column 1 complete with tips in SLOT 10
 # MULTI p300 PIPETTE mounted on the LEFT side OF OT-2 arm 
 # ELISA PLATES (Greiner Bio-One 96well Half-Area) in SLOTS 1-8
-# NEST 12 reservoir (15 mL each) in SLOT 10 
-# filled with secondary antibody at the working dilution in columns 1 + 2 (10.35 mL + 10 mL) 
+# NEST 12 reservoir (15 mL each) in SLOT 11 
+# (the deck of auto_slots = False below, see python -m elisa_ot2.packing --plates 8 --fixed)
+# filled with secondary antibody at the working dilution in columns 1 + 2
 # the protocol uses 9.6 mL for plates 1-4 from column 1 of the reservoir
 # and 9.6 mL for plates 5-8 from column 2 of the reservoir
-# so we need an extra volume in each reservoir to account for bed volume for pipetting
+# plus 0.4 mL of dead volume and 0.24 mL for the disposal volume of the last plate in each column (10.24 mL per column),
+# the protocol comments the volume of each column (see also python -m elisa_ot2.loading)
 
 # JUST BEFORE RUNNING THE PROTOCOL
 # Prepare dilution of secondary antibody in TBS + 5% non-fat dry milk (NFDM)
 # e.g. for a 1:1000 dilution, mix 20 ul Secondary Antibody in 19.98 mL NFDM
 
 # START our opentrons protocol
-# This protocol takes 4 minutes (last update 17/2/2021) G1 pipette
-# This protocol takes 5 minutes (last update 4/8/2021) G2 pipette
+# Run time: python -m elisa_ot2.benchmark "8_plates_Scrips/elisa-plate-assay-secondary-Ab-ot2.py" (estimated for 1 to 9 plates)
 
-def run(protocol: protocol_api.ProtocolContext):
-    # LOAD tips and pipette
-    tiprack_11 = protocol.load_labware('opentrons_96_tiprack_300ul', '10')
-    pipette_multi = protocol.load_instrument('p300_multi', 'left', tip_racks=[tiprack_11])
-    # LOAD the reservoir containing the secondary antibody
-    stock_reservoir = protocol.load_labware('nest_12_reservoir_15ml', '11')
-
-    # LOAD our ELISA plates (8) in two sets of 4 plates each 
-    elisa_plates=[]
-    for plate in range(1,9,1):
-        elisa_plates.append(protocol.load_labware('greinerbioone_96_wellplate_175ul', plate, label="ELISA Plate {}".format(plate)))
+# SET Configuration TO RUN:----------------------------------------------------------------------------------------------------------------------------------------------------
+number_plates = 8 # more plates than fit on the deck run in deck loads, with a pause to swap them (python -m elisa_ot2.batches)
+pipette = 300
+pipette_position = "left"
+dispensevolume = 25
+one_tip = True # one tip for all the plates of a secondary Ab (False: a new tip for every plate)
+auto_slots = False # plates in slots 1 to number_plates, tiprack in 10, reservoir in 11 (True: pick the deck slots of plates, tipracks and reservoir)
+log_level = 'INFO' # DEBUG: every aspiration and dispense goes to debug_log (JSON lines), INFO: one summary comment per plate
+debug_log = None # file for the DEBUG events, e.g. 'elisa-debug.jsonl' (None: they become DEBUG comments)
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
-    # we will now iterate plates
-    # in this way, this script can be reused -- if one wishes, and without changes --
-    # to assay half the plates with one secondary antibody an the other half with another
-    # just by dispensing different secondary Abs in slots 1 & 2 of the reservoir
-    
-    reservoirTotalVolume = 15000 #volume in ul taken from manual
-    reservoirFill = 10000
-    depth = 26.86 #depth in mm taken from manual
-    aspirationHigh = reservoirFill / reservoirTotalVolume * depth 
-    
-    # plates 1-4 we use secondary Ab from A1
-    secondary_ab = 'A1'
-    pipette_multi.pick_up_tip()
-    # we keep track of how many times we dispense with each aspiration
-    
-    # then we keep aspirating what we dispense
-    aspirationvolume=100
-    dispensevolume=25
-    aspiration_count = 0
-    aspirated = 0
-    bottomCleareance = 3
-    for plate in elisa_plates:
-        count = 0
-        aspirated = 200
-        aspirationRate = 0.2 + reservoirFill / 10000 * 0.8
-        if aspirationHigh < bottomCleareance + 0.1:
-            aspirationHigh = bottomCleareance + 0.1
-        aspiration_count += 1
-        pipette_multi.aspirate(250,stock_reservoir.wells_by_name()[secondary_ab].bottom(aspirationHigh-bottomCleareance),rate=aspirationRate)
-        reservoirFill = reservoirFill - aspirated * 8
-        aspirationHigh = reservoirFill / reservoirTotalVolume * depth 
-        for well in range(1,13):
-            if count == aspirated/dispensevolume:
-                aspirationRate = 0.2 + reservoirFill / 10000 * 0.8
-                if aspirationHigh < bottomCleareance + 0.1:
-                    aspirationHigh = bottomCleareance + 0.1
-                pipette_multi.aspirate(aspirationvolume,stock_reservoir.wells_by_name()[secondary_ab].bottom(aspirationHigh-bottomCleareance),rate=aspirationRate)
-                aspirated = aspirationvolume
-                reservoirFill = reservoirFill - aspirated * 8
-                aspirationHigh = reservoirFill / reservoirTotalVolume * depth 
-                aspiration_count += 1
-                count = 0
-            pipette_multi.dispense(dispensevolume,plate.wells_by_name()['A{}'.format(well)])
-            count += 1
-        if aspiration_count == 8:
-            secondary_ab = 'A2'
-            reservoirFill = 10400
-            aspirationHigh = reservoirFill / reservoirTotalVolume * depth
-            aspirationRate = 0.2 + reservoirFill / 10000 * 0.8
-        pipette_multi.blow_out(stock_reservoir.wells_by_name()[secondary_ab])
-    # dispose the tips
-    pipette_multi.drop_tip()
+# PLATE LAYOUT: wells of every plate that get secondary antibody, and the reservoir columns it is
+# loaded in (used in order, as many as the plates need)
+plate_layout = """
+{"SECONDARY": ["A1:H12"]}
+"""
+reservoir_layout = """
+{"SECONDARY": ["A1:A12"]}
+"""
+# PLATE ASSIGNMENT: with more than one secondary Ab, the plates that get each one, e.g. {"ONE": "1-4", "TWO": "5-8"}
+# with reservoir_layout {"ONE": ["A1:A6"], "TWO": ["A7:A12"]}; None: every plate gets the secondary Ab of the plate layout
+plate_assignment = None
+def run(protocol: protocol_api.ProtocolContext):
+    # the protocol itself is in elisa_ot2/protocols/secondary.py, shared with Multiple_Plates_Scripts
+    secondary.run(protocol, globals())
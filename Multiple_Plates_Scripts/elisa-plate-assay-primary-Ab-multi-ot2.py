@@ -0,0 +1,148 @@
+from opentrons import protocol_api
+from opentrons.protocol_api import ALL, PARTIAL_COLUMN
+import math
+from elisa_ot2.columns import ROWS, column_plan, source_columns, tips_per_plate
+from elisa_ot2.layout import parse_layout, sample_index, samples_per_plate, validate
+from elisa_ot2.loading import load_source
+from elisa_ot2.packing import describe, fixed_deck, pack_deck
+
+metadata = {
+    'apiLevel' : '2.20',
+    'protocolName': 'ELISA ASSAY PREP -- PRIMARY ANTIBODY (MULTICHANNEL)',
+    'author': 'Fernan Aguero <fernan@iib.unsam.edu.ar>',
+    'source': 'Trypanosomatics Lab -- Custom Protocol'
+}
+
+# EXPLANATION
+# Same assay and plate map as elisa-plate-assay-primary-Ab-ot2.py (two sera per plate in
+# duplicate, control serum in G9:H12), but dispensed column-wise with an 8-channel pipette
+# instead of well by well with a single-channel one:
+#   * columns 1,2,5,6 (serum1) and 3,4,7,8 (serum2) are full-column dispenses (8 nozzles)
+#   * rows A-F of columns 9,10 (serum1) and 11,12 (serum2) use the 6 front nozzles
+#   * the control serum block G9:H12 uses the 2 front nozzles
+# (partial columns need API 2.20 / robot software 8.0 or newer)
+#
+# Because every nozzle aspirates from the same row of the source, each serum is loaded
+# in a whole column of a NEST 96 deep well plate instead of an eppendorf tube. Sera keep
+# the numbering of the tube rack layout of the single-channel script (plate1 = S1 + S2,
+# plate2 = S3 + S4, ...) and go in consecutive columns; the control serum goes in the
+# column after the last serum:
+# DEEP WELL PLATE            columns 01 02 03 04 05 06 07 08 09 10  11 12
+#                                    S1 S2 S3 S4 S5 S6 S7 S8 S9 S10 CS
+# (the 30 tips each plate uses and the deck space the partial columns need limit a run to 5 plates,
+# 6 with auto_slots = True)
+
+# REQUIRES
+# TIPRACK(S) 300 ul (2 for more than 3 plates)
+# MULTI p300 GEN2 PIPETTE mounted on the LEFT side OF OT-2 arm
+# ELISA PLATES (Greiner Bio-One 96well Half-Area), up to 5 (6 with auto_slots = True)
+# NEST 96 deep well 2mL plate(s) (2 for more than 5 plates)
+#   with each serum in all 8 wells of its column, at the working dilution
+# in SLOTS 1 to number_plates (plates), tipracks in SLOTS 10 and 9, deep well plate in SLOT 11 (the deck of auto_slots = False below;
+# further tipracks in the free slots from 9 down, see python -m elisa_ot2.packing --fixed)
+# the protocol comments the volume needed in each well before it starts pipetting
+
+# SET PLATES TO RUN:----------------------------------------------------------------------------------------------------------------------------------------------------
+number_plates = 5
+pipette_position = "left"
+auto_slots = False # plates in slots 1 to number_plates, tipracks in 10, 9, deep well plate in 11 (True: pick the deck slots of plates, tipracks and deep well plates)
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------
+
+dispensevolume = 25
+safeVolume = 25 # extra volume aspirated with each load, blown back into the source
+deadVolume = 50 # volume left in each deep well that the tips cannot reach
+
+# PLATE LAYOUT: same map as the single-channel script (S1, S2: the two sera of the plate, CS: control serum)
+plate_layout = """
+,1,2,3,4,5,6,7,8,9,10,11,12
+A,S1,S1,S2,S2,S1,S1,S2,S2,S1,S1,S2,S2
+B,S1,S1,S2,S2,S1,S1,S2,S2,S1,S1,S2,S2
+C,S1,S1,S2,S2,S1,S1,S2,S2,S1,S1,S2,S2
+D,S1,S1,S2,S2,S1,S1,S2,S2,S1,S1,S2,S2
+E,S1,S1,S2,S2,S1,S1,S2,S2,S1,S1,S2,S2
+F,S1,S1,S2,S2,S1,S1,S2,S2,S1,S1,S2,S2
+G,S1,S1,S2,S2,S1,S1,S2,S2,CS,CS,CS,CS
+H,S1,S1,S2,S2,S1,S1,S2,S2,CS,CS,CS,CS
+"""
+
+# START our opentrons protocol
+def run(protocol: protocol_api.ProtocolContext):
+
+    # the plate map comes from the layout, sera are numbered per plate (S1, S2) and the rest is the control
+    plate_dest_map = validate(parse_layout(plate_layout), 'greinerbioone_96_wellplate_175ul')
+    sera_per_plate = samples_per_plate(plate_dest_map)
+    # and remap it to column dispenses, grouped by the number of nozzles they need
+    plate_column_map = column_plan(plate_dest_map)
+
+    # source columns: the sera of every plate and then the control serum
+    sources = source_columns(sera_per_plate * number_plates + 1)
+    number_source_plates = sources[-1][0] + 1
+    number_tipracks = math.ceil(tips_per_plate(plate_column_map) * number_plates / 96)
+    # with a partial column layout the unused (back) nozzles pass over the slot behind the
+    # plate, so tipracks and deep well plates cannot go right behind an ELISA plate (see elisa_ot2.packing)
+    deck_plan = (pack_deck if auto_slots else fixed_deck)(number_plates, number_tipracks, number_source_plates,
+                                                         keep_behind_clear=True)
+    protocol.comment("CONTROL: {}".format(describe(deck_plan)))
+
+    # LOAD tips and pipette
+    tipracks = [protocol.load_labware('opentrons_96_tiprack_300ul', slot) for slot in deck_plan.tipracks]
+    pipette_multi = protocol.load_instrument('p300_multi_gen2', pipette_position, tip_racks=tipracks)
+    # LOAD the deep well plate(s) containing the serum samples
+    source_plates = [protocol.load_labware('nest_96_wellplate_2ml_deep', slot) for slot in deck_plan.sources]
+
+    # LOAD our ELISA plates
+    elisa_plates=[]
+    for plate, slot in enumerate(deck_plan.plates, 1):
+        elisa_plates.append(protocol.load_labware('greinerbioone_96_wellplate_175ul', slot, label="ELISA Plate {}".format(plate)))
+
+    # source column of a plate map label: serum n of the run is in the nth column, the control in the last one
+    def label_source(label, plate):
+        index = sample_index(label, plate, sera_per_plate)
+        return sources[-1] if index is None else sources[index]
+    control_source = sources[-1]
+
+    # volume each source well needs: 25 ul for each dispense that covers its row
+    def well_volume(serum, plates):
+        per_row = [sum(1 for dispenses in plate_column_map[serum].values() for dispense in dispenses
+                       if row in ROWS[ROWS.index(dispense.first_row):ROWS.index(dispense.last_row) + 1])
+                   for row in ROWS]
+        return dispensevolume * max(per_row) * plates + deadVolume
+    # what goes in the deep well plates (see python -m elisa_ot2.loading)
+    serum_volume = max(well_volume(serum, 1) for serum in plate_column_map if sample_index(serum, 1, sera_per_plate) is not None)
+    for index, source_plate in enumerate(source_plates):
+        serum_wells = ['A{}'.format(column) for plate_index, column in sources[:-1] if plate_index == index]
+        if serum_wells:  # the last deep well plate may only hold the control serum
+            load_source(protocol, source_plate, serum_wells, 'sera', serum_volume, channels=len(ROWS))
+    for serum in plate_column_map:
+        if sample_index(serum, 1, sera_per_plate) is None:
+            load_source(protocol, source_plates[control_source[0]],
+                        ['{}{}'.format(row, control_source[1]) for row in sorted(set(well[0] for well in plate_dest_map[serum]))],
+                        serum, well_volume(serum, number_plates))
+
+    def source_well(source, row):
+        return source_plates[source[0]].wells_by_name()['{}{}'.format(row, source[1])]
+
+    # we dispense each group of columns with one load of the tips, the nozzles aspirate
+    # from the same rows of the source column, and the safety volume goes back to the source
+    def dispense_columns(plate, dispenses, source):
+        nozzles = dispenses[0].nozzles
+        if nozzles == len(ROWS):
+            pipette_multi.configure_nozzle_layout(style=ALL, tip_racks=tipracks)
+        else:
+            pipette_multi.configure_nozzle_layout(style=PARTIAL_COLUMN, start='H1', end='{}1'.format(ROWS[len(ROWS) - nozzles]), tip_racks=tipracks)
+        source_column = source_well(source, dispenses[0].primary_row)
+        pipette_multi.pick_up_tip()
+        pipette_multi.aspirate(dispensevolume * len(dispenses) + safeVolume, source_column)
+        for dispense in dispenses:
+            pipette_multi.dispense(dispensevolume, plate.wells_by_name()[dispense.target])
+        pipette_multi.blow_out(source_column)
+        pipette_multi.drop_tip()
+
+    # we will now iterate platewise and within plates serumwise
+    plate_count = 1
+    for plate in elisa_plates:
+        # in layout order: the sera and then control serum in G9:H12
+        for serum in plate_column_map:
+            for dispenses in plate_column_map[serum].values():
+                dispense_columns(plate, dispenses, label_source(serum, plate_count))
+        plate_count += 1
@@ -1,5 +1,15 @@
 from opentrons import protocol_api
-import numpy as np
+import math
+from collections import OrderedDict
+from elisa_ot2.columns import split_full_columns
+from elisa_ot2.cycles import plan_fills
+from elisa_ot2.dilutions import recipe
+from elisa_ot2.geometry import EPPENDORF_1_5ML, FALCON_50ML, NEST_DEEP_WELL_2ML
+from elisa_ot2.layout import parse_table, validate
+from elisa_ot2.loading import load_source
+from elisa_ot2.runlog import RunLog
+from elisa_ot2.tips import add_tipracks, free_slots
+from elisa_ot2.tracking import TrackedSource, schedule_summary
 
 # import json
 # with open('C:/Users/ferna/AppData/Roaming/Opentrons/labware/Greiner Bio-One 96 Well Plate Half-Area 175 uL.json') as labware_file:
@@ -13,6 +23,71 @@ metadata = {
 }
 
 
+# PEPTIDE LAYOUT: one line per peptide / control, origin_stock is the eppendorf rack it is in
+# (1: slot 1, 2: slot 2, PBS: PBS only) and from its tube; to are the deep well plate wells it goes
+# in (separated by spaces) and dilution the dilution factor it uses (see SET TO RUN). Peptides that go in
+# the same wells (m1..m7) are a pool: the well gets the PBS of the whole pool once, see elisa_ot2/dilutions.py
+peptide_layout = """
+name,origin_stock,from,to,dilution
+40940,1,A1,A1,peptide
+40941,1,A2,B1,peptide
+40942,1,A3,C1,peptide
+40943,1,A4,D1,peptide
+40944,1,A5,E1,peptide
+40945,1,A6,F1,peptide
+40946,1,B1,G1,peptide
+40947,1,B2,H1,peptide
+40948,1,B3,A2,peptide
+40950,1,B4,B2,peptide
+40951,1,B5,C2,peptide
+40952,1,B6,D2,peptide
+40953,1,C1,E2,peptide
+40954,1,C2,F2,peptide
+40955,1,C3,G2,peptide
+40956,1,C4,H2,peptide
+40959,1,C5,A3,peptide
+40960,1,C6,B3,peptide
+40961,1,D1,C3,peptide
+40963,2,A1,H12,peptide
+40965,2,A2,G12,peptide
+40966,2,A3,F12,peptide
+40968,2,A4,E12,peptide
+40969,2,A5,D12,peptide
+41047,2,A6,C12,peptide
+41048,2,B1,B12,peptide
+41049,2,B2,A12,peptide
+41050,2,B3,H11,peptide
+41051,2,B4,G11,peptide
+41052,2,B5,F11,peptide
+41053,2,B6,E11,peptide
+41055,2,C2,C11,peptide
+41056,2,C3,B11,peptide
+41057,2,C4,A11,peptide
+NAG1-1A,2,C5,H10,NAG
+NAG1-2B,2,C6,G10,NAG
+NAG1-3C,2,D1,F10,NAG
+ps-tag,1,D2,D3 E10,peptide
+BSA,1,D3,E3 D10,BSA
+PS-Ag2,1,D5,G3 B10,Ag2
+Ag2-Ps,1,D6,H3 A10,Ag2
+m1,1,D4,F3 C10,M7
+m2,2,C1,F3 C10,M7
+m3,2,D2,F3 C10,M7
+m4,2,D3,F3 C10,M7
+m5,2,D4,F3 C10,M7
+m6,2,D5,F3 C10,M7
+m7,2,D6,F3 C10,M7
+PBS,PBS,PBS,D11,PBS
+"""
+
+auto_tipracks = True # load extra tipracks into free deck slots when the layout needs more tips than one rack holds
+# mixing: None mixes every well with the p1000, one tip per well; with a multichannel model (e.g. 'p300_multi_gen2')
+# the full columns of the deep well plate are mixed 8 wells at a time with it: the protocol pauses after the
+# peptides so that it can be swapped in for the p20 on the right mount (tips: a 300ul tiprack in a free slot)
+mixing_pipette = None
+log_level = 'INFO' # DEBUG: every PBS fill, peptide and mix goes to debug_log (JSON lines), INFO: one summary comment
+debug_log = None # file for the DEBUG events, e.g. 'elisa-debug.jsonl' (None: they become DEBUG comments)
+
 #dil: 1:250
 #vol final: 600
 #10 ul peptido + 590 ul PBS
@@ -25,10 +100,12 @@ def run(protocol: protocol_api.ProtocolContext):
     dilution_M7 = 825 #cada pept termina en una dilución de 1 en 825
     dilution_NAG = 100 
     dilution_Ag2 = 160
+    dilution_factors = {'peptide': dilution_peptide, 'BSA': dilution_BSA, 'M7': dilution_M7, 'NAG': dilution_NAG, 'Ag2': dilution_Ag2}
 
 
     #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------
     
+    log = RunLog(protocol, log_level, debug_log)
     # LOAD tips and pipette
     tiprack_grande = protocol.load_labware('opentrons_96_tiprack_1000ul', '10')
     tiprack_chico = protocol.load_labware('opentrons_96_tiprack_20ul', '7')
@@ -40,154 +117,109 @@ def run(protocol: protocol_api.ProtocolContext):
     pbs_stock = protocol.load_labware('opentrons_6_tuberack_falcon_50ml_conical','3')
     
     
-    peptide_control_map = {
-        '40940':   {'origin_stock':'1','from' :'A1','to' : {'A1'},'dilution':'peptide'},
-        '40941':   {'origin_stock':'1','from' :'A2','to' : {'B1'},'dilution':'peptide'},
-        '40942':  {'origin_stock':'1','from' :'A3','to' : {'C1'},'dilution':'peptide'},
-        '40943':  {'origin_stock':'1','from' :'A4','to' : {'D1'},'dilution':'peptide'},
-        '40944':  {'origin_stock':'1','from' :'A5','to' : {'E1'},'dilution':'peptide'},
-        '40945':   {'origin_stock':'1','from' :'A6','to' : {'F1'},'dilution':'peptide'},
-        '40946':   {'origin_stock':'1','from' :'B1','to' : {'G1'},'dilution':'peptide'},
-        '40947':   {'origin_stock':'1','from' :'B2','to' : {'H1'},'dilution':'peptide'},
-        '40948':   {'origin_stock':'1','from' :'B3','to' : {'A2'},'dilution':'peptide'},
-        '40950':  {'origin_stock':'1','from' :'B4','to' : {'B2'},'dilution':'peptide'},
-        '40951':  {'origin_stock':'1','from' :'B5','to' : {'C2'},'dilution':'peptide'},
-        '40952':  {'origin_stock':'1','from' :'B6','to' : {'D2'},'dilution':'peptide'},
-        '40953':  {'origin_stock':'1','from' :'C1','to' : {'E2'},'dilution':'peptide'},
-        '40954':  {'origin_stock':'1','from' :'C2','to' : {'F2'},'dilution':'peptide'},
-        '40955':  {'origin_stock':'1','from' :'C3','to' : {'G2'},'dilution':'peptide'},
-        '40956':  {'origin_stock':'1','from' :'C4','to' : {'H2'},'dilution':'peptide'},
-        '40959':  {'origin_stock':'1','from' :'C5','to' : {'A3'},'dilution':'peptide'},
-        '40960':  {'origin_stock':'1','from' :'C6','to' : {'B3'},'dilution':'peptide'},
-        '40961':  {'origin_stock':'1','from' :'D1','to' : {'C3'},'dilution':'peptide'},
-        '40963':   {'origin_stock':'2','from' :'A1','to' : {'H12'},'dilution':'peptide'},
-        '40965':   {'origin_stock':'2','from' :'A2','to' : {'G12'},'dilution':'peptide'},
-        '40966':  {'origin_stock':'2','from' :'A3','to' : {'F12'},'dilution':'peptide'},
-        '40968':  {'origin_stock':'2','from' :'A4','to' : {'E12'},'dilution':'peptide'},
-        '40969':  {'origin_stock':'2','from' :'A5','to' : {'D12'},'dilution':'peptide'},
-        '41047':   {'origin_stock':'2','from' :'A6','to' : {'C12'},'dilution':'peptide'},
-        '41048':   {'origin_stock':'2','from' :'B1','to' : {'B12'},'dilution':'peptide'},
-        '41049':   {'origin_stock':'2','from' :'B2','to' : {'A12'},'dilution':'peptide'},
-        '41050':   {'origin_stock':'2','from' :'B3','to' : {'H11'},'dilution':'peptide'},
-        '41051':  {'origin_stock':'2','from' :'B4','to' : {'G11'},'dilution':'peptide'},
-        '41052':  {'origin_stock':'2','from' :'B5','to' : {'F11'},'dilution':'peptide'},
-        '41053':  {'origin_stock':'2','from' :'B6','to' : {'E11'},'dilution':'peptide'},
-        '41055':  {'origin_stock':'2','from' :'C2','to' : {'C11'},'dilution':'peptide'},
-        '41056':  {'origin_stock':'2','from' :'C3','to' : {'B11'},'dilution':'peptide'},
-        '41057':  {'origin_stock':'2','from' :'C4','to' : {'A11'},'dilution':'peptide'},
-        'NAG1-1A':  {'origin_stock':'2','from' :'C5','to' : {'H10'},'dilution':'NAG'},
-        'NAG1-2B':  {'origin_stock':'2','from' :'C6','to' : {'G10'},'dilution':'NAG'},
-        'NAG1-3C':  {'origin_stock':'2','from' :'D1','to' : {'F10'},'dilution':'NAG'},
-        'ps-tag':   {'origin_stock':'1','from' :'D2','to' : {'D3','E10'},'dilution':'peptide'},
-        'BSA':   {'origin_stock':'1','from' :'D3','to' : {'E3','D10'},'dilution':'BSA'},
-        'PS-Ag2':   {'origin_stock':'1','from' :'D5','to' : {'G3','B10'},'dilution':'Ag2'},
-        'Ag2-Ps':   {'origin_stock':'1','from' :'D6','to' : {'H3','A10'},'dilution':'Ag2'},
-        'm1':   {'origin_stock':'1','from' :'D4','to' : {'F3','C10'},'dilution':'M7'},
-        'm2':   {'origin_stock':'2','from' :'C1','to' : {'F3','C10'},'dilution':'M7'},
-        'm3':   {'origin_stock':'2','from' :'D2','to' : {'F3','C10'},'dilution':'M7'},
-        'm4':   {'origin_stock':'2','from' :'D3','to' : {'F3','C10'},'dilution':'M7'},
-        'm5':   {'origin_stock':'2','from' :'D4','to' : {'F3','C10'},'dilution':'M7'},
-        'm6':   {'origin_stock':'2','from' :'D5','to' : {'F3','C10'},'dilution':'M7'},
-        'm7':   {'origin_stock':'2','from' :'D6','to' : {'F3','C10'},'dilution':'M7'},
-        'PBS':   {'origin_stock':'PBS','from' :'PBS','to' : {'D11'},'dilution':'PBS'}
-    }
+    # peptides and controls come from the layout table above (validated against the racks and the deep well plate)
+    peptide_rows = parse_table(peptide_layout)
+    for row in peptide_rows:
+        validate(row['to'].split(), peptide_plate)
+        if row['origin_stock'] != 'PBS':
+            validate([row['from']], peptide_stock_plate_impares if row['origin_stock'] == '1' else peptide_stock_plate_pares)
     
 
     pbs_stocks = ["A1", "A2", "A3","B1", "B2", "B3"]
     
     reservoirTotalVolume_PBS = 50000
-    reservoirFill_PBS = reservoirTotalVolume_PBS
-    depth_PBS = 120.30
     pbs_deadVolume = 600
-    # peptide_deadVolume = 1
     
     bottom_clearance_Eppendorfs = 1.2
     bottom_cleareance_DeepWell = 8
     bottomCleareance_PBS = 8
+    # the mixes draw 900 ul out of the wells: the tips stay 3 mm under the level that leaves (was 21 mm, above it)
+    mix_height = NEST_DEEP_WELL_2ML.height(vol_final - 900) - 3
     
     pbsStock_initialVolume = reservoirTotalVolume_PBS
     # peptide_initialVolume = vol_final / dilution
+    # the PBS falcons keep track of their remaining volume and aspiration height, we go on with the next one when one runs low
+    pbs_source = TrackedSource([pbs_stock.wells_by_name()[well] for well in pbs_stocks], pbsStock_initialVolume,
+                               FALCON_50ML.height, immersion_depth=bottomCleareance_PBS,
+                               min_clearance=0.1, reserve=pbs_deadVolume)
     
     
+    # every stock and PBS volume of every well, computed (and checked) once before the robot moves
+    dilution_recipe = recipe(peptide_rows, dilution_factors, vol_final, min_volume=pipette_single_20.min_volume,
+                             max_volume=peptide_plate.wells()[0].max_volume)
+    destinations = [well.well for well in dilution_recipe.wells]
+    # full columns are mixed with the multichannel (if we have one), the other wells with the p1000
+    mix_columns, mix_wells = split_full_columns(destinations) if mixing_pipette else ([], destinations)
+    # tips: one 1000 for the PBS and one per well we mix with it, one 20 per peptide (see python -m elisa_ot2.tips)
+    if auto_tipracks:
+        peptides = len(dilution_recipe.components)
+        for pipette, tips, name in ((pipette_single_1000, 1 + len(mix_wells), '1000ul'), (pipette_single_20, peptides, '20ul')):
+            for slot in add_tipracks(protocol, pipette, tips):
+                protocol.comment("CONTROL: extra TIPRACK {} in slot {}".format(name, slot))
+
+    #primero transferimos el PBS (antes de mover el robot planeamos de qué falcon y a qué altura aspiramos)
+    # one fill per well (pools included) and as few trips to the falcons as the tip allows:
+    # every aspiration fills as many wells as it can, a well that does not fit is finished with the next one
+    pbs_cycles = plan_fills(pipette_single_1000, [(peptide_plate.wells_by_name()[well.well], well.diluent)
+                                                  for well in dilution_recipe.wells if well.diluent > 0])
+    pbs_schedule = pbs_source.plan(pbs_cycles.volumes())
+
+    # what goes in the falcons and the eppendorfs (see python -m elisa_ot2.loading): full falcons up to the last one
+    # we aspirate from, and what we take from each peptide tube plus what stays below the tip
+    load_source(protocol, pbs_stock, pbs_stocks[:pbs_source.index + 1], 'PBS', pbsStock_initialVolume)
+    peptide_deadVolume = EPPENDORF_1_5ML.volume(pipette_single_20.well_bottom_clearance.aspirate)
+    peptide_tubes = OrderedDict()
+    for component in dilution_recipe.components:
+        needed = component.volume * len(component.destinations) + peptide_deadVolume
+        peptide_tubes.setdefault((component.stock, math.ceil(needed)), []).append(component.source)
+    for (stock, needed), tubes in peptide_tubes.items():
+        load_source(protocol, peptide_stock_plate_impares if stock == '1' else peptide_stock_plate_pares, tubes, 'peptides', needed)
+    log.debug('schedules', summary='PBS {}'.format(schedule_summary(pbs_schedule)))
+    for well in dilution_recipe.wells:
+        if well.pooled:
+            log.debug('pools', well=well.well, components=well.components, diluent=well.diluent)
+
     pipette_single_1000.pick_up_tip()
-    
-    #primero transferimos el PBS
-    for peptide in peptide_control_map:
-        if peptide_control_map[peptide]['dilution'] == 'peptide':
-            dilution = dilution_peptide
-            volume_to_transfer = vol_final - 1/dilution * vol_final
-        elif peptide_control_map[peptide]['dilution'] == 'BSA':
-            dilution = dilution_BSA
-            volume_to_transfer = vol_final - 1/dilution * vol_final 
-        elif peptide_control_map[peptide]['dilution'] == 'M7':
-            dilution = dilution_M7
-            volume_to_transfer = (vol_final - 7/dilution * vol_final)/7 #porque son 7 péptidos
-        elif peptide_control_map[peptide]['dilution'] == 'Ag2':
-            dilution = dilution_Ag2
-            volume_to_transfer = vol_final - 1/dilution * vol_final
-        elif peptide_control_map[peptide]['dilution'] == 'NAG':
-            dilution = dilution_Ag2
-            volume_to_transfer = vol_final - 1/dilution * vol_final
-        elif peptide_control_map[peptide]['dilution'] == 'PBS':
-            volume_to_transfer = vol_final
-        for destiny in peptide_control_map[peptide]['to']:    
-            protocol.comment("DEBUG: peptide = {}".format(peptide))
-            protocol.comment("DEBUG: pbsRemain = {}".format(reservoirFill_PBS))
-            aspirationHigh = reservoirFill_PBS / reservoirTotalVolume_PBS * depth_PBS 
-            protocol.comment("DEBUG: pbsHigh = {}".format(aspirationHigh))
-            if aspirationHigh < bottomCleareance_PBS + 0.1:
-                aspirationHigh = bottomCleareance_PBS + 0.1
-            reservoirFill_PBS = reservoirFill_PBS - volume_to_transfer
-            pipette_single_1000.transfer(volume_to_transfer, pbs_stock.wells_by_name()[pbs_stocks[0]].bottom(aspirationHigh-bottomCleareance_PBS), peptide_plate.wells_by_name()[destiny].top(),new_tip='never')
-            pipette_single_1000.blow_out(peptide_plate.wells_by_name()[destiny].top())
-            if reservoirFill_PBS < volume_to_transfer + pbs_deadVolume:
-                pbs_stocks.pop(0)
-                reservoirFill_PBS = pbsStock_initialVolume
+    for cycle, aspiration in zip(pbs_cycles.cycles, pbs_schedule):
+        pipette_single_1000.aspirate(aspiration.volume, aspiration.location())
+        log.debug('PBS aspirations', well=aspiration.well.well_name, volume=aspiration.volume, clearance=aspiration.clearance)
+        for well, volume in cycle.dispenses:
+            pipette_single_1000.dispense(volume, well.top())
+            log.debug('PBS fills', well=well.well_name, volume=volume)
+    # the disposal volume goes back to the falcon
+    pipette_single_1000.blow_out(pbs_schedule[-1].well)
 
     pipette_single_1000.drop_tip()
     
     #ahora ponemos los péptidos
-    for peptide in peptide_control_map:
-        if peptide_control_map[peptide]['origin_stock'] == '1':
+    for component in dilution_recipe.components:
+        if component.stock == '1':
             peptide_origin = peptide_stock_plate_impares
-        if peptide_control_map[peptide]['origin_stock'] == '2':
+        if component.stock == '2':
             peptide_origin = peptide_stock_plate_pares
-        if peptide_control_map[peptide]['dilution'] == 'peptide':
-            dilution = dilution_peptide
-        elif peptide_control_map[peptide]['dilution'] == 'BSA':
-            dilution = dilution_BSA
-        elif peptide_control_map[peptide]['dilution'] == 'M7':
-            dilution = dilution_M7
-        elif peptide_control_map[peptide]['dilution'] == 'Ag2':
-            dilution = dilution_Ag2
-        elif peptide_control_map[peptide]['dilution'] == 'NAG':
-            dilution = dilution_NAG
-        elif peptide_control_map[peptide]['dilution'] == 'PBS':
-            protocol.comment("DEBUG: peptide = {}".format(peptide))
-            continue
         pipette_single_20.pick_up_tip()
-        for destiny in peptide_control_map[peptide]['to']:    
-            protocol.comment("DEBUG: peptide = {}".format(peptide))
-            pipette_single_20.transfer((vol_final/dilution),peptide_origin.wells_by_name()[peptide_control_map[peptide]['from']], peptide_plate.wells_by_name()[destiny],new_tip='never',mix_after = (3,20))
+        for destiny in component.destinations:
+            log.debug('peptides', peptide=component.name, well=destiny, volume=component.volume)
+            pipette_single_20.transfer(component.volume,peptide_origin.wells_by_name()[component.source], peptide_plate.wells_by_name()[destiny],new_tip='never',mix_after = (3,20))
         pipette_single_20.drop_tip() 
     
-    #Busco los pocillos del deepwell usados
-    destinations = []
-    for peptide in peptide_control_map:
-        # peptide = "PS-Ag2"
-        # peptide = "40969"
-        temp_destination = peptide_control_map[peptide]['to']
-        if isinstance(temp_destination, str):
-            destinations.append(temp_destination)
-        else:
-            destinations.extend(temp_destination)
-        
-    destinations = list(dict.fromkeys(destinations))
     #ahora mixeamos todo
-    for well in destinations:
-        protocol.comment("DEBUG: peptide = {}".format(well))
+    if mix_columns:
+        # the same 3 x 900 ul of mixing, in as many strokes as the multichannel needs
+        protocol.pause("Replace the p20 on the right mount with a {} to mix columns {}".format(
+            mixing_pipette, ', '.join(str(column) for column in mix_columns)))
+        tiprack_multi = protocol.load_labware('opentrons_96_tiprack_300ul', free_slots(protocol)[0])
+        pipette_multi = protocol.load_instrument(mixing_pipette, 'right', tip_racks=[tiprack_multi], replace=True)
+        mix_volume = min(900, pipette_multi.max_volume)
+        for column in mix_columns:
+            log.debug('column mixes', column=column)
+            pipette_multi.pick_up_tip()
+            pipette_multi.mix(math.ceil(3 * 900 / mix_volume), mix_volume, peptide_plate.wells_by_name()['A{}'.format(column)].bottom(mix_height))
+            pipette_multi.drop_tip()
+    for well in mix_wells:
+        log.debug('well mixes', well=well)
         pipette_single_1000.pick_up_tip()
-        pipette_single_1000.mix(3,900, peptide_plate.wells_by_name()[well].bottom(21))
-        pipette_single_1000.drop_tip()  
-    
-
+        pipette_single_1000.mix(3,900, peptide_plate.wells_by_name()[well].bottom(mix_height))
+        pipette_single_1000.drop_tip()
+    # one plate: a single summary of the whole run
+    log.plate_done(None)
@@ -1,4 +1,5 @@
 from opentrons import protocol_api
+from elisa_ot2.protocols import prep
 
 #import json
 #with open('C:/Users/ferna/AppData/Roaming/Opentrons/labware/Greiner Bio-One 96 Well Plate Half-Area 175 uL.json') as labware_file:
@@ -26,10 +27,12 @@ metadata = {
 # Destination Plate:   01 02 03 04 05 06 07 08 09 10 11 12 
 
 # REQUIRES
-# TIPRACK 300 ul with 3 complete columns with tips in SLOT 11
+# TIPRACK 300 ul with 3 complete columns with tips
 # MULTI p300 PIPETTE mounted on the LEFT side OF OT-2 arm 
-# ELISA PLATES (Greiner Bio-One 96well Half-Area) in SLOTS 1-8
-# NEST 96 deep well 2mL plate in SLOT 10 
+# ELISA PLATES (Greiner Bio-One 96well Half-Area)
+# NEST 96 deep well 2mL plate
+# in SLOTS 1 to number_plates (plates), tiprack in SLOT 10, deep well plate in SLOT 11 (the deck of auto_slots = False below;
+# further tipracks in the free slots from 9 down, see python -m elisa_ot2.packing --fixed)
 #   with wells in columns 1-3 containing 1mL antigen at the working dilution (24 antigens)
 # the protocol will replicate each antigen 4 times in each plate as per the map above
 
@@ -37,87 +40,29 @@ metadata = {
 # Prepare dilution of antigens in binding buffer at the desired concentration
 # and place 1mL of each antigen in wells A1 through H3 (3 columns, 24 wells)
 
-#This protocol takes about 5 minutes
-# START our opentrons protocol
-def run(protocol: protocol_api.ProtocolContext):
-
-    # SET PLATES TO RUN:----------------------------------------------------------------------------------------------------------------------------------------------------
-    number_plates = 8
-    pipette = 50
-    pipette_position = "left"
-    #-----------------------------------------------------------------------------------------------------------------------------------------------------------------------
-    
-    # LOAD tips and pipette
-    tiprack_11 = protocol.load_labware('opentrons_96_tiprack_300ul', '10')
+# SET PLATES TO RUN:----------------------------------------------------------------------------------------------------------------------------------------------------
+number_plates = 8 # more plates than fit on the deck run in deck loads, with a pause to swap them (python -m elisa_ot2.batches)
+pipette = 50
+pipette_position = "left"
+dispensevolume = 25 # ul of antigen in every well
+mix_stock = True # mix each antigen column 5 x 50 ul before its first aspiration (False: no mix, about 12 s less for 8 plates)
+auto_tipracks = True # load extra tipracks into free deck slots when the run needs more tips than one rack holds
+auto_slots = False # plates in slots 1 to number_plates, tiprack in 10, source in 11 (True: pick the deck slots of plates, tipracks and source)
+log_level = 'INFO' # DEBUG: every aspiration and dispense goes to debug_log (JSON lines), INFO: one summary comment per plate
+debug_log = None # file for the DEBUG events, e.g. 'elisa-debug.jsonl' (None: they become DEBUG comments)
+#-----------------------------------------------------------------------------------------------------------------------------------------------------------------------
 
-    if (pipette == 50):
-        pipette_multi = protocol.load_instrument('p50_multi', pipette_position, tip_racks=[tiprack_11])
-    if (pipette == 300):
-        pipette_multi = protocol.load_instrument('p300_multi', pipette_position, tip_racks=[tiprack_11])
-    # LOAD the stock plate containing antigens
-    stock_plate = protocol.load_labware('nest_96_wellplate_2ml_deep', '11')
-    # maybe also try usascientific_96_wellplate_2.4ml_deep
-    depth = 42
-    deadVolume = 200
-    reservoirTotalVolume = 2000
-    reservoirInitialFill = deadVolume + 4 * 25 * number_plates
-    protocol.comment("CONTROL: Reservoir NEST 96 Deep well 1-3 containing: {}".format(reservoirInitialFill)+"ul")
-    reservoirFill = reservoirInitialFill
-    aspirationHigh = reservoirFill / reservoirTotalVolume * depth
-    bottomCleareance = 8
-    # LOAD our ELISA plates 
-    elisa_plates=[]
-    for plate in range(1,(number_plates+1),1):
-        elisa_plates.append(protocol.load_labware('greinerbioone_96_wellplate_175ul', plate, label="ELISA Plate {}".format(plate)))
+# PLATE LAYOUT (the map above): antigen column of the stock plate that goes in each well of the ELISA plates
+plate_layout = """
+{"Ag1": ["A1:H4"], "Ag2": ["A5:H8"], "Ag3": ["A9:H12"]}
+"""
+# STOCK LAYOUT: the multichannel aspirates each antigen column from its row A well
+stock_layout = """
+{"Ag1": ["A1"], "Ag2": ["A2"], "Ag3": ["A3"]}
+"""
 
-
-    # DEFINE our three blocks of destination columns as per our map above
-    dest_columns = [ ["1", "2", "3", "4"], ['5', '6', '7', '8'], ['9', '10', '11', '12'] ]
-    # we will now iterate blockwise so as to use a single tip for all replicates
-    # of the same antigen
-    block_count=1
-    for destination in dest_columns:
-        if (pipette == 50):
-            aspirationvolume=25
-            aspirated = 25
-            safeVolume = 25
-        if (pipette == 300):
-            aspirationvolume=200
-            aspirated = 200
-            safeVolume = 50
-        aspirationRate = 0.2 + reservoirFill / reservoirTotalVolume * 0.8
-        if aspirationHigh < bottomCleareance + 0.1:
-            aspirationHigh = bottomCleareance + 0.1
-        protocol.comment("DEBUG: aspirating at {}".format(aspirationHigh)+" high and at {}".format(aspirationRate)+" rate")
-        source_column = stock_plate.wells_by_name()['A{}'.format(block_count)]
-        pipette_multi.pick_up_tip()
-        # first time we aspirate an extra 50 ul which will be our safety / disposal volume
-        pipette_multi.mix(5,50,source_column.bottom(aspirationHigh-bottomCleareance))
-        pipette_multi.aspirate(aspirationvolume+safeVolume, source_column.bottom(aspirationHigh-bottomCleareance),rate=aspirationRate)
-        # then we keep aspirating what we dispense
-        dispensevolume=25
-        reservoirFill = reservoirFill - aspirated - safeVolume
-        aspirationHigh = reservoirFill / reservoirTotalVolume * depth 
-        count=0
-        for plate in elisa_plates:
-            for col in destination:
-                if count == aspirated/dispensevolume:
-                    aspirationRate = 0.2 + reservoirFill / reservoirTotalVolume * 0.8
-                    if aspirationHigh < bottomCleareance + 0.1:
-                        aspirationHigh = bottomCleareance + 0.1
-                    protocol.comment("DEBUG: aspirating at {}".format(aspirationHigh)+" high and at {}".format(aspirationRate)+" rate")
-                    pipette_multi.aspirate(aspirationvolume, source_column.bottom(aspirationHigh-bottomCleareance),rate=aspirationRate)
-                    aspirated = aspirationvolume
-                    reservoirFill = reservoirFill - aspirated
-                    aspirationHigh = reservoirFill / reservoirTotalVolume * depth 
-                    count = 0
-                pipette_multi.dispense(dispensevolume, plate.wells_by_name()['A{}'.format(col)], rate=1.0)
-                count += 1
-        # when we finish this block we blow out the safety volume back to the source
-        pipette_multi.blow_out(source_column)
-        # dispose the tips
-        pipette_multi.drop_tip()
-        # and start a new block
-        block_count += 1
-        reservoirFill = reservoirInitialFill
-        aspirationHigh = reservoirFill / reservoirTotalVolume * depth 
+# Run time: python -m elisa_ot2.benchmark "Multiple_Plates_Scripts/elisa-plate-prep-ot2.py" (estimated for 1 to 9 plates)
+# START our opentrons protocol
+def run(protocol: protocol_api.ProtocolContext):
+    # the protocol itself is in elisa_ot2/protocols/prep.py, shared with 8_plates_Scrips
+    prep.run(protocol, globals())
@@ -0,0 +1,9 @@
+"""Shared helpers for the Trypanosomatics Lab ELISA protocols for the Opentrons OT-2.
+
+The protocol scripts themselves live in ``Multiple_Plates_Scripts`` and
+``8_plates_Scrips``; this package holds the code that is shared between
+them and the offline tooling (run-time estimation, planning) that we use
+before sending a protocol to the robot. The body of the prep, blocking,
+secondary and primary antibody protocols is in ``protocols``, the
+scripts of both folders call it with their settings.
+"""
@@ -0,0 +1,137 @@
+"""Batches: runs of more plates than the deck holds, in deck loads.
+
+A screening day of 24 plates used to take three runs of each script,
+with number_plates and the serum numbers of the tube layout edited by
+hand for each one. The prep, blocking, secondary and primary antibody
+protocols (see ``protocols``) now take any number_plates: ``plan_batch``
+splits the plates into as few deck loads as fit next to the tipracks and
+sources of the run (``packing``), of even size (24 plates: 3 loads of 8,
+not 9 + 9 + 6). The plates of every load go in the same slots
+(``load_plates``), and between two loads the run pauses for the operator
+to swap them (``Batch.swap``). The tips and the volumes left in the
+sources carry over: the sources only get what the next load takes on
+top of what is left in them (``TrackedSource.refill``), and the CONTROL
+lines before the pause say how much. With number_plates that fit on the
+deck a run is a single load, as before. To see the loads of a run:
+
+    python -m elisa_ot2.batches --plates 24
+    python -m elisa_ot2.batches --plates 24 Multiple_Plates_Scripts/elisa-plate-assay-primary-Ab-ot2.py
+"""
+import argparse
+import sys
+from collections import namedtuple
+
+from .packing import fixed_deck, pack_deck
+
+SHARED_PROTOCOLS = ('prep', 'blocking', 'secondary', 'primary')
+
+
+def even_loads(plates, loads):
+    "Plate numbers (1-based) of each of loads deck loads of plates, the first loads one plate larger"
+    size, larger = divmod(plates, loads)
+    numbers, start = [], 1
+    for load in range(loads):
+        end = start + size + (1 if load < larger else 0)
+        numbers.append(list(range(start, end)))
+        start = end
+    return numbers
+
+
+def plate_range(numbers):
+    "Plate numbers as text: 1-8, or 1, 3, 5"
+    if len(numbers) > 1 and numbers == list(range(numbers[0], numbers[-1] + 1)):
+        return '{}-{}'.format(numbers[0], numbers[-1])
+    return ', '.join(str(number) for number in numbers)
+
+
+class Batch(namedtuple('Batch', ['deck', 'loads'])):
+    "The DeckPlan of a deck load (the slots of its plates) and the plate numbers of each load"
+
+    def describe(self):
+        "One line with the deck loads, for a CONTROL comment"
+        return '{} plates in {} deck loads: plates {}'.format(
+            sum(len(load) for load in self.loads), len(self.loads), '; '.join(plate_range(load) for load in self.loads))
+
+    def swap(self, protocol, index):
+        "Pause before deck load index (0-based) for the operator to put its plates in the slots of the previous load"
+        previous, load = self.loads[index - 1], self.loads[index]
+        if hasattr(protocol, 'record_swap'):
+            protocol.record_swap(self.deck.plates)
+        protocol.pause('DECK LOAD {} of {}: replace plates {} by plates {} ({}), fill the sources as the CONTROL lines '
+                       'above say, then resume'.format(
+                           index + 1, len(self.loads), plate_range(previous), plate_range(load),
+                           ', '.join('plate {} in slot {}'.format(number, slot) for number, slot in zip(load, self.deck.plates))))
+
+
+def plan_batch(number_plates, tipracks, sources=1, auto_slots=True, keep_behind_clear=False, max_plates=None):
+    """The Batch of a run: its plates in the fewest deck loads that fit on the deck.
+
+    tipracks: function of the plate numbers of each load (a list of
+    lists) that gives the tipracks the run needs, as their tips carry
+    over from load to load. max_plates: most plates of a load (e.g. the
+    plates the sera of a tube rack are for). auto_slots and
+    keep_behind_clear as in packing; raises ValueError when not even one
+    plate fits.
+    """
+    pack = pack_deck if auto_slots else fixed_deck
+    error = None
+    for count in range(1, number_plates + 1):
+        loads = even_loads(number_plates, count)
+        if max_plates and len(loads[0]) > max_plates:
+            continue
+        try:
+            return Batch(pack(len(loads[0]), tipracks(loads), sources, keep_behind_clear), loads)
+        except ValueError as no_room:
+            error = no_room
+    raise error
+
+
+def load_plates(protocol, batch, load_name='greinerbioone_96_wellplate_175ul'):
+    """The ELISA plates of a run, plate 1 first: the plates of all loads that go in a slot share its labware.
+
+    A plate is labelled with the plate numbers of its slot, e.g. ELISA Plate 1/9/17.
+    """
+    labware = []
+    for index, slot in enumerate(batch.deck.plates):
+        numbers = [str(load[index]) for load in batch.loads if index < len(load)]
+        labware.append(protocol.load_labware(load_name, slot, label='ELISA Plate {}'.format('/'.join(numbers))))
+    return [labware[load.index(number)] for load in batch.loads for number in load]
+
+
+def main(argv=None):
+    # the protocols import this module on the robot, which needs neither the benchmark nor the stand-in simulator
+    from .benchmark import default_scripts, script_key
+    from .simulation import load_protocol, run_protocol
+
+    parser = argparse.ArgumentParser(description='Deck loads of a run of more plates than the deck holds')
+    parser.add_argument('scripts', nargs='*', help='protocol scripts (default: the prep, blocking, secondary and primary antibody scripts)')
+    parser.add_argument('--plates', type=int, default=24, help='number_plates of the run')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    scripts = args.scripts or [path for path in default_scripts()
+                               if any(hasattr(load_protocol(path), name) for name in SHARED_PROTOCOLS)]
+    for path in scripts:
+        print(script_key(path))
+        try:
+            ctx = run_protocol(path, number_plates=args.plates)
+        except Exception as error:  # same as the benchmark: a script that cannot run n plates is a result
+            print('  {}: {}'.format(type(error).__name__, error))
+            failed += 1
+            continue
+        # the steps of each load end at the pause before the next one
+        minutes = [0.0]
+        for step in ctx.steps:
+            if step.kind == 'pause':
+                minutes.append(0.0)
+            minutes[-1] += step.seconds / 60
+        slots = [comment for comment in ctx.comments if comment.startswith('CONTROL: ELISA')]
+        print('  {}'.format(slots[0][len('CONTROL: '):] if slots else ''))
+        print('  {} deck loads, {:.1f} min in all ({} min), {} tips'.format(
+            len(minutes), sum(minutes), ' + '.join('{:.1f}'.format(load_minutes) for load_minutes in minutes), ctx.tips_used()))
+        print()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Run-time estimates and throughput benchmark for the protocol scripts.
+
+Every script is run against the recording stand-in of ``simulation`` for
+``number_plates`` = 1..9 (scripts without that setting are run once) and
+the predicted wall-clock minutes, plates per hour and slowest steps are
+reported. With ``--baseline`` the estimates are compared against a
+stored baseline and the command exits with status 1 when any script got
+slower than the tolerance allows, so it can run in CI:
+
+    python -m elisa_ot2.benchmark
+    python -m elisa_ot2.benchmark --baseline benchmarks/runtime-baseline.json
+    python -m elisa_ot2.benchmark --write-baseline benchmarks/runtime-baseline.json
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+from collections import defaultdict
+
+from .simulation import load_protocol, run_protocol
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT_DIRS = ['Multiple_Plates_Scripts', '8_plates_Scrips']
+PLATE_RANGE = range(1, 10)
+
+
+def default_scripts():
+    scripts = []
+    for directory in SCRIPT_DIRS:
+        scripts.extend(sorted(glob.glob(os.path.join(REPO_ROOT, directory, '*.py'))))
+    return scripts
+
+
+def script_key(path):
+    "Stable, repo-relative name of a script, used as key in the baseline"
+    return os.path.relpath(os.path.abspath(path), REPO_ROOT).replace(os.sep, '/')
+
+
+def estimate(path, number_plates=None, **settings):
+    """Return the run-time estimate of one script as a dict.
+
+    Keys: plates, seconds, minutes, plates_per_hour, tips, comments,
+    by_kind (seconds per step kind) and slowest (the slowest steps).
+    """
+    if number_plates is not None:
+        settings['number_plates'] = number_plates
+    ctx = run_protocol(path, **settings)
+    by_kind = defaultdict(float)
+    for step in ctx.steps:
+        by_kind[step.kind] += step.seconds
+    seconds = ctx.elapsed
+    slowest = sorted(ctx.steps, key=lambda step: step.seconds, reverse=True)[:5]
+    return {
+        'plates': number_plates,
+        'seconds': round(seconds, 1),
+        'minutes': round(seconds / 60, 2),
+        'plates_per_hour': round(number_plates * 3600 / seconds, 2) if number_plates and seconds else None,
+        'tips': ctx.tips_used(),
+        'comments': len(ctx.comments),
+        'by_kind': {kind: round(total, 1) for kind, total in sorted(by_kind.items(), key=lambda kv: -kv[1])},
+        'slowest': ['{} {} ({:.1f} s)'.format(step.kind, step.target, step.seconds) for step in slowest],
+    }
+
+
+def benchmark(path, plates=PLATE_RANGE):
+    "Return the list of estimates for a script, one per number of plates it supports"
+    module = load_protocol(path)
+    if not hasattr(module, 'number_plates'):
+        return [estimate(path)]
+    results = []
+    for number_plates in plates:
+        try:
+            results.append(estimate(path, number_plates))
+        except Exception as error:  # a script that cannot run n plates is a result, not a crash
+            results.append({'plates': number_plates, 'error': '{}: {}'.format(type(error).__name__, error)})
+    return results
+
+
+def format_report(key, results):
+    lines = [key, '  {:>6} {:>9} {:>12} {:>6} {:>9}'.format('plates', 'minutes', 'plates/hour', 'tips', 'comments')]
+    for result in results:
+        plates = result['plates'] if result['plates'] is not None else '-'
+        if 'error' in result:
+            lines.append('  {:>6} {}'.format(plates, result['error']))
+            continue
+        lines.append('  {:>6} {:>9.2f} {:>12} {:>6} {:>9}'.format(
+            plates, result['minutes'], result['plates_per_hour'] or '-', result['tips'], result['comments']))
+    largest = [result for result in results if 'error' not in result]
+    if largest:
+        largest = largest[-1]
+        total = largest['seconds'] or 1
+        lines.append('  time by step ({} plates):'.format(largest['plates'] or '-'))
+        for kind, seconds in largest['by_kind'].items():
+            if seconds:
+                lines.append('    {:<12} {:>8.1f} s {:>5.1f}%'.format(kind, seconds, 100 * seconds / total))
+        lines.append('  slowest steps:')
+        lines.extend('    ' + step for step in largest['slowest'])
+    return '\n'.join(lines)
+
+
+def _plates_key(result):
+    "Baseline key of a result: the number of plates, or 'default' for fixed-size scripts"
+    return 'default' if result['plates'] is None else str(result['plates'])
+
+
+def compare(report, baseline, tolerance):
+    "Return a list of regressions (messages) of report against baseline"
+    regressions = []
+    for key, expected in baseline.items():
+        if key not in report:
+            regressions.append('{}: missing from this run'.format(key))
+            continue
+        for result in report[key]:
+            plates = _plates_key(result)
+            if plates not in expected:
+                continue
+            if 'error' in result:
+                regressions.append('{} ({} plates): {}'.format(key, plates, result['error']))
+            elif result['seconds'] > expected[plates] * (1 + tolerance):
+                regressions.append('{} ({} plates): {:.1f} s, baseline {:.1f} s'.format(
+                    key, plates, result['seconds'], expected[plates]))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('scripts', nargs='*', help='protocol scripts (default: every script in the repo)')
+    parser.add_argument('--plates', default='1-9', help='range of number_plates to sweep, e.g. 1-9 or 8')
+    parser.add_argument('--json', help='write the full report as JSON to this file')
+    parser.add_argument('--baseline', help='fail if any estimate is slower than this baseline JSON')
+    parser.add_argument('--tolerance', type=float, default=0.05, help='allowed slowdown (default 0.05 = 5%%)')
+    parser.add_argument('--write-baseline', help='store the estimates as a new baseline JSON')
+    args = parser.parse_args(argv)
+
+    first, _, last = args.plates.partition('-')
+    plates = range(int(first), int(last or first) + 1)
+    report = {}
+    for path in args.scripts or default_scripts():
+        key = script_key(path)
+        report[key] = benchmark(path, plates)
+        print(format_report(key, report[key]))
+        print()
+
+    if args.json:
+        with open(args.json, 'w') as handle:
+            json.dump(report, handle, indent=2)
+    if args.write_baseline:
+        baseline = {key: {_plates_key(result): result['seconds'] for result in results if 'error' not in result}
+                    for key, results in report.items()}
+        with open(args.write_baseline, 'w') as handle:
+            json.dump(baseline, handle, indent=2, sort_keys=True)
+            handle.write('\n')
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+        if args.scripts:
+            baseline = {key: value for key, value in baseline.items() if key in report}
+        regressions = compare(report, baseline, args.tolerance)
+        for regression in regressions:
+            print('REGRESSION: ' + regression, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,180 @@
+"""Bulk fill: the same volume of a reagent in whole columns of every plate.
+
+The blocking and secondary antibody scripts are the same protocol with a
+different reservoir: an 8-channel pipette multi-dispenses a reagent from
+reservoir wells into plate columns (see ``cycles``), plate after plate.
+``bulk_fill`` does it for both:
+
+* ``fill_jobs`` says which reagent goes in which columns of which
+  plates: every label of the plate map is a reagent (from the reservoir
+  wells of the same label) that goes in every plate, unless an
+  assignment gives the plates of each reagent ({"ONE": "1-4",
+  "TWO": "5-8"}, see ``layout.assign_plates``) to the one label of the
+  plate map.
+* ``plan_bulk_fill`` plans the cycles of each reagent and splits its
+  plates over as few of its reservoir wells as they fit in, whole plates
+  per well (``plate_fills``), with their aspiration schedule. The
+  aspiration rate comes from the calibration of the reservoir
+  (``geometry.RATE_CALIBRATION``): full speed until the liquid left
+  above the tips gets thin, instead of a ramp down with the fill level.
+* ``bulk_fill`` plans, comments what to load in each reservoir well and
+  pipettes, with one tip per reagent (one_tip, the default) or one per
+  plate, blowing the disposal volume back after every plate. With more
+  plates than the deck holds it does so deck load after deck load (see
+  ``batches``): the reservoir wells keep what is left and only get what
+  the next load takes on top of it.
+"""
+from collections import OrderedDict, namedtuple
+
+from .cycles import plan_cycles
+from .geometry import LABWARE_GEOMETRY, RATE_CALIBRATION
+from .layout import assign_plates, columns
+from .loading import load_source
+from .tracking import TrackedSource, schedule_summary, split_pool
+
+# plates: plate numbers (1-based) in the order they are filled; cycles: CyclePlan of a plate;
+# schedule: Aspirations of all plates; fills: what goes in each reservoir well of the reagent (on top
+# of what a previous deck load left); left: what is left in each of them after the plates
+FillPlan = namedtuple('FillPlan', ['reagent', 'plates', 'cycles', 'schedule', 'fills', 'left'])
+
+
+def fill_jobs(plate_map, reservoir_map, plates, assignment=None):
+    "OrderedDict reagent -> (plate numbers, plate columns) of a run of plates (see above)"
+    if assignment:
+        if len(plate_map) != 1:
+            raise ValueError('an assignment of plates needs a plate map with one label, not {}'.format(', '.join(plate_map)))
+        destinations = columns(next(iter(plate_map.values())))
+        return OrderedDict((reagent, (numbers, destinations))
+                           for reagent, numbers in assign_plates(assignment, plates, reservoir_map).items())
+    jobs = OrderedDict()
+    for label, wells in plate_map.items():
+        if label not in reservoir_map:
+            raise ValueError('the plate map needs {} but the reservoir layout has no {}'.format(label, label))
+        jobs[label] = (list(range(1, plates + 1)), columns(wells))
+    return jobs
+
+
+def load_jobs(jobs, plates):
+    "The jobs (see fill_jobs) of the plates of a deck load"
+    return OrderedDict((reagent, ([number for number in numbers if number in plates], destinations))
+                       for reagent, (numbers, destinations) in jobs.items() if any(number in plates for number in numbers))
+
+
+def tip_loads(jobs, one_tip=True):
+    "Tip pick-ups of bulk_fill for jobs (tips of the multichannel: 8 times as many)"
+    return len(jobs) if one_tip else sum(len(plates) for plates, destinations in jobs.values())
+
+
+def plate_fills(volumes, plates, capacity, dead_volume=0.0, channels=1):
+    """ul in each reservoir well for plates that each take volumes (per channel, see TrackedSource.plan).
+
+    Whole plates per well, spread evenly over the fewest wells they fit
+    in (8 plates of 25 ul from 15 mL columns: plates 1-4 from the first,
+    5-8 from the second), so that no plate switches wells halfway. A well
+    holds what its plates take, the disposal volume of the last one still
+    in the tips, and dead_volume. None when a plate takes more than a
+    well holds.
+    """
+    net = sum(volumes) * channels
+    peak = split_pool(volumes, float('inf'), 0.0, channels)[0] if net > 0 else 0.0
+    room = capacity - dead_volume - peak
+    if room < -1e-6:
+        return None
+    wells = 1 if net <= 0 else -(-plates // (int((room + 1e-6) // net) + 1))
+    return [net * (plates // wells + (1 if well < plates % wells else 0) - 1) + peak + dead_volume for well in range(wells)]
+
+
+def plan_bulk_fill(pipette, reservoir, reservoir_map, jobs, volume, dead_volume=0.0, immersion_depth=3.0,
+                   min_clearance=0.1, capacity=None, left=None):
+    """FillPlans of jobs (see fill_jobs): volume (ul per well) with pipette from reservoir (loaded labware).
+
+    Every reservoir well keeps dead_volume; capacity defaults to the
+    volume of a reservoir well. The tips go immersion_depth below the
+    liquid surface (heights and rates from the geometry and calibration
+    of the reservoir). left: ul left in reservoir wells (names) by a
+    previous deck load, the fills only top them up.
+    """
+    wells = reservoir.wells_by_name()
+    capacity = capacity or reservoir.wells()[0].max_volume
+    height = LABWARE_GEOMETRY[reservoir.load_name].height
+    calibration = RATE_CALIBRATION[reservoir.load_name]
+    plans = []
+    for reagent, (plates, destinations) in jobs.items():
+        cycles = plan_cycles(pipette, destinations, volume)
+        volumes = cycles.volumes() * len(plates)
+        pool = [wells[well] for well in reservoir_map[reagent]]
+        options = dict(reserve=dead_volume, channels=pipette.channels, immersion_depth=immersion_depth,
+                       min_clearance=min_clearance, calibration=calibration)
+        fills = plate_fills(cycles.volumes(), len(plates), capacity, dead_volume, pipette.channels)
+        if fills is None:
+            # a plate takes more than a well holds: it goes on in the next well
+            source = TrackedSource.split(pool, volumes, capacity, height, **options)
+        elif len(fills) > len(pool):
+            raise ValueError('{} plates need {} wells of {:.0f} ul but the reservoir layout gives {} {}'.format(
+                len(plates), len(fills), capacity, reagent, len(pool)))
+        else:
+            source = TrackedSource(pool, fills + [0.0] * (len(pool) - len(fills)), height, **options)
+        fills = list(source.volumes)
+        if left:
+            source.volumes = [left.get(well, 0.0) for well in reservoir_map[reagent]]
+            fills = source.refill(fills)
+        schedule = source.plan(volumes)
+        plans.append(FillPlan(reagent, plates, cycles, schedule, fills, list(source.volumes)))
+    return plans
+
+
+def bulk_fill(protocol, pipette, reservoir, reservoir_map, plates, jobs, volume, log, one_tip=True, batch=None, **options):
+    """Fill the columns of jobs in plates (loaded plates, plate 1 first), returns the FillPlans.
+
+    With a batch (see batches) the plates are filled deck load after
+    deck load, with a pause to swap them in between. options go to
+    plan_bulk_fill; log is the RunLog of the protocol.
+    """
+    loads = batch.loads if batch is not None else [list(range(1, len(plates) + 1))]
+    all_plans, left = [], {}
+    for index, load in enumerate(loads):
+        plans = plan_bulk_fill(pipette, reservoir, reservoir_map, load_jobs(jobs, load), volume, left=left, **options)
+        # what goes in each reservoir well (see python -m elisa_ot2.loading), after the first load on top of what is left
+        for plan in plans:
+            wells = reservoir_map[plan.reagent]
+            for fill in sorted(set(fill for fill in plan.fills if fill > 0), key=plan.fills.index):
+                load_source(protocol, reservoir, [well for well, well_fill in zip(wells, plan.fills) if well_fill == fill],
+                            plan.reagent, fill, top_up=index > 0)
+            left.update(zip(wells, plan.left))
+            log.debug('schedules', summary='{} {}'.format(plan.reagent, schedule_summary(plan.schedule)))
+        if index:
+            batch.swap(protocol, index)
+        _fill_plates(pipette, plates, plans, log, one_tip)
+        all_plans.extend(plans)
+    return all_plans
+
+
+def _fill_plates(pipette, plates, plans, log, one_tip):
+    # with more than one reagent per plate, a plate is done with its last reagent
+    last_plan = dict((plate_number, index) for index, plan in enumerate(plans) for plate_number in plan.plates)
+    for plan_index, plan in enumerate(plans):
+        aspirations = len(plan.cycles.cycles)
+        if one_tip:
+            pipette.pick_up_tip()
+        for index, plate_number in enumerate(plan.plates):
+            plate = plates[plate_number - 1]
+            if not one_tip:
+                pipette.pick_up_tip()
+            plate_schedule = plan.schedule[index * aspirations:(index + 1) * aspirations]
+            for cycle, aspiration in zip(plan.cycles.cycles, plate_schedule):
+                if aspiration.previous is not None:
+                    log.debug('well switches', plate_number, well=aspiration.well.well_name)
+                pipette.aspirate(aspiration.volume, aspiration.location(), rate=aspiration.rate)
+                log.debug('aspirations', plate_number, well=aspiration.well.well_name, volume=aspiration.volume,
+                          clearance=aspiration.clearance, rate=aspiration.rate)
+                for column, column_volume in cycle.dispenses:
+                    pipette.dispense(column_volume, plate.wells_by_name()['A{}'.format(column)])
+                    log.debug('column dispenses', plate_number, column=column, volume=column_volume)
+            # the disposal volume goes back after every plate (it also keeps the p300 tips from dripping)
+            pipette.blow_out(plate_schedule[-1].well)
+            if not one_tip:
+                pipette.drop_tip()
+            if last_plan[plate_number] == plan_index:
+                log.plate_done(plate_number)
+        if one_tip:
+            pipette.drop_tip()
@@ -0,0 +1,674 @@
+"""Bundler: one self-contained upload file per protocol script.
+
+The OT-2 app takes a single ``.py`` per protocol, while the scripts
+import their protocol bodies and helpers from ``elisa_ot2``. ``bundle``
+writes a script together with the part of the package it uses:
+
+* tree shaking: starting from what the script imports, only the
+  top-level definitions (functions, classes, constants, imports) it
+  reaches are kept, e.g. the prep script leaves out the benchmark, the
+  stand-in simulator and every command line tool;
+* docstrings and comments of the package are stripped, as are the
+  comment blocks of the script (the comments on its settings stay);
+* values that the package computes at import from files of this repo
+  (``FROZEN``, e.g. the Greiner plate definition behind ``deck.LABWARE``)
+  are written out as literals, as these files are not on the robot.
+
+The kept definitions are written out as one flat file, module after
+module (each after the modules it imports from), followed by the script:
+no importer, no package, nothing for the protocol analysis to resolve.
+The imports of ``elisa_ot2`` go away and ``module.name`` becomes
+``name``; a definition whose name the script or an earlier module
+already has is renamed after its module (``prep.run`` is ``prep_run``,
+next to the script's own ``run``).
+
+Bundles go to ``bundles/``, next to the folders of their scripts:
+
+    python -m elisa_ot2.bundle
+    python -m elisa_ot2.bundle Multiple_Plates_Scripts/elisa-plate-prep-ot2.py --out-dir /tmp
+
+The bundler needs Python 3.8 or later (the bundles run wherever the
+scripts do).
+"""
+import argparse
+import ast
+import builtins
+import importlib
+import io
+import os
+import re
+import sys
+import tokenize
+from collections import OrderedDict, namedtuple
+
+from .benchmark import REPO_ROOT, default_scripts, script_key
+
+PACKAGE = 'elisa_ot2'
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+BUNDLE_DIR = os.path.join(REPO_ROOT, 'bundles')
+# module -> names whose value is computed at import from files that are not on the robot
+FROZEN = {'elisa_ot2.deck': ('LABWARE',)}
+
+# modules: names of the bundled modules; kept/total: top-level definitions of these modules;
+# size: bytes of the bundle; original: bytes of the script and of every package module it imports
+BundleStats = namedtuple('BundleStats', ['modules', 'kept', 'total', 'size', 'original'])
+
+def _module_file(name):
+    "Source file of a module of the package, None when there is none"
+    path = os.path.join(PACKAGE_DIR, *name.split('.')[1:])
+    if os.path.isfile(os.path.join(path, '__init__.py')):
+        return os.path.join(path, '__init__.py')
+    if name != PACKAGE and os.path.isfile(path + '.py'):
+        return path + '.py'
+    return None
+
+
+def _in_package(name):
+    return name == PACKAGE or name.startswith(PACKAGE + '.')
+
+
+def _resolve(node, module, is_package):
+    "Absolute module name of an import from statement of module (None outside the package)"
+    if not node.level:
+        return node.module if node.module and _in_package(node.module) else None
+    base = module if is_package else module.rsplit('.', 1)[0]
+    for level in range(1, node.level):
+        base = base.rsplit('.', 1)[0]
+    return base + '.' + node.module if node.module else base
+
+
+def _targets(node, module, is_package):
+    """(local name, alias index, target) of an import statement.
+
+    target: ('module', name), ('attr', module, name) or None outside the package.
+    """
+    if isinstance(node, ast.Import):
+        for index, alias in enumerate(node.names):
+            local = alias.asname or alias.name.split('.')[0]
+            inside = _in_package(alias.name) and alias.asname
+            yield local, index, ('module', alias.name) if inside else None
+        return
+    source = _resolve(node, module, is_package)
+    for index, alias in enumerate(node.names):
+        local = alias.asname or alias.name
+        if source is None:
+            yield local, index, None
+        elif _module_file(source + '.' + alias.name):
+            yield local, index, ('module', source + '.' + alias.name)
+        else:
+            yield local, index, ('attr', source, alias.name)
+
+
+def _defines(node):
+    "Top-level names a statement binds (or changes, as in NAME[key] = value)"
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        return [node.name]
+    targets = node.targets if isinstance(node, ast.Assign) else [node.target] if isinstance(node, (ast.AnnAssign, ast.AugAssign)) else []
+    names = []
+    for target in targets:
+        for child in ast.walk(target):
+            if isinstance(child, ast.Name):
+                names.append(child.id)
+                break
+    return names
+
+
+def _is_main_guard(node):
+    test = node.test if isinstance(node, ast.If) else None
+    return (isinstance(test, ast.Compare) and isinstance(test.left, ast.Name) and test.left.id == '__name__'
+            and any(isinstance(value, ast.Constant) and value.value == '__main__' for value in test.comparators))
+
+
+def _is_docstring(node):
+    return isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant) and isinstance(node.value.value, str)
+
+
+class _Module:
+    "A parsed module of the package, with its top-level definitions and imports"
+
+    def __init__(self, name):
+        path = _module_file(name)
+        if path is None:
+            raise ValueError('{} is not a module of {}'.format(name, PACKAGE))
+        self.name = name
+        self.path = path
+        self.is_package = os.path.basename(path) == '__init__.py'
+        with open(path) as module_file:
+            self.source = module_file.read()
+        self.lines = self.source.splitlines()
+        self.statements = ast.parse(self.source).body
+        self.defines = {}   # name -> indices of the statements that bind it
+        self.imports = {}   # local name -> (statement index, alias index, target)
+        self.always = []    # statements that run for their effect (kept with the module)
+        self.definitions = 0
+        for index, node in enumerate(self.statements):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                for local, alias, target in _targets(node, name, self.is_package):
+                    self.imports[local] = (index, alias, target)
+            elif _is_docstring(node) or _is_main_guard(node):
+                continue
+            elif _defines(node):
+                self.definitions += 1
+                for defined in _defines(node):
+                    self.defines.setdefault(defined, []).append(index)
+            else:
+                self.always.append(index)
+
+    def uses(self, node):
+        """Local names node uses, and the (module, name) it needs from other modules.
+
+        module.name, with module an imported module of the package, only
+        needs name of that module.
+        """
+        names, needs, bases = set(), set(), set()
+        for child in ast.walk(node):
+            if isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name):
+                binding = self.imports.get(child.value.id)
+                if binding and binding[2] and binding[2][0] == 'module':
+                    bases.add(id(child.value))
+                    names.add(child.value.id)
+                    needs.add((binding[2][1], child.attr))
+            elif isinstance(child, (ast.Import, ast.ImportFrom)) and child is not node:
+                # an import inside a function
+                for local, alias, target in _targets(child, self.name, self.is_package):
+                    if target:
+                        needs.add((target[1], '*') if target[0] == 'module' else target[1:])
+        for child in ast.walk(node):
+            if isinstance(child, ast.Name) and id(child) not in bases:
+                names.add(child.id)
+        return names, needs
+
+
+class _Shaker:
+    "The modules, statements and import aliases a script needs"
+
+    def __init__(self):
+        self.modules = {}   # name -> _Module, in the order they are reached
+        self.kept = {}      # module -> kept statement indices
+        self.aliases = {}   # module -> kept (statement index, alias index)
+        self.frozen = {}    # module -> statement index -> source of the frozen assignment
+        self.done = set()
+
+    def include(self, name):
+        if name in self.modules:
+            return self.modules[name]
+        if '.' in name:
+            self.include(name.rsplit('.', 1)[0])
+        module = self.modules[name] = _Module(name)
+        self.kept[name], self.aliases[name], self.frozen[name] = set(), set(), {}
+        for index in module.always:
+            self.keep(module, index)
+        return module
+
+    def need(self, name, attribute):
+        module = self.include(name)
+        if (name, attribute) in self.done:
+            return
+        self.done.add((name, attribute))
+        if attribute == '*':
+            for local in list(module.defines) + list(module.imports):
+                self.need(name, local)
+        elif attribute in module.defines:
+            indices = module.defines[attribute]
+            if attribute in FROZEN.get(name, ()):
+                self.freeze(module, attribute, indices[0])
+            else:
+                for index in indices:
+                    self.keep(module, index)
+        elif attribute in module.imports:
+            index, alias, target = module.imports[attribute]
+            self.kept[name].add(index)
+            self.aliases[name].add((index, alias))
+            if target and target[0] == 'module':
+                self.include(target[1])
+            elif target:
+                self.need(*target[1:])
+        else:
+            raise ValueError('{} has no {}'.format(name, attribute))
+
+    def keep(self, module, index, node=None):
+        if index in self.kept[module.name] and node is None:
+            return
+        self.kept[module.name].add(index)
+        names, needs = module.uses(node or module.statements[index])
+        for local in names:
+            if local in module.defines or local in module.imports:
+                self.need(module.name, local)
+        for need in needs:
+            self.need(*need)
+
+    def freeze(self, module, attribute, index):
+        value = getattr(importlib.import_module(module.name), attribute)
+        source = '{} = {!r}'.format(attribute, value)
+        self.frozen[module.name][index] = source
+        self.keep(module, index, ast.parse(source))
+
+
+def _strip(source):
+    """source without docstrings, comments and blank lines (except inside strings).
+
+    A body left empty by its docstring gets a pass.
+    """
+    lines = source.splitlines()
+    tree = ast.parse(source)
+    drop, passes = set(), {}
+    for node in ast.walk(tree):
+        body = getattr(node, 'body', None)
+        if isinstance(node, (ast.Module, ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and body and _is_docstring(body[0]):
+            doc = body[0]
+            if getattr(node, 'lineno', 0) == doc.lineno:
+                continue
+            drop.update(range(doc.lineno, doc.end_lineno + 1))
+            if len(body) == 1:
+                passes[doc.lineno] = ' ' * doc.col_offset + 'pass'
+    kept = [passes.get(number, line) for number, line in enumerate(lines, 1) if number not in drop or number in passes]
+    text = '\n'.join(kept) + '\n'
+    comments, strings = {}, set()
+    for token in tokenize.generate_tokens(io.StringIO(text).readline):
+        if token.type == tokenize.COMMENT:
+            comments[token.start[0]] = token.start[1]
+        elif token.type == tokenize.STRING and token.end[0] > token.start[0]:
+            strings.update(range(token.start[0] + 1, token.end[0] + 1))
+    out = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if number in strings:
+            out.append(line)
+            continue
+        line = line[:comments[number]].rstrip() if number in comments else line.rstrip()
+        if line:
+            out.append(line)
+    return '\n'.join(out) + '\n'
+
+
+def _import_source(node, aliases):
+    names = ', '.join(alias.name + (' as {}'.format(alias.asname) if alias.asname else '') for alias in aliases)
+    if isinstance(node, ast.Import):
+        return 'import {}'.format(names)
+    return 'from {}{} import {}'.format('.' * node.level, node.module or '', names)
+
+
+_SCOPES = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp,
+           ast.GeneratorExp)
+
+
+def _bound(statements):
+    "Names that statements bind in their own scope (not in the functions, classes and comprehensions inside them)"
+    names, declared, todo = set(), set(), list(statements)
+    while todo:
+        node = todo.pop()
+        if isinstance(node, ast.Name) and not isinstance(node.ctx, ast.Load):
+            names.add(node.id)
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.ExceptHandler) and node.name:
+            names.add(node.name)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split('.')[0] for alias in node.names)
+        elif isinstance(node, (ast.Global, ast.Nonlocal)):
+            declared.update(node.names)
+        if not isinstance(node, _SCOPES):
+            todo.extend(ast.iter_child_nodes(node))
+    return names - declared
+
+
+def _global_refs(node, local=frozenset()):
+    "(Name node, local) of the names under node that refer to globals (local: the names bound by the functions around them)"
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        args = node.args
+        params = args.posonlyargs + args.args + args.kwonlyargs + [arg for arg in (args.vararg, args.kwarg) if arg]
+        outer = args.defaults + [default for default in args.kw_defaults if default] + getattr(node, 'decorator_list', [])
+        outer += [arg.annotation for arg in params if arg.annotation] + [getattr(node, 'returns', None) or ast.Pass()]
+        for child in outer:
+            yield from _global_refs(child, local)
+        body = node.body if isinstance(node.body, list) else [node.body]
+        inner = local | set(arg.arg for arg in params) | _bound(body)
+        for child in body:
+            yield from _global_refs(child, inner)
+    elif isinstance(node, ast.ClassDef):
+        for child in node.bases + node.keywords + node.decorator_list:
+            yield from _global_refs(child, local)
+        # the names of the class body are seen by its statements, not by its methods
+        members = local | _bound(node.body)
+        for child in node.body:
+            yield from _global_refs(child, local if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)) else members)
+    elif isinstance(node, (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+        inner = local | _bound([generator.target for generator in node.generators])
+        for child in ast.iter_child_nodes(node):
+            yield from _global_refs(child, inner)
+    elif isinstance(node, ast.Name):
+        if node.id not in local:
+            yield node, local
+    else:
+        for child in ast.iter_child_nodes(node):
+            yield from _global_refs(child, local)
+
+
+def _edit(source, edits):
+    """source with edits made: (start, end, old, new), positions as (line, byte column) of the ast.
+
+    old is the text the edit replaces, checked (None: any text).
+    """
+    data = source.encode()
+    starts = [0]
+    for line in data.split(b'\n'):
+        starts.append(starts[-1] + len(line) + 1)
+    for start, end, old, new in sorted(edits, reverse=True):
+        first, last = starts[start[0] - 1] + start[1], starts[end[0] - 1] + end[1]
+        if old is not None and data[first:last] != old.encode():
+            raise ValueError('line {}: cannot rename {} in {!r}'.format(start[0], old, data[first:last].decode()))
+        data = data[:first] + new.encode() + data[last:]
+    return data.decode()
+
+
+def _span(node):
+    return (node.lineno, node.col_offset), (node.end_lineno, node.end_col_offset)
+
+
+def _name_span(node, lines):
+    "Where the name of a def or class statement is"
+    line = lines[node.lineno - 1].encode()
+    match = re.compile(rb'(async\s+def|def|class)\s+').match(line, node.col_offset)
+    return (node.lineno, match.end()), (node.lineno, match.end() + len(node.name.encode()))
+
+
+def _strip_script(source):
+    "source without its comment-only lines and runs of blank lines (inline comments stay)"
+    comment_lines, strings = set(), set()
+    tokens = list(tokenize.generate_tokens(io.StringIO(source).readline))
+    for previous, token in zip([None] + tokens, tokens):
+        if token.type == tokenize.COMMENT and (previous is None or previous.end[0] < token.start[0]
+                                               or previous.type in (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT)):
+            comment_lines.add(token.start[0])
+        elif token.type == tokenize.STRING and token.end[0] > token.start[0]:
+            strings.update(range(token.start[0] + 1, token.end[0] + 1))
+    out = []
+    for number, line in enumerate(source.splitlines(), 1):
+        if number in strings:
+            out.append(line)
+        elif number not in comment_lines and (line.strip() or (out and out[-1].strip())):
+            out.append(line.rstrip())
+    return '\n'.join(out).strip('\n') + '\n'
+
+
+def _script_needs(tree):
+    "(module, name) the top level of a script needs from the package"
+    imports = {}
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module and _in_package(node.module) and not node.level:
+            for local, alias, target in _targets(node, node.module, True):
+                imports[local] = target
+        elif isinstance(node, ast.Import):
+            for local, alias, target in _targets(node, '', True):
+                if target:
+                    imports[local] = target
+                elif _in_package(node.names[alias].name):
+                    raise ValueError('import {} needs an alias in a bundled script'.format(node.names[alias].name))
+    needs, bases = set(), set()
+    for child in ast.walk(tree):
+        if isinstance(child, ast.Attribute) and isinstance(child.value, ast.Name) and child.value.id in imports \
+                and imports[child.value.id][0] == 'module':
+            bases.add(id(child.value))
+            needs.add((imports[child.value.id][1], child.attr))
+    for local, target in imports.items():
+        if target[0] == 'attr':
+            needs.add(target[1:])
+    for child in ast.walk(tree):
+        if isinstance(child, ast.Name) and id(child) not in bases and child.id in imports and imports[child.id][0] == 'module':
+            needs.add((imports[child.id][1], '*'))
+    for target in imports.values():
+        if target[0] == 'module':
+            needs.add((target[1], None))
+    return needs
+
+
+def _closure(names):
+    "Every package module that names import, directly or not"
+    seen, todo = set(), list(names)
+    while todo:
+        name = todo.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        if '.' in name:
+            todo.append(name.rsplit('.', 1)[0])
+        module = _Module(name)
+        for node in ast.walk(ast.parse(module.source)):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                todo.extend(target[1] for local, alias, target in _targets(node, name, module.is_package) if target)
+    return seen
+
+
+def _order(shaker):
+    "The modules of shaker, each after the modules its kept imports come from"
+    order, seen = [], set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        for index, alias, target in shaker.modules[name].imports.values():
+            if target and (index, alias) in shaker.aliases[name]:
+                visit(target[1])
+        order.append(name)
+
+    for name in shaker.modules:
+        visit(name)
+    return order
+
+
+class _Flattener:
+    """The kept definitions of a script's modules under one namespace, the script's.
+
+    Every top-level name of a module gets a name in the bundle: its own,
+    or module_name (e.g. prep_run) when the script or an earlier module
+    already has it. The imports of the package go away: an imported
+    name, or module.name, is the bundle name of the definition it imports.
+    """
+
+    def __init__(self, shaker, reserved):
+        self.shaker = shaker
+        self.names = {}     # ('def', module, name) or ('ext', source, name) -> name in the bundle
+        self.taken = set(reserved)
+        self.external = {}  # ('ext', source, name) -> its alias in the import statements of the bundle
+
+    def target(self, module, local):
+        "What the top-level name local of module is: ('def', module, name), ('ext', source, name) or ('module', name)"
+        module = self.shaker.modules[module]
+        if local in module.defines:
+            return 'def', module.name, local
+        index, alias, target = module.imports[local]
+        if target is None:
+            node = module.statements[index]
+            return 'ext', node.module if isinstance(node, ast.ImportFrom) else None, node.names[alias].name
+        if target[0] == 'module':
+            return target
+        return self.target(*target[1:])
+
+    def name(self, module, local):
+        "Name in the bundle of the top-level name local of module (a module of the package stays ('module', name))"
+        key = self.target(module, local)
+        if key[0] == 'module':
+            return key
+        if key not in self.names:
+            wanted = key[2] if key[0] == 'def' else local
+            name = wanted
+            if key[0] == 'ext' and '.' in key[2] and wanted != key[2].split('.')[0]:
+                raise ValueError('{}: import {} needs an alias in a bundled module'.format(module, key[2]))
+            if name in self.taken and key[0] == 'def':
+                name = '{}{}_{}'.format('_' if wanted.startswith('_') else '', key[1].rsplit('.', 1)[-1], wanted.lstrip('_'))
+            elif name in self.taken:
+                name = '_' + wanted
+            suffix = 1
+            while name in self.taken:
+                suffix += 1
+                name = '{}_{}'.format(name.rsplit('_', 1)[0] if suffix > 2 else name, suffix)
+            if key[0] == 'ext' and '.' in key[2] and name != wanted:
+                raise ValueError('{}: import {} clashes with a name of the script'.format(module, key[2]))
+            self.names[key] = name
+            self.taken.add(name)
+            if key[0] == 'ext':
+                self.external[key] = ast.alias(key[2], None if name == key[2].split('.')[0] else name)
+        return self.names[key]
+
+    def imports(self):
+        "The import statements of the names the modules import from outside the package"
+        sources = OrderedDict()
+        for key, alias in sorted(self.external.items(), key=lambda item: (item[0][1] or '', item[0][2])):
+            sources.setdefault(key[1], []).append(alias)
+        lines = [_import_source(ast.Import([alias]), [alias]) for alias in sources.pop(None, [])]
+        return lines + [_import_source(ast.ImportFrom(source, aliases, 0), aliases) for source, aliases in sources.items()]
+
+    def renames(self, statements, lines, resolve, defines=()):
+        """Edits that give the names statements use (and the defs and classes in defines) their bundle names.
+
+        resolve(local) is the bundle name of a global, ('module', name) for
+        a module of the package, or None to leave it alone.
+        """
+        edits, refs = [], {}
+        for node in statements:
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                continue
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)) and node.name in defines:
+                name = resolve(node.name)
+                if name != node.name:
+                    edits.append(_name_span(node, lines) + (node.name, name, ()))
+            for ref, local in _global_refs(node):
+                name = resolve(ref.id)
+                if name is not None:
+                    refs[id(ref)] = ref, name, local
+            for child in ast.walk(node):
+                if isinstance(child, ast.Attribute) and id(child.value) in refs and isinstance(refs[id(child.value)][1], tuple):
+                    ref, module, local = refs.pop(id(child.value))
+                    edits.append(_span(child) + ('{}.{}'.format(ref.id, child.attr), self.name(module[1], child.attr), local))
+        for ref, name, local in refs.values():
+            if isinstance(name, tuple):
+                raise ValueError('line {}: {} is a module, a bundle only takes module.name from it'.format(ref.lineno, ref.id))
+            if name != ref.id:
+                edits.append(_span(ref) + (ref.id, name, local))
+        for start, end, old, new, local in edits:
+            if new in local:
+                raise ValueError('line {}: {} would be {} in the bundle, which a local name there hides'.format(start[0], old, new))
+        return [edit[:4] for edit in edits]
+
+    def module_source(self, name):
+        "The kept statements of module name under their bundle names, stripped"
+        module, kept, frozen = self.shaker.modules[name], self.shaker.kept[name], self.shaker.frozen[name]
+        statements = [node for index, node in enumerate(module.statements)
+                      if index in kept and index not in frozen and not isinstance(node, (ast.Import, ast.ImportFrom))]
+        for node in statements:
+            for child in ast.walk(node):
+                if child is not node and isinstance(child, (ast.Import, ast.ImportFrom)) \
+                        and any(target for local, alias, target in _targets(child, name, module.is_package)):
+                    raise ValueError('{} imports the package inside a function, which a bundle cannot do'.format(name))
+
+        def resolve(local):
+            return self.name(name, local) if local in module.defines or local in module.imports else None
+
+        lines = _edit(module.source, self.renames(statements, module.lines, resolve, module.defines)).splitlines()
+        chunks = []
+        for index, node in enumerate(module.statements):
+            if index in frozen:
+                chunks.append(frozen[index].replace(_defines(node)[0], resolve(_defines(node)[0]), 1) + '\n')
+            elif any(node is statement for statement in statements):
+                first = min([node.lineno] + [decorator.lineno for decorator in getattr(node, 'decorator_list', [])])
+                chunks.append(_strip('\n'.join(lines[first - 1:node.end_lineno])))
+        return ''.join(chunks)
+
+    def script_source(self, script, imports):
+        "script without its imports of the package, its uses of them under their bundle names"
+        tree = ast.parse(script)
+        lines = script.splitlines()
+
+        def resolve(local):
+            if local not in imports:
+                return None
+            target = imports[local]
+            return target if target[0] == 'module' else self.name(*target[1:])
+
+        edits = self.renames(tree.body, lines, resolve)
+        for node in tree.body:
+            if isinstance(node, (ast.Import, ast.ImportFrom)) and any(
+                    _in_package(alias.name if isinstance(node, ast.Import) else node.module or '') for alias in node.names):
+                edits.append(_span(node) + (None, ''))
+        return _edit(script, edits)
+
+
+def _script_imports(tree):
+    "local name -> target of the top-level imports of the package in a script"
+    imports = {}
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module and _in_package(node.module) and not node.level:
+            imports.update((local, target) for local, alias, target in _targets(node, node.module, True))
+        elif isinstance(node, ast.Import):
+            imports.update((local, target) for local, alias, target in _targets(node, '', True) if target)
+    return imports
+
+
+def bundle(path):
+    "(source of the upload file of the script at path, BundleStats)"
+    with open(path) as script_file:
+        script = script_file.read()
+    tree = ast.parse(script)
+    shaker = _Shaker()
+    for module, name in sorted(_script_needs(tree), key=lambda need: (need[0], need[1] or '')):
+        if name is None:
+            shaker.include(module)
+        else:
+            shaker.need(module, name)
+    header = ['# {} bundled with elisa_ot2 by python -m elisa_ot2.bundle: upload this file to the OT-2 app.'.format(script_key(path)),
+              '# To change the protocol edit the script (or elisa_ot2) and bundle it again, not this file.']
+    imports = _script_imports(tree)
+    # the script keeps its names (the protocol reads its settings from globals()), as do the builtins
+    flat = _Flattener(shaker, set(dir(builtins)) | (_bound(tree.body) - set(imports)))
+    modules = []
+    for name in _order(shaker):
+        source = flat.module_source(name)
+        if source.strip():
+            modules.append('# {}\n{}'.format(name, source))
+    script = flat.script_source(script, imports)
+    parts = ['\n'.join(header) + '\n']
+    if flat.external:
+        parts.append('\n'.join(flat.imports()) + '\n')
+    parts.extend(modules)
+    parts.append(_strip_script(script))
+    text = '\n\n'.join(parts)
+    compile(text, path, 'exec')
+    imported = _closure(shaker.modules)
+    original = len(script.encode()) + sum(os.path.getsize(_module_file(name)) for name in imported)
+    kept = sum(len(set(index for indices in module.defines.values() for index in indices) & shaker.kept[name])
+               for name, module in shaker.modules.items())
+    total = sum(_Module(name).definitions for name in imported)
+    return text, BundleStats(list(shaker.modules), kept, total, len(text.encode()), original)
+
+
+def bundle_path(path, out_dir=BUNDLE_DIR):
+    "Where the bundle of the script at path goes: out_dir/<folder of the script>/<script>"
+    return os.path.join(out_dir, os.path.basename(os.path.dirname(os.path.abspath(path))), os.path.basename(path))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bundle protocol scripts with the elisa_ot2 code they use into single upload files')
+    parser.add_argument('scripts', nargs='*', help='protocol scripts (default: every script of both folders)')
+    parser.add_argument('--out-dir', default=BUNDLE_DIR, help='folder for the bundles (default: bundles/)')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for path in args.scripts or default_scripts():
+        try:
+            text, stats = bundle(path)
+        except (ValueError, SyntaxError) as error:
+            print('{}: {}'.format(script_key(path), error))
+            failed += 1
+            continue
+        out = bundle_path(path, args.out_dir)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        with open(out, 'w') as bundle_file:
+            bundle_file.write(text)
+        print('{} -> {}: {} modules, {} of {} definitions, {:.1f} kB ({:.1f} kB with the whole modules)'.format(
+            script_key(path), os.path.relpath(out), len(stats.modules), stats.kept, stats.total,
+            stats.size / 1024.0, stats.original / 1024.0))
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
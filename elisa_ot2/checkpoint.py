@@ -0,0 +1,199 @@
+"""Checkpoints: resume a run at the plate where it stopped.
+
+A 9-plate primary antibody run that stops at plate 6 (a tip crash, an
+empty tube) used to start over from plate 1, or from a script with
+number_plates and the layouts edited by hand, with every tube assumed
+full again. With a checkpoint file the run records after each block
+(one serum, one tip) the plates it finished, the wells it filled in the
+plate it was at, the tips it took and the volume left in each source
+well, as JSON:
+
+    {"run": {"number_plates": 9, ...}, "plates_done": [1, 2, 3, 4, 5],
+     "dispensed": {"6": ["A1", "B1"]}, "tips": {"p300_single_gen2": 83},
+     "volumes": {"A1": 1100.0, ...}}
+
+Run the script again with ``resume = True`` and it starts at the first
+plate it did not finish, with the wells it did not fill (leave the
+plates on the deck), takes its tips after the ones used and plans its
+aspiration heights from the volumes left in the tubes (what was in the
+tip when the run stopped is lost, and the wells of the block it stopped
+in are filled again). ``run`` holds the settings of the
+run; resuming with other plates or layouts raises ValueError. After
+topping up a tube, add what went in to its volume in the file.
+
+The file is only written on the robot: the OT-2 app and
+opentrons_simulate analyse a protocol by running it, which must not
+mark its plates as done. To see a checkpoint copied from the robot and
+check the run that resumes from it (heights and volumes as in
+``dryrun``, and its run time):
+
+    python -m elisa_ot2.checkpoint elisa-primary-checkpoint.json
+    python -m elisa_ot2.checkpoint elisa-primary-checkpoint.json Multiple_Plates_Scripts/elisa-plate-assay-primary-Ab-ot2.py
+"""
+import argparse
+import json
+import math
+import os
+import sys
+from collections import OrderedDict
+
+
+def read(path):
+    "The state saved in a checkpoint file: run, plates_done, tips and volumes"
+    with open(path) as checkpoint_file:
+        return json.load(checkpoint_file, object_pairs_hook=OrderedDict)
+
+
+class Checkpoint:
+    "Plates done, tips used and volume left in each source well of a run, saved to a file as they change"
+
+    def __init__(self, protocol, path, run, resume=False):
+        """path: JSON file (None: no checkpoint); run: the settings of the run (JSON values).
+
+        With resume the progress is read from path.
+        """
+        self.protocol = protocol
+        self.path = path
+        self.run = OrderedDict(run)
+        self.plates_done = []
+        self.dispensed = OrderedDict()  # plate (a string, as in JSON) -> wells filled of a plate not done
+        self.tips = OrderedDict()  # pipette name -> tips taken
+        self.volumes = OrderedDict()  # source well name -> ul left
+        self.resumed = resume
+        if resume:
+            self._load()
+
+    def _load(self):
+        if not self.path:
+            raise ValueError('resume needs the checkpoint file of the run')
+        state = read(self.path)
+        changed = [name for name in self.run if state['run'].get(name) != self.run[name]]
+        if changed:
+            raise ValueError('{} is the checkpoint of another run ({} changed)'.format(self.path, ', '.join(changed)))
+        self.plates_done = state['plates_done']
+        self.dispensed.update(state['dispensed'])
+        self.tips.update(state['tips'])
+        self.volumes.update(state['volumes'])
+        if len(self.plates_done) == self.run.get('number_plates'):
+            raise ValueError('{}: every plate of the run is done'.format(self.path))
+
+    def to_do(self, plate, wells):
+        "The wells (names) of plate (1-based) the checkpoint did not fill"
+        if plate in self.plates_done:
+            return []
+        filled = set(self.dispensed.get(str(plate), ()))
+        return [well for well in wells if well not in filled]
+
+    def check_volumes(self, sources, dead_volume=0.0):
+        """Raise ValueError when the resumed run would leave less than dead_volume in a well of sources.
+
+        sources: the TrackedSources of the run, once it is planned.
+        """
+        if not self.resumed:
+            return
+        short = ['{} ul more in {}'.format(math.ceil(dead_volume - volume), well.well_name) for source in sources
+                 for well, volume in zip(source.wells, source.volumes) if volume < dead_volume - 1e-6]
+        if short:
+            raise ValueError('The resumed run needs {}: top up and add it to the volumes in {}'.format(
+                ', '.join(short), self.path))
+
+    def volume(self, well, volume):
+        "ul in a source well at the start of this run: what the checkpoint left, volume if it does not know the well"
+        return self.volumes.setdefault(well.well_name, volume)
+
+    def refilled(self, well, volume):
+        "Account for a source well that holds volume (ul) once it is filled for the next deck load (see batches)"
+        self.volumes[well.well_name] = volume
+        self.save()
+
+    def start_tips(self, pipette):
+        "Let pipette take its tips after the ones the checkpoint used (the racks are not refilled)"
+        used = self.tips.get(pipette.name, 0)
+        tips = [well for rack in pipette.tip_racks for well in rack.wells()]
+        if used >= len(tips):
+            raise ValueError('{} used all its {} tips'.format(pipette.name, len(tips)))
+        if used:
+            pipette.starting_tip = tips[used]
+
+    def picked_up(self, pipette):
+        self.tips[pipette.name] = self.tips.get(pipette.name, 0) + pipette.channels
+
+    def aspirated(self, well, volume):
+        "Account for volume (ul, all channels) taken from a source well"
+        self.volumes[well.well_name] -= volume
+
+    def returned(self, well, volume):
+        "Account for volume (ul, all channels) blown back into a source well"
+        self.volumes[well.well_name] += volume
+
+    def dispensed_into(self, plate, well):
+        "Account for a dispense into well (name) of plate"
+        self.dispensed.setdefault(str(plate), []).append(well)
+
+    def block_done(self):
+        "Save the progress once a block (one tip) is done, see save"
+        self.save()
+
+    def plate_done(self, plate):
+        self.plates_done.append(plate)
+        self.dispensed.pop(str(plate), None)
+        self.save()
+
+    def describe(self):
+        "One line with the progress the run resumes from, for a CONTROL comment"
+        tips = ', '.join('{} {} tips'.format(name, tips) for name, tips in self.tips.items())
+        filled = ''.join(', {} wells of plate {}'.format(len(wells), plate) for plate, wells in self.dispensed.items())
+        return 'resuming {}: plates {} done{}, {} used'.format(
+            self.path, ', '.join(str(plate) for plate in self.plates_done) or 'none', filled, tips or 'no tips')
+
+    def save(self):
+        """Write the state to the file (on the robot only).
+
+        Called at the end of each block, plate and refill only: the steps
+        in between are counted but not written, as rewriting the file on
+        every dispense would mean thousands of writes to the SD card of
+        the robot per run.
+        """
+        if not self.path or self.protocol.is_simulating():
+            return
+        state = OrderedDict([('run', self.run), ('plates_done', self.plates_done), ('dispensed', self.dispensed), ('tips', self.tips),
+                             ('volumes', OrderedDict((well, round(volume, 2)) for well, volume in self.volumes.items()))])
+        # a run stopped while writing keeps the previous checkpoint
+        with open(self.path + '.tmp', 'w') as checkpoint_file:
+            json.dump(state, checkpoint_file)
+        os.replace(self.path + '.tmp', self.path)
+
+
+def main(argv=None):
+    # the primary antibody protocol imports this module on the robot, which needs neither the dry run nor the simulator
+    from .dryrun import check_steps
+    from .simulation import run_protocol
+
+    parser = argparse.ArgumentParser(description='Progress saved in a checkpoint file and the run that resumes from it')
+    parser.add_argument('checkpoint', help='checkpoint file (copied from the robot)')
+    parser.add_argument('script', nargs='?', help='protocol script of the run: check the resumed run and estimate its time')
+    args = parser.parse_args(argv)
+    try:
+        state = read(args.checkpoint)
+        print('plates done: {}'.format(', '.join(str(plate) for plate in state['plates_done']) or 'none'))
+        for plate, wells in state['dispensed'].items():
+            print('plate {}:     {} wells filled ({})'.format(plate, len(wells), ', '.join(wells)))
+        for name, tips in state['tips'].items():
+            print('tips used:   {} {}'.format(tips, name))
+        print('volume left: {}'.format(', '.join('{} {:.0f} ul'.format(well, volume) for well, volume in state['volumes'].items())))
+        if not args.script:
+            return 0
+        full = run_protocol(args.script, **state['run'])
+        resumed = run_protocol(args.script, checkpoint=os.path.abspath(args.checkpoint), resume=True, **state['run'])
+        findings = check_steps(resumed)
+    except Exception as error:  # a checkpoint of another run or a script without checkpoints is a result
+        print('{}: {}'.format(type(error).__name__, error))
+        return 1
+    print('resumed run: {:.1f} min instead of {:.1f} min, {} tips'.format(resumed.elapsed / 60, full.elapsed / 60, resumed.tips_used()))
+    for finding in findings:
+        print('  step {:>5} {:<9} {}: {}'.format(finding.step, finding.kind, finding.well, finding.message))
+    return 1 if findings else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""Remap per-well plate layouts to multichannel (column-wise) dispenses.
+
+Our plate maps are lists of wells per serum (``plate_dest_map``). For an
+8-channel pipette every contiguous run of rows of one plate column is a
+single dispense: a full column with all 8 nozzles, or a partial column
+(e.g. A9:F9, or the G9:H9 control-serum wells) with the front nozzles of
+an OT-2 ``PARTIAL_COLUMN`` layout, which starts at nozzle H1. The source
+of such a dispense is the same rows of a source column (a deep-well
+plate column or a strip), so every serum is loaded in a whole column.
+"""
+from collections import namedtuple
+
+ROWS = 'ABCDEFGH'
+
+
+class ColumnDispense(namedtuple('ColumnDispense', ['column', 'first_row', 'last_row'])):
+    "Contiguous rows first_row..last_row of one plate column, dispensed in one go"
+
+    @property
+    def nozzles(self):
+        return ROWS.index(self.last_row) - ROWS.index(self.first_row) + 1
+
+    @property
+    def primary_row(self):
+        "Row the primary nozzle goes to: A1 for all 8 nozzles, H1 (front) for partial columns"
+        return self.first_row if self.nozzles == len(ROWS) else self.last_row
+
+    @property
+    def target(self):
+        return '{}{}'.format(self.primary_row, self.column)
+
+    @property
+    def wells(self):
+        rows = ROWS[ROWS.index(self.first_row):ROWS.index(self.last_row) + 1]
+        return ['{}{}'.format(row, self.column) for row in rows]
+
+
+def column_dispenses(wells):
+    "Group well names into ColumnDispenses of contiguous rows, ordered by column"
+    by_column = {}
+    for well in wells:
+        by_column.setdefault(int(well[1:]), set()).add(well[0])
+    dispenses = []
+    for column in sorted(by_column):
+        run = []
+        for row in ROWS:
+            if row in by_column[column]:
+                run.append(row)
+            elif run:
+                dispenses.append(ColumnDispense(column, run[0], run[-1]))
+                run = []
+        if run:
+            dispenses.append(ColumnDispense(column, run[0], run[-1]))
+    return dispenses
+
+
+def column_plan(dest_map):
+    """Remap a per-well destination map to column dispenses.
+
+    Returns {serum: {nozzles: [ColumnDispense, ...]}}, i.e. for every
+    serum the dispenses grouped by the number of nozzles they need, so
+    that each group is done with one nozzle layout and one set of tips.
+    """
+    plan = {}
+    for serum, wells in dest_map.items():
+        groups = {}
+        for dispense in column_dispenses(wells):
+            groups.setdefault(dispense.nozzles, []).append(dispense)
+        plan[serum] = dict(sorted(groups.items(), reverse=True))
+    return plan
+
+
+def source_columns(count, columns_per_plate=12):
+    "Deck positions (source plate index, column number) for count sera, one column each"
+    return [(index // columns_per_plate, index % columns_per_plate + 1) for index in range(count)]
+
+
+def tips_per_plate(plan):
+    "Number of tips one plate of a column plan uses (one tip set per serum and nozzle group)"
+    return sum(nozzles for groups in plan.values() for nozzles in groups)
+
+
+def split_full_columns(wells):
+    """Split well names into the columns all 8 rows of which are in wells and the other wells.
+
+    Returns (column numbers, remaining well names), both in the order of wells.
+    """
+    dispenses = column_dispenses(wells)
+    full = [dispense.column for dispense in dispenses if dispense.nozzles == len(ROWS)]
+    return full, [well for well in wells if int(well[1:]) not in full]
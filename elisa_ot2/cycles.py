@@ -0,0 +1,117 @@
+"""Multi-dispense cycles: one aspiration feeds several dispenses.
+
+``plan_cycles`` packs the dispenses of a block (the same volume into
+every destination, with one tip) into as few aspirations as the pipette
+and its tips can hold. The disposal volume is aspirated with the first
+cycle and stays in the tip until it is blown out at the end of the
+block, so every cycle takes as many dispenses as fit next to it; a
+dispense that does not fit at all is split over several cycles.
+
+``plan_fills`` does the same for fills of different volumes (e.g. the
+PBS of a dilution plate): it streams them through the tip, so a fill
+that does not fit in what is left of one aspiration is finished with
+the next one.
+
+The pipette is the loaded instrument: its max_volume and the volume of
+its tips give the capacity, its min_volume is the default disposal
+volume (as in the Opentrons ``distribute``).
+"""
+import math
+from collections import namedtuple
+
+
+class Cycle(namedtuple('Cycle', ['volume', 'dispenses'])):
+    "One aspiration of volume and the (destination, volume) dispenses it feeds"
+
+    @property
+    def destinations(self):
+        return [destination for destination, volume in self.dispenses]
+
+
+class CyclePlan(namedtuple('CyclePlan', ['cycles', 'disposal', 'capacity'])):
+    "Aspirate/dispense cycles of a block, the first aspiration includes the disposal volume"
+
+    @property
+    def per_cycle(self):
+        "Most dispenses fed by one aspiration"
+        return max(len(cycle.dispenses) for cycle in self.cycles) if self.cycles else 0
+
+    def volumes(self):
+        "Aspiration volumes of the block for TrackedSource.plan, the disposal volume goes back at the end"
+        return [cycle.volume for cycle in self.cycles] + ([-self.disposal] if self.cycles and self.disposal else [])
+
+
+def tip_capacity(pipette):
+    "Volume the pipette can hold with its tips"
+    if not pipette.tip_racks:
+        return pipette.max_volume
+    return min(pipette.max_volume, pipette.tip_racks[0].wells()[0].max_volume)
+
+
+def plan_cycles(pipette, destinations, dispense_volume, disposal_volume=None):
+    """Pack dispense_volume into each of destinations in as few aspirations as possible.
+
+    disposal_volume defaults to the minimum volume of the pipette.
+    Returns a CyclePlan; destinations are dispensed in the order given.
+    """
+    if disposal_volume is None:
+        disposal_volume = pipette.min_volume
+    capacity = tip_capacity(pipette)
+    room = capacity - disposal_volume
+    if room <= 0:
+        raise ValueError('A {} ul disposal volume leaves no room in {} ul tips'.format(disposal_volume, capacity))
+    destinations = list(destinations)
+    per_cycle = int(math.floor(room / dispense_volume + 1e-9))
+    cycles = []
+    if per_cycle == 0:
+        # each dispense takes several aspirations
+        parts = int(math.ceil(dispense_volume / room))
+        for destination in destinations:
+            cycles.extend(Cycle(dispense_volume / parts, [(destination, dispense_volume / parts)]) for part in range(parts))
+    else:
+        for start in range(0, len(destinations), per_cycle):
+            chunk = destinations[start:start + per_cycle]
+            cycles.append(Cycle(dispense_volume * len(chunk), [(destination, dispense_volume) for destination in chunk]))
+    if cycles:
+        cycles[0] = cycles[0]._replace(volume=cycles[0].volume + disposal_volume)
+    return CyclePlan(cycles, disposal_volume, capacity)
+
+
+def plan_fills(pipette, fills, disposal_volume=None):
+    """Pack fills, (destination, volume) pairs of any volume, into as few aspirations as possible.
+
+    A fill that does not fit in what is left of an aspiration is split
+    over the next ones; no part is smaller than the minimum volume of
+    the pipette (unless the fill itself is). disposal_volume defaults to
+    the minimum volume of the pipette. Returns a CyclePlan.
+    """
+    minimum = pipette.min_volume
+    if disposal_volume is None:
+        disposal_volume = minimum
+    capacity = tip_capacity(pipette)
+    room = capacity - disposal_volume
+    if room < 2 * minimum:
+        raise ValueError('A {} ul disposal volume leaves no room in {} ul tips'.format(disposal_volume, capacity))
+    cycles, dispenses, load = [], [], 0.0
+    for destination, volume in fills:
+        left = volume
+        while left > 1e-6:
+            part = min(left, room - load)
+            if 1e-6 < left - part < minimum:
+                # leave enough for a proper dispense with the next aspiration
+                part = left - minimum
+            if part < minimum and part < left:
+                cycles.append(Cycle(load, dispenses))
+                dispenses, load = [], 0.0
+                continue
+            dispenses.append((destination, part))
+            load += part
+            left -= part
+            if room - load < minimum:
+                cycles.append(Cycle(load, dispenses))
+                dispenses, load = [], 0.0
+    if dispenses:
+        cycles.append(Cycle(load, dispenses))
+    if cycles:
+        cycles[0] = cycles[0]._replace(volume=cycles[0].volume + disposal_volume)
+    return CyclePlan(cycles, disposal_volume, capacity)
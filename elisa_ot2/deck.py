@@ -0,0 +1,103 @@
+"""OT-2 deck and labware dimensions used by the offline tools.
+
+Values are taken from the Opentrons labware definitions (and from the
+Greiner JSON shipped in this repo) and only cover the labware our
+protocols load. All distances are in millimetres, volumes in uL.
+"""
+import json
+import os
+from collections import namedtuple
+
+# front-left corner of each deck slot, as in the ot2_standard deck definition
+SLOT_POSITIONS = {
+    '1': (0.0, 0.0), '2': (132.5, 0.0), '3': (265.0, 0.0),
+    '4': (0.0, 90.5), '5': (132.5, 90.5), '6': (265.0, 90.5),
+    '7': (0.0, 181.0), '8': (132.5, 181.0), '9': (265.0, 181.0),
+    '10': (0.0, 271.5), '11': (132.5, 271.5), '12': (265.0, 271.5),
+}
+TRASH_SLOT = '12'
+# centre of the fixed trash, relative to the origin of slot 12
+TRASH_OFFSET = (82.84, 80.0, 82.0)
+
+# rows/columns: grid size; a1: centre of well A1 relative to the slot origin;
+# pitch: (x, y) distance between neighbouring columns/rows; z: height of the
+# well bottom; depth: well depth; height: overall labware height
+LabwareDimensions = namedtuple(
+    'LabwareDimensions',
+    ['display_name', 'rows', 'columns', 'a1', 'pitch', 'z', 'depth', 'volume', 'height', 'is_tiprack'])
+
+LABWARE = {
+    'opentrons_96_tiprack_20ul': LabwareDimensions(
+        'Opentrons 96 Tip Rack 20 uL', 8, 12, (14.38, 74.24), (9.0, 9.0), 25.49, 39.2, 20, 64.69, True),
+    'opentrons_96_tiprack_300ul': LabwareDimensions(
+        'Opentrons 96 Tip Rack 300 uL', 8, 12, (14.38, 74.24), (9.0, 9.0), 5.39, 59.3, 300, 64.49, True),
+    'opentrons_96_tiprack_1000ul': LabwareDimensions(
+        'Opentrons 96 Tip Rack 1000 uL', 8, 12, (14.38, 74.24), (9.0, 9.0), 9.47, 88.0, 1000, 97.47, True),
+    'nest_96_wellplate_2ml_deep': LabwareDimensions(
+        'NEST 96 Deep Well Plate 2mL', 8, 12, (14.3, 74.15), (9.0, 9.0), 3.0, 38.0, 2000, 41.0, False),
+    'nest_1_reservoir_195ml': LabwareDimensions(
+        'NEST 1 Well Reservoir 195 mL', 1, 1, (63.88, 42.74), (0.0, 0.0), 4.55, 25.0, 195000, 31.4, False),
+    'nest_12_reservoir_15ml': LabwareDimensions(
+        'NEST 12 Well Reservoir 15 mL', 1, 12, (14.38, 42.78), (9.0, 0.0), 4.55, 26.85, 15000, 31.4, False),
+    'opentrons_24_tuberack_eppendorf_2ml_safelock_snapcap': LabwareDimensions(
+        'Opentrons 24 Tube Rack with Eppendorf 2 mL Safe-Lock Snapcap',
+        4, 6, (18.21, 75.43), (19.89, 19.28), 41.27, 39.1, 2000, 79.85, False),
+    'opentrons_24_tuberack_eppendorf_1.5ml_safelock_snapcap': LabwareDimensions(
+        'Opentrons 24 Tube Rack with Eppendorf 1.5 mL Safe-Lock Snapcap',
+        4, 6, (18.21, 75.43), (19.89, 19.28), 42.05, 37.8, 1500, 79.85, False),
+    'opentrons_6_tuberack_falcon_50ml_conical': LabwareDimensions(
+        'Opentrons 6 Tube Rack with Falcon 50 mL Conical', 2, 3, (35.5, 60.24), (35.0, 35.0), 7.3, 113.0, 50000, 120.3, False),
+    'opentrons_15_tuberack_falcon_15ml_conical': LabwareDimensions(
+        'Opentrons 15 Tube Rack with Falcon 15 mL Conical', 3, 5, (13.88, 67.74), (25.0, 25.0), 6.85, 117.5, 15000, 124.35, False),
+    'opentrons_96_aluminumblock_generic_pcr_strip_200ul': LabwareDimensions(
+        'Opentrons 96 Well Aluminum Block with Generic PCR Strip 200 uL',
+        8, 12, (14.38, 74.25), (9.0, 9.0), 5.31, 20.3, 200, 25.61, False),
+}
+
+GREINER_JSON = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    'Greiner Bio-One 96 Well Plate Half-Area 175 uL.json')
+
+
+def load_custom_labware(path):
+    "Return the LabwareDimensions of a (regular, grid-shaped) custom labware JSON"
+    with open(path) as labware_file:
+        definition = json.load(labware_file)
+    ordering = definition['ordering']
+    a1 = definition['wells'][ordering[0][0]]
+    pitch_x = definition['wells'][ordering[1][0]]['x'] - a1['x'] if len(ordering) > 1 else 0.0
+    pitch_y = a1['y'] - definition['wells'][ordering[0][1]]['y'] if len(ordering[0]) > 1 else 0.0
+    return LabwareDimensions(
+        definition['metadata']['displayName'], len(ordering[0]), len(ordering),
+        (a1['x'], a1['y']), (round(pitch_x, 2), round(pitch_y, 2)), a1['z'], a1['depth'],
+        a1['totalLiquidVolume'], definition['dimensions']['zDimension'],
+        definition['parameters']['isTiprack'])
+
+
+LABWARE['greinerbioone_96_wellplate_175ul'] = load_custom_labware(GREINER_JSON)
+
+
+def well_names(load_name):
+    "Return the well names of a labware in column-major order (A1, B1, ... H12)"
+    dims = LABWARE[load_name]
+    return ['{}{}'.format(chr(ord('A') + row), column + 1)
+            for column in range(dims.columns) for row in range(dims.rows)]
+
+
+def well_position(load_name, slot, well_name):
+    "Return the (x, y, z) deck coordinates of the bottom centre of a well"
+    dims = LABWARE[load_name]
+    row = ord(well_name[0]) - ord('A')
+    column = int(well_name[1:]) - 1
+    if not (0 <= row < dims.rows and 0 <= column < dims.columns):
+        raise KeyError('{} is not a well of {}'.format(well_name, load_name))
+    slot_x, slot_y = SLOT_POSITIONS[str(slot)]
+    return (slot_x + dims.a1[0] + column * dims.pitch[0],
+            slot_y + dims.a1[1] - row * dims.pitch[1],
+            dims.z)
+
+
+def trash_position():
+    "Return the (x, y, z) deck coordinates of the fixed trash"
+    slot_x, slot_y = SLOT_POSITIONS[TRASH_SLOT]
+    return (slot_x + TRASH_OFFSET[0], slot_y + TRASH_OFFSET[1], TRASH_OFFSET[2])
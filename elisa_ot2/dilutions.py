@@ -0,0 +1,83 @@
+"""Dilution recipes: how much stock and diluent goes into every well.
+
+A recipe table has one row per component (a peptide, a control): name,
+origin_stock (rack), from (its tube), to (destination wells, separated
+by spaces) and dilution (its dilution class). ``recipe`` turns the
+table into every stock and diluent volume in one numpy pass:
+
+    stock   = final_volume / factor(dilution)      per component and well
+    diluent = final_volume - sum(stock)            per well
+
+and checks the result before anything is pipetted. Components that share
+destination wells (a pool, e.g. the 7 peptides of M7) are found from the
+table itself: their well gets the diluent of the whole pool once. Rows
+of the diluent class (e.g. PBS blanks) have no stock.
+"""
+from collections import OrderedDict, namedtuple
+
+import numpy as np
+
+DILUENT = 'PBS'
+
+# volume: stock volume per destination well
+Component = namedtuple('Component', ['name', 'stock', 'source', 'destinations', 'volume'])
+
+
+class WellRecipe(namedtuple('WellRecipe', ['well', 'diluent', 'stock', 'components'])):
+    "Total diluent and stock volumes of a well and the names of the components that go in it"
+
+    @property
+    def pooled(self):
+        return len(self.components) > 1
+
+Recipe = namedtuple('Recipe', ['components', 'wells'])
+
+
+def _destinations(row):
+    wells = row['to']
+    return wells.split() if isinstance(wells, str) else list(wells)
+
+
+def recipe(rows, factors, final_volume, min_volume=0.0, max_volume=None, diluent=DILUENT):
+    """Stock and diluent volumes of a recipe table (rows as dicts, see above), a Recipe.
+
+    factors maps every dilution class to its dilution factor. Raises
+    ValueError for unknown classes, wells whose stocks leave no room for
+    the diluent, stock volumes below min_volume (the smallest volume the pipette can take) and
+    final volumes above max_volume (the wells).
+    """
+    entries = [(row, well) for row in rows for well in _destinations(row)]
+    unknown = sorted(set(row['dilution'] for row, well in entries if row['dilution'] != diluent and row['dilution'] not in factors))
+    if unknown:
+        raise ValueError('No dilution factor for {}'.format(', '.join(unknown)))
+    if max_volume is not None and final_volume > max_volume:
+        raise ValueError('{} ul do not fit in {} ul wells'.format(final_volume, max_volume))
+
+    factor = np.array([np.inf if row['dilution'] == diluent else float(factors[row['dilution']]) for row, well in entries])
+    stock = final_volume / factor
+
+    wells = list(OrderedDict.fromkeys(well for row, well in entries))
+    index = np.array([wells.index(well) for row, well in entries], dtype=int)
+    stock_total = np.zeros(len(wells))
+    np.add.at(stock_total, index, stock)
+    diluent_total = final_volume - stock_total
+
+    for position in np.flatnonzero(diluent_total < 0):
+        names = [row['name'] for row, well in entries if well == wells[position]]
+        raise ValueError('{} ({}): {:.1f} ul of stock leave no room for the diluent in {} ul'.format(
+            wells[position], ', '.join(names), stock_total[position], final_volume))
+    for position in np.flatnonzero((stock > 0) & (stock < min_volume)):
+        row, well = entries[position]
+        raise ValueError('{}: {:.2f} ul of stock is less than the {} ul the pipette can take'.format(
+            row['name'], stock[position], min_volume))
+
+    components = []
+    for position, (row, well) in enumerate(entries):
+        if stock[position] > 0 and (not components or components[-1].name != row['name']):
+            components.append(Component(row['name'], row['origin_stock'], row['from'], [], float(stock[position])))
+        if stock[position] > 0:
+            components[-1].destinations.append(well)
+    return Recipe(components, [
+        WellRecipe(well, float(diluent_total[position]), float(stock_total[position]),
+                   [row['name'] for row, entry_well in entries if entry_well == well and row['dilution'] != diluent])
+        for position, well in enumerate(wells)])
@@ -0,0 +1,138 @@
+"""Dry run: every aspiration and dispense of a script checked against its labware.
+
+``dry_run`` runs a script on the recording stand-in (see ``simulation``),
+which records how high above the bottom of its well each pipetting step
+goes and which wells the nozzles are in, and replays these steps with
+the volume of every well, starting from what the script asks to load in
+its sources (see ``loading``; top ups between deck loads are added
+where the run asks for them, and the plates swapped between deck loads
+start empty, see ``batches``). It reports:
+
+    height     tips below the bottom of a well (they would crash into
+               it) or an aspiration above its top
+    air        an aspiration with the tips above the liquid left once it
+               is done (``geometry.LABWARE_GEOMETRY`` gives the level)
+    exhausted  an aspiration of more than the well holds, e.g. a tube
+               that runs dry at plate 7 or a well nobody loads
+    overflow   a well filled over its volume, e.g. more than the 175 ul
+               of the half-area ELISA plates
+
+Each well is reported once per problem, at its first step. A run takes
+milliseconds, so check every number of plates before a long run:
+
+    python -m elisa_ot2.dryrun --plates 1-9
+    python -m elisa_ot2.dryrun Multiple_Plates_Scripts/elisa-plate-assay-primary-Ab-ot2.py --plates 8
+"""
+import argparse
+import sys
+import time
+from collections import Counter, OrderedDict, namedtuple
+
+from .benchmark import default_scripts, script_key
+from .geometry import LABWARE_GEOMETRY
+from .simulation import load_protocol, run_protocol
+
+TOLERANCE = 1e-6  # ul and mm
+
+# step: index of the step in the run; kind: height, air, exhausted or overflow
+Finding = namedtuple('Finding', ['step', 'kind', 'well', 'message'])
+
+
+def load_wells(ctx, load):
+    "The wells of a load (ctx: a RecordingContext after the run)"
+    labware = ctx.deck[load.slot]
+    wells = labware.wells_by_name()
+    for name in load.wells:
+        if load.channels > 1 and labware.dimensions.rows > 1:
+            # the multichannel takes the load from the whole column of the well
+            for well in labware.columns()[int(name[1:]) - 1]:
+                yield well
+        else:
+            yield wells[name]
+
+
+def check_steps(ctx):
+    "Findings of the pipetting steps of a run (ctx: a RecordingContext after the run)"
+    volumes = {}
+    loads = list(zip(ctx.load_steps, ctx.loads))
+    swaps = list(ctx.swaps)
+    findings = OrderedDict()
+
+    def report(step, kind, well, message):
+        if (kind, well) not in findings:
+            findings[kind, well] = Finding(step.index, kind, well.display_name, message)
+
+    for step in ctx.steps:
+        while swaps and swaps[0][0] <= step.index:
+            slots = swaps.pop(0)[1]
+            for well in [well for well in volumes if well.parent.slot in slots]:
+                del volumes[well]
+        while loads and loads[0][0] <= step.index:
+            load = loads.pop(0)[1]
+            for well in load_wells(ctx, load):
+                volumes[well] = (volumes.get(well, 0.0) if load.top_up else 0.0) + load.volume
+        if not step.wells or step.kind not in ('aspirate', 'dispense', 'blow_out'):
+            continue
+        target = step.target
+        if step.height < -TOLERANCE:
+            report(step, 'height', target, '{} {:.1f} mm below the bottom of the well'.format(step.kind, -step.height))
+        for well, nozzles in Counter(step.wells).items():
+            volume = step.volume * nozzles
+            if step.kind == 'aspirate':
+                left = volumes.get(well, 0.0) - volume
+                level = LABWARE_GEOMETRY[well.parent.load_name].height(left) if well.parent.load_name in LABWARE_GEOMETRY else None
+                if step.height > well.depth + TOLERANCE:
+                    report(step, 'height', well, 'aspirate {:.1f} mm above the top of the well'.format(step.height - well.depth))
+                if left < -TOLERANCE:
+                    report(step, 'exhausted', well, 'aspirate {:.0f} ul, the well holds {:.0f} ul'.format(volume, volume + left))
+                elif level is not None and step.height > level + TOLERANCE:
+                    report(step, 'air', well, 'aspirate {:.0f} ul at {:.1f} mm, the liquid ends at {:.1f} mm'.format(
+                        volume, step.height, level))
+                volumes[well] = max(left, 0.0)
+            else:
+                volumes[well] = volumes.get(well, 0.0) + volume
+                if volumes[well] > well.max_volume + TOLERANCE:
+                    report(step, 'overflow', well, '{} {:.0f} ul, the well holds {:.0f} of {:.0f} ul'.format(
+                        step.kind, volume, volumes[well], well.max_volume))
+    return sorted(findings.values(), key=lambda finding: finding.step)
+
+
+def dry_run(path, **settings):
+    "Findings of the script at path, settings as in simulation.run_protocol"
+    return check_steps(run_protocol(path, **settings))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check every aspiration and dispense of the scripts against their labware')
+    parser.add_argument('scripts', nargs='*', help='protocol scripts (default: every script in the repo)')
+    parser.add_argument('--plates', default='1-9', help='range of number_plates to check, e.g. 1-9 or 8')
+    parser.add_argument('--pipette', type=int, help='pipette of the scripts that let you choose one (50 or 300)')
+    args = parser.parse_args(argv)
+
+    first, _, last = args.plates.partition('-')
+    problems = 0
+    for path in args.scripts or default_scripts():
+        module = load_protocol(path)
+        settings = {'pipette': args.pipette} if args.pipette and hasattr(module, 'pipette') else {}
+        plates = range(int(first), int(last or first) + 1) if hasattr(module, 'number_plates') else [None]
+        print(script_key(path))
+        for number_plates in plates:
+            if number_plates is not None:
+                settings['number_plates'] = number_plates
+            start = time.time()
+            try:
+                findings = dry_run(path, **settings)
+            except Exception as error:  # same as the benchmark: a script that cannot run n plates is a result
+                print('  {:>6} {}: {}'.format(number_plates or '-', type(error).__name__, error))
+                continue
+            milliseconds = (time.time() - start) * 1000
+            print('  {:>6} {} ({:.0f} ms)'.format(number_plates or '-', '{} problems'.format(len(findings)) if findings else 'ok', milliseconds))
+            for finding in findings:
+                print('         step {:>5} {:<9} {}: {}'.format(finding.step, finding.kind, finding.well, finding.message))
+            problems += len(findings)
+        print()
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
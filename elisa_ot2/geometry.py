@@ -0,0 +1,157 @@
+"""Volume/height models of the tubes, wells and reservoirs we aspirate from.
+
+A well is modelled as a stack of sections from its bottom up: frustums
+of a cone (the conical bottom of a tube, or a cylinder when both radii
+are equal) and rectangular frustums (the tapered bottom of a square deep
+well or of a reservoir trough, or a box). Every geometry precomputes a
+volume -> height lookup table (one entry every 0.1 mm), so ``height``
+and ``volume`` are a bisect and a linear interpolation.
+
+Dimensions are inner dimensions in mm, taken from the manufacturer
+drawings (see the notes in LIQUID-LEVEL-ADJUSTMENT-NOTES.md) and the
+Opentrons labware definitions; rounded bottoms are approximated by a
+frustum. Volumes are in uL (= mm3).
+
+``RATE_CALIBRATION`` says how fast each labware can be aspirated from:
+full speed as long as the liquid left above the tips at the end of an
+aspiration (what the geometry gives once the aspirated volume is gone)
+is at least ``full_depth``, then slower down to ``min_rate`` with the
+tips at the surface, see ``RateCalibration``.
+"""
+import bisect
+import math
+from collections import namedtuple
+
+TABLE_STEP = 0.1  # mm between the entries of the lookup tables
+
+
+class Frustum(namedtuple('Frustum', ['bottom_radius', 'top_radius', 'height'])):
+    "Frustum of a cone (a cylinder when both radii are equal)"
+
+    def volume(self, height):
+        "Volume below height (0..self.height) in this section"
+        radius = self.bottom_radius + (self.top_radius - self.bottom_radius) * height / self.height
+        return math.pi * height / 3 * (self.bottom_radius ** 2 + self.bottom_radius * radius + radius ** 2)
+
+
+class RectangularFrustum(namedtuple('RectangularFrustum', ['bottom_x', 'bottom_y', 'top_x', 'top_y', 'height'])):
+    "Section with a rectangular cross section that widens linearly (a box when top and bottom are equal)"
+
+    def volume(self, height):
+        "Volume below height (0..self.height) in this section"
+        x = self.bottom_x + (self.top_x - self.bottom_x) * height / self.height
+        y = self.bottom_y + (self.top_y - self.bottom_y) * height / self.height
+        middle = (self.bottom_x + x) / 2 * (self.bottom_y + y) / 2
+        return height / 6 * (self.bottom_x * self.bottom_y + 4 * middle + x * y)
+
+
+def Cylinder(radius, height):
+    return Frustum(radius, radius, height)
+
+
+def Box(x, y, height):
+    return RectangularFrustum(x, y, x, y, height)
+
+
+class RateCalibration(namedtuple('RateCalibration', ['full_depth', 'min_rate'])):
+    """Aspiration rate of a labware from the liquid above the tip.
+
+    full_depth: mm of liquid that must stay above the tip (at the end of
+    the aspiration) for full speed; below it the rate goes down linearly
+    to min_rate with the tip at the surface (or out of the liquid).
+    """
+
+    def rate(self, depth):
+        "Relative aspiration rate with depth mm of liquid above the tip"
+        if depth >= self.full_depth:
+            return 1.0
+        return self.min_rate + (1.0 - self.min_rate) * max(depth, 0.0) / self.full_depth
+
+
+class WellGeometry:
+    "Stack of sections with a precomputed volume -> height lookup table"
+
+    def __init__(self, name, sections):
+        self.name = name
+        self.sections = tuple(sections)
+        self.depth = round(sum(section.height for section in self.sections), 2)
+        steps = int(round(self.depth / TABLE_STEP))
+        self.heights = tuple(min(step * TABLE_STEP, self.depth) for step in range(steps + 1))
+        self.volumes = tuple(self._volume(height) for height in self.heights)
+
+    def _volume(self, height):
+        total = 0.0
+        for section in self.sections:
+            if height <= section.height:
+                return total + section.volume(max(height, 0.0))
+            total += section.volume(section.height)
+            height -= section.height
+        return total
+
+    @property
+    def max_volume(self):
+        return self.volumes[-1]
+
+    @property
+    def bottom_volume(self):
+        "Volume of the first (conical or tapered) section"
+        return self.sections[0].volume(self.sections[0].height)
+
+    def height(self, volume):
+        "Liquid height (mm above the bottom of the well) of volume, capped at the well depth"
+        if volume <= 0:
+            return 0.0
+        if volume >= self.max_volume:
+            return self.depth
+        index = bisect.bisect_left(self.volumes, volume)
+        low, high = self.volumes[index - 1], self.volumes[index]
+        return self.heights[index - 1] + (volume - low) / (high - low) * (self.heights[index] - self.heights[index - 1])
+
+    def volume(self, height):
+        "Volume below a liquid height (mm above the bottom of the well)"
+        if height <= 0:
+            return 0.0
+        if height >= self.depth:
+            return self.max_volume
+        index = bisect.bisect_left(self.heights, height)
+        low, high = self.heights[index - 1], self.heights[index]
+        return self.volumes[index - 1] + (height - low) / (high - low) * (self.volumes[index] - self.volumes[index - 1])
+
+    def __repr__(self):
+        return 'WellGeometry({!r}, {:.0f} ul, {} mm)'.format(self.name, self.max_volume, self.depth)
+
+
+# 17.8 mm cone from 3.6 to 8.7 mm diameter, then 20 mm of cylinder
+EPPENDORF_1_5ML = WellGeometry('Eppendorf Safe-Lock 1.5 mL', [Frustum(1.8, 4.35, 17.8), Cylinder(4.35, 20.0)])
+# round bottom approximated by a 6 mm frustum
+EPPENDORF_2ML = WellGeometry('Eppendorf Safe-Lock 2.0 mL', [Frustum(2.0, 4.35, 6.0), Cylinder(4.35, 33.1)])
+FALCON_15ML = WellGeometry('Falcon 15 mL conical', [Frustum(1.35, 7.25, 22.0), Cylinder(7.25, 95.5)])
+FALCON_50ML = WellGeometry('Falcon 50 mL conical', [Frustum(2.0, 13.9, 20.0), Cylinder(13.9, 93.0)])
+# square wells with a pyramidal (V) bottom
+NEST_DEEP_WELL_2ML = WellGeometry('NEST 96 deep well 2 mL', [RectangularFrustum(1.0, 1.0, 8.2, 8.2, 4.0), Box(8.2, 8.2, 34.0)])
+# troughs with a V-shaped bottom along their length
+NEST_12_RESERVOIR_15ML = WellGeometry('NEST 12 well reservoir 15 mL', [RectangularFrustum(1.5, 71.2, 8.2, 71.2, 3.0), Box(8.2, 71.2, 23.85)])
+NEST_1_RESERVOIR_195ML = WellGeometry('NEST 1 well reservoir 195 mL', [Box(106.8, 71.2, 25.0)])
+
+# geometry of the wells of each labware we load (tube racks: the tube they are named after)
+LABWARE_GEOMETRY = {
+    'opentrons_24_tuberack_eppendorf_1.5ml_safelock_snapcap': EPPENDORF_1_5ML,
+    'opentrons_24_tuberack_eppendorf_2ml_safelock_snapcap': EPPENDORF_2ML,
+    'opentrons_15_tuberack_falcon_15ml_conical': FALCON_15ML,
+    'opentrons_6_tuberack_falcon_50ml_conical': FALCON_50ML,
+    'nest_96_wellplate_2ml_deep': NEST_DEEP_WELL_2ML,
+    'nest_12_reservoir_15ml': NEST_12_RESERVOIR_15ML,
+    'nest_1_reservoir_195ml': NEST_1_RESERVOIR_195ML,
+}
+
+# aspiration rate of each labware: narrow tubes and wells keep a deeper meniscus than
+# the wide troughs, and their liquid drops more with each aspiration
+RATE_CALIBRATION = {
+    'opentrons_24_tuberack_eppendorf_1.5ml_safelock_snapcap': RateCalibration(1.0, 0.4),
+    'opentrons_24_tuberack_eppendorf_2ml_safelock_snapcap': RateCalibration(1.0, 0.4),
+    'opentrons_15_tuberack_falcon_15ml_conical': RateCalibration(1.0, 0.4),
+    'opentrons_6_tuberack_falcon_50ml_conical': RateCalibration(1.0, 0.4),
+    'nest_96_wellplate_2ml_deep': RateCalibration(1.0, 0.2),
+    'nest_12_reservoir_15ml': RateCalibration(0.5, 0.2),
+    'nest_1_reservoir_195ml': RateCalibration(0.5, 0.2),
+}
@@ -0,0 +1,232 @@
+"""Declarative plate layouts: what goes in each well, as CSV or JSON.
+
+A layout maps labels (a serum, an antigen column, a reagent) to wells.
+The CSV form is the plate grid itself: a header row with the column
+numbers and one line per plate row, each cell the label of what goes in
+that well (empty: nothing):
+
+    ,1,2,3,4
+    A,S1,S1,S2,S2
+    B,S1,S1,CS,CS
+
+The JSON form lists the wells of each label, with A1:B2 style ranges:
+
+    {"S1": ["A1:B2"], "S2": ["A3:A4"], "CS": ["B3", "B4"]}
+
+``parse_layout`` turns either into {label: [well names]}, with labels in
+order of appearance and wells in reading order (row by row). Layouts of
+sources (tube racks, reservoirs) use the same forms; a label with more
+than one source well is a pool, used in order.
+
+In plate maps, numbered sample labels (S1, S2, ...) are the samples of
+one plate: with two samples per plate, S1 and S2 of plate 2 are S3 and
+S4 of the source layout. Any other label (CS, BLOCKING, Ag1) is the same
+source for every plate. ``plate_transfers`` resolves a plate map against
+a source layout into the transfers of one plate, and ``assign_plates``
+says which source each plate gets when plates get different ones
+(e.g. {"ONE": "1-4", "TWO": "5-8"}).
+
+    python -m elisa_ot2.layout plate.csv --sources tubes.csv --plates 8
+"""
+import argparse
+import csv
+import io
+import json
+import re
+import sys
+from collections import OrderedDict, namedtuple
+
+from . import deck
+
+SAMPLE_PREFIX = 'S'
+_WELL = re.compile(r'^([A-Z])(\d+)$')
+
+# plate: plate number (1-based); label: label in the plate map; source: label in the
+# source layout; sources: source wells (a pool, in order); destinations: plate wells
+Transfer = namedtuple('Transfer', ['plate', 'label', 'source', 'sources', 'destinations'])
+
+
+def _split_well(name):
+    match = _WELL.match(name.strip().upper())
+    if not match:
+        raise ValueError('{!r} is not a well name'.format(name))
+    return match.group(1), int(match.group(2))
+
+
+def expand_wells(spec):
+    "Well names of a well ('B3') or a range ('A1:H2', row by row)"
+    if ':' not in spec:
+        row, column = _split_well(spec)
+        return ['{}{}'.format(row, column)]
+    first, last = spec.split(':')
+    (first_row, first_column), (last_row, last_column) = _split_well(first), _split_well(last)
+    rows = [chr(code) for code in range(ord(min(first_row, last_row)), ord(max(first_row, last_row)) + 1)]
+    columns = range(min(first_column, last_column), max(first_column, last_column) + 1)
+    return ['{}{}'.format(row, column) for row in rows for column in columns]
+
+
+def _parse_csv(text):
+    lines = [line for line in csv.reader(io.StringIO(text.strip())) if any(cell.strip() for cell in line)]
+    header = [cell.strip() for cell in lines[0][1:]]
+    layout = OrderedDict()
+    for line in lines[1:]:
+        row = line[0].strip().upper()
+        for column, cell in zip(header, line[1:]):
+            label = cell.strip()
+            if label:
+                well = '{}{}'.format(row, column)
+                _split_well(well)
+                layout.setdefault(label, []).append(well)
+    return layout
+
+
+def _parse_json(text):
+    layout = OrderedDict()
+    for label, specs in json.loads(text, object_pairs_hook=OrderedDict).items():
+        if isinstance(specs, str):
+            specs = [specs]
+        layout[label] = [well for spec in specs for well in expand_wells(spec)]
+    return layout
+
+
+def parse_layout(text):
+    "Return {label: [well names]} of a CSV grid or JSON layout"
+    layout = _parse_json(text) if text.strip().startswith('{') else _parse_csv(text)
+    seen = {}
+    for label, wells in layout.items():
+        for well in wells:
+            if well in seen and seen[well] != label:
+                raise ValueError('well {} is in the layout twice ({} and {})'.format(well, seen[well], label))
+            seen[well] = label
+    return layout
+
+
+def load_layout(path):
+    with open(path) as layout_file:
+        return parse_layout(layout_file.read())
+
+
+def parse_table(text):
+    "Rows of a CSV table with a header line, as a list of dicts (cells stripped)"
+    lines = [line for line in csv.reader(io.StringIO(text.strip())) if any(cell.strip() for cell in line)]
+    header = [cell.strip() for cell in lines[0]]
+    return [OrderedDict(zip(header, [cell.strip() for cell in line])) for line in lines[1:]]
+
+
+def validate(layout, labware):
+    """Check that every well of layout exists in labware and return the layout.
+
+    labware is a loaded labware or a load name (checked against its
+    labware definition, see deck).
+    """
+    if isinstance(labware, str):
+        valid, name = set(deck.well_names(labware)), labware
+    else:
+        valid, name = set(labware.wells_by_name()), getattr(labware, 'load_name', str(labware))
+    wells = layout.values() if isinstance(layout, dict) else [layout]
+    unknown = [well for label_wells in wells for well in label_wells if well not in valid]
+    if unknown:
+        raise ValueError('{} has no well {}'.format(name, ', '.join(unknown)))
+    return layout
+
+
+def columns(wells):
+    "Plate columns (numbers) the wells are in, in order"
+    return sorted(set(_split_well(well)[1] for well in wells))
+
+
+def samples_per_plate(plate_map):
+    return sum(1 for label in plate_map if sample_index(label, 1, 1) is not None)
+
+
+def sample_index(label, plate, per_plate):
+    """0-based index of the sample a numbered plate-map label stands for on plate, None for other labels"""
+    if not (label.startswith(SAMPLE_PREFIX) and label[len(SAMPLE_PREFIX):].isdigit()):
+        return None
+    return (plate - 1) * per_plate + int(label[len(SAMPLE_PREFIX):]) - 1
+
+
+def plate_transfers(plate_map, source_map, plate):
+    "Transfers of plate (1-based) of a plate map from a source layout"
+    per_plate = samples_per_plate(plate_map)
+    transfers = []
+    for label, destinations in plate_map.items():
+        index = sample_index(label, plate, per_plate)
+        source = label if index is None else '{}{}'.format(SAMPLE_PREFIX, index + 1)
+        if source not in source_map:
+            raise ValueError('plate {} needs {} but the source layout has no {}'.format(plate, label, source))
+        transfers.append(Transfer(plate, label, source, source_map[source], destinations))
+    return transfers
+
+
+def transfer_list(plate_map, source_map, plates):
+    "Transfers of plates 1..plates"
+    return [transfer for plate in range(1, plates + 1) for transfer in plate_transfers(plate_map, source_map, plate)]
+
+
+def plate_numbers(spec):
+    "Plate numbers of '1-4', '1,3,5', '2', an int or a list of numbers"
+    if isinstance(spec, int):
+        return [spec]
+    if not isinstance(spec, str):
+        return [int(plate) for plate in spec]
+    plates = []
+    for part in spec.split(','):
+        first, _, last = part.strip().partition('-')
+        if not first.isdigit() or not (last or first).isdigit():
+            raise ValueError('{!r} is not a plate range'.format(spec))
+        plates.extend(range(int(first), int(last or first) + 1))
+    return plates
+
+
+def assign_plates(assignment, plates, source_map=None):
+    """{label: [plate numbers]} of an assignment of labels to plates ({"ONE": "1-4", "TWO": "5-8"}).
+
+    Plates after plates (the number of plates of the run) are left out.
+    Raises ValueError when a plate of the run gets no label or more than
+    one, or a label is not in source_map.
+    """
+    assigned = OrderedDict()
+    seen = {}
+    for label, spec in assignment.items():
+        if source_map is not None and label not in source_map:
+            raise ValueError('plates {} get {} but the source layout has no {}'.format(spec, label, label))
+        for plate in plate_numbers(spec):
+            if plate in seen:
+                raise ValueError('plate {} gets both {} and {}'.format(plate, seen[plate], label))
+            seen[plate] = label
+        assigned[label] = sorted(plate for plate in plate_numbers(spec) if plate <= plates)
+    missing = [str(plate) for plate in range(1, plates + 1) if plate not in seen]
+    if missing:
+        raise ValueError('plate {} gets no {}'.format(', '.join(missing), ' / '.join(assignment) or 'source'))
+    return OrderedDict((label, numbers) for label, numbers in assigned.items() if numbers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check a plate layout and list its transfers')
+    parser.add_argument('plate_map', help='plate map (CSV grid or JSON)')
+    parser.add_argument('--sources', help='source layout (CSV grid or JSON)')
+    parser.add_argument('--labware', default='greinerbioone_96_wellplate_175ul', help='labware of the plate map')
+    parser.add_argument('--source-labware', help='labware of the source layout')
+    parser.add_argument('--plates', type=int, default=1)
+    args = parser.parse_args(argv)
+
+    try:
+        plate_map = validate(load_layout(args.plate_map), args.labware)
+        source_map = load_layout(args.sources) if args.sources else None
+        if source_map is not None and args.source_labware:
+            validate(source_map, args.source_labware)
+        transfers = transfer_list(plate_map, source_map, args.plates) if source_map is not None else []
+    except ValueError as error:
+        parser.error(str(error))
+    if source_map is None:
+        for label, wells in plate_map.items():
+            print('{:<12} {:>3} wells  {}'.format(label, len(wells), ' '.join(wells)))
+        return 0
+    for transfer in transfers:
+        print('plate {:<3} {:<6} {:<6} {:<10} -> {}'.format(
+            transfer.plate, transfer.label, transfer.source, '+'.join(transfer.sources), ' '.join(transfer.destinations)))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
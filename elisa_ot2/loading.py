@@ -0,0 +1,133 @@
+"""Loading sheet: what to put in every source well before a run.
+
+The scripts work out how much of each reagent their sources need (dead
+volume and safety volume included) and call ``load_source``, which
+comments it as a CONTROL line, as before, and records it on the
+recording stand-in (see ``simulation``). ``script_loads`` runs a
+script on the stand-in for a given number of plates and pipette and
+collects every load, so the sheet can be printed (or saved as CSV) and
+checked at the bench before the protocol is even uploaded:
+
+    python -m elisa_ot2.loading --plates 8
+    python -m elisa_ot2.loading --plates 8 --pipette 300 --csv loading.csv
+"""
+import argparse
+import csv
+import math
+import sys
+from collections import namedtuple
+
+
+SCRIPT_DIR = 'Multiple_Plates_Scripts/'
+
+# volume: ul per well; wells: well names (with channels > 1 each one stands for its whole
+# column, the multichannel aspirates from all 8 wells of it); top_up: the volume goes on top of
+# what the wells have left (between two deck loads, see batches)
+Load = namedtuple('Load', ['slot', 'labware', 'wells', 'reagent', 'volume', 'channels', 'top_up'])
+# script: repo-relative script name, plates: number_plates it was planned for
+SheetLine = namedtuple('SheetLine', ['script', 'plates', 'load'])
+
+
+def describe(load):
+    "Human readable wells of a load"
+    if load.channels > 1:
+        return '{} {}'.format('columns' if len(load.wells) > 1 else 'column', ', '.join(well[1:] for well in load.wells))
+    return ', '.join(load.wells)
+
+
+def load_source(protocol, labware, wells, reagent, volume, channels=1, top_up=False):
+    """Ask for volume (ul per well, rounded up) of reagent in wells (names) of labware.
+
+    With top_up the volume is added to what the wells have left.
+    Comments a CONTROL line and, on the recording stand-in, records a Load
+    (see RecordingContext.record_load). Returns the Load.
+    """
+    load = Load(str(labware.parent), labware.load_name, list(wells), reagent, int(math.ceil(volume)), channels, top_up)
+    protocol.comment('CONTROL: {} on slot {}, {}: {}{} ul of {}{}'.format(
+        load.labware, load.slot, describe(load), 'add ' if top_up else '', load.volume, reagent,
+        ' per well' if len(load.wells) > 1 or channels > 1 else ''))
+    if hasattr(protocol, 'record_load'):
+        protocol.record_load(load)
+    return load
+
+
+def total_volume(load):
+    "ul of reagent the load needs in all"
+    return load.volume * len(load.wells) * (8 if load.channels > 1 else 1)
+
+
+def sheet_scripts():
+    from .benchmark import default_scripts, script_key
+    return [path for path in default_scripts() if script_key(path).startswith(SCRIPT_DIR)]
+
+
+def script_loads(path, number_plates=None, pipette=None):
+    """SheetLines of every load of the script at path.
+
+    number_plates and pipette are set when the script has these settings.
+    A script that cannot run that many plates raises ValueError.
+    """
+    # the protocols import load_source on the robot, which needs neither the benchmark nor the stand-in simulator
+    from .benchmark import script_key
+    from .simulation import load_protocol, run_protocol
+
+    module = load_protocol(path)
+    settings = {}
+    if number_plates is not None and hasattr(module, 'number_plates'):
+        settings['number_plates'] = number_plates
+    if pipette is not None and hasattr(module, 'pipette'):
+        settings['pipette'] = pipette
+    ctx = run_protocol(path, **settings)
+    plates = settings.get('number_plates', getattr(module, 'number_plates', None))
+    return [SheetLine(script_key(path), plates, load) for load in ctx.loads]
+
+
+def write_csv(lines, out):
+    writer = csv.writer(out)
+    writer.writerow(['script', 'plates', 'slot', 'labware', 'wells', 'reagent', 'ul_per_well', 'ul_total', 'top_up'])
+    for line in lines:
+        load = line.load
+        writer.writerow([line.script, line.plates or '', load.slot, load.labware, describe(load), load.reagent,
+                         load.volume, total_volume(load), 'yes' if load.top_up else ''])
+
+
+def print_sheet(lines, out=sys.stdout):
+    script = None
+    for line in lines:
+        if line.script != script:
+            script = line.script
+            out.write('\n{}{}\n'.format(script, ' -- {} plates'.format(line.plates) if line.plates else ''))
+            out.write('  [ ] {:>4}  {:<52} {:<10} {:>8} {:>9}  {}\n'.format('slot', 'labware', 'reagent', 'ul/well', 'ul total', 'wells'))
+        load = line.load
+        # top ups (between deck loads) go on top of what is left
+        out.write('  [ ] {:>4}  {:<52} {:<10} {:>8} {:>9}  {}\n'.format(
+            load.slot, load.labware, load.reagent, '+{}'.format(load.volume) if load.top_up else load.volume,
+            total_volume(load), describe(load)))
+
+
+def main(argv=None):
+    from .benchmark import script_key
+
+    parser = argparse.ArgumentParser(description='Loading sheet (volume of every source well) of the protocol scripts')
+    parser.add_argument('scripts', nargs='*', help='protocol scripts (default: every Multiple_Plates script)')
+    parser.add_argument('--plates', type=int, help='number_plates of the run (default: the setting of each script)')
+    parser.add_argument('--pipette', type=int, help='pipette of the scripts that let you choose one (50 or 300)')
+    parser.add_argument('--csv', help='also write the sheet to this CSV file')
+    args = parser.parse_args(argv)
+
+    lines, failed = [], 0
+    for path in args.scripts or sheet_scripts():
+        try:
+            lines.extend(script_loads(path, args.plates, args.pipette))
+        except ValueError as error:  # e.g. more plates than the script can run: the other scripts still get their sheet
+            print('{}: {}'.format(script_key(path), error))
+            failed += 1
+    print_sheet(lines)
+    if args.csv:
+        with open(args.csv, 'w', newline='') as out:
+            write_csv(lines, out)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""Deck packer: the deck slot of every labware of a run.
+
+The scripts used to load their ELISA plates in slots 1 to number_plates,
+the tiprack in slot 10 and the source (tube rack, deep well plate or
+reservoir) in slot 11, with extra racks in whatever slots were left.
+``pack_deck`` takes how many plates, tipracks and sources a run needs
+and assigns the 11 slots (12 is the trash) itself:
+
+* the sources go where the plates around them are closest (distance
+  between slot centres, see ``deck.SLOT_POSITIONS``), since every
+  aspiration is a trip from a source to a plate and back;
+* the plates take the slots closest to a source, numbered in slot order;
+* the tipracks take the remaining slots closest to a source.
+
+With keep_behind_clear (partial nozzle layouts, whose unused nozzles
+pass over the slot behind the labware they go to) no tiprack or source
+goes right behind a plate, and no tiprack right behind a source.
+``fixed_deck`` gives the old layout, for the scripts run with
+``auto_slots = False``. Both raise ValueError when the run does not fit
+on the deck. To see the deck of a run:
+
+    python -m elisa_ot2.packing --plates 9 --tipracks 1 --sources 1
+"""
+import argparse
+import itertools
+import math
+import sys
+from collections import namedtuple
+
+from . import deck
+
+DECK_SLOTS = tuple(str(slot) for slot in range(1, 12))
+BEHIND = 3  # slot n + 3 is right behind slot n
+
+# slots (strings, as the robot takes them) of the plates (plate 1 first), tipracks and sources
+DeckPlan = namedtuple('DeckPlan', ['plates', 'tipracks', 'sources'])
+
+
+def _distance(a, b):
+    (ax, ay), (bx, by) = deck.SLOT_POSITIONS[a], deck.SLOT_POSITIONS[b]
+    return math.hypot(ax - bx, ay - by)
+
+
+def _behind(slot):
+    return str(int(slot) + BEHIND)
+
+
+def _fits(plates, tipracks, sources):
+    "True when no tiprack or source is right behind a plate and no tiprack right behind a source"
+    tall = set(tipracks) | set(sources)
+    return (not any(_behind(slot) in tall for slot in plates)
+            and not any(_behind(slot) in tipracks for slot in sources))
+
+
+def _no_room(plates, tipracks, sources):
+    return ValueError('{} plates, {} tipracks and {} sources do not fit on the deck'.format(plates, tipracks, sources))
+
+
+def fixed_deck(plates, tipracks=1, sources=1, keep_behind_clear=False):
+    """The old deck: plates in slots 1 to plates, the first tiprack in 10 and the first source in 11.
+
+    Further tipracks and sources take the free slots, highest first.
+    """
+    free = [str(slot) for slot in range(9, plates, -1) if not keep_behind_clear or slot - BEHIND > plates]
+    if plates > 9 or tipracks - 1 + sources - 1 > len(free):
+        raise _no_room(plates, tipracks, sources)
+    tiprack_slots = ['10'] + [free.pop(0) for rack in range(1, tipracks)]
+    source_slots = ['11'] + [free.pop(0) for source in range(1, sources)]
+    return DeckPlan(tuple(str(slot) for slot in range(1, plates + 1)), tuple(tiprack_slots), tuple(source_slots))
+
+
+def _cost(slot, sources):
+    return min(_distance(slot, source) for source in sources)
+
+
+def pack_deck(plates, tipracks=1, sources=1, keep_behind_clear=False):
+    """DeckPlan of a run, see above.
+
+    Among the deck plans that fit, the one with the least plate to source
+    distance (then tiprack to source distance) wins.
+    """
+    if plates + tipracks + sources > len(DECK_SLOTS):
+        raise _no_room(plates, tipracks, sources)
+    return _pack(plates, tipracks, sources, keep_behind_clear)
+
+
+_packed = {}
+
+
+def _pack(plates, tipracks, sources, keep_behind_clear):
+    # the scripts ask for the same few decks over and over (e.g. in the benchmark)
+    key = (plates, tipracks, sources, keep_behind_clear)
+    if key in _packed:
+        return _packed[key]
+    best, best_cost = None, None
+    for source_slots in itertools.combinations(DECK_SLOTS, sources):
+        rest = sorted((slot for slot in DECK_SLOTS if slot not in source_slots), key=lambda slot: _cost(slot, source_slots))
+        for plate_slots in itertools.combinations(rest, plates):
+            free = [slot for slot in rest if slot not in plate_slots]
+            if keep_behind_clear:
+                free = [slot for slot in free if _fits(plate_slots, [slot], source_slots)]
+            if len(free) < tipracks:
+                continue
+            tiprack_slots = free[:tipracks]
+            cost = (round(sum(_cost(slot, source_slots) for slot in plate_slots), 3),
+                    round(sum(_cost(slot, source_slots) for slot in tiprack_slots), 3))
+            if best_cost is None or cost < best_cost:
+                best = DeckPlan(tuple(sorted(plate_slots, key=int)), tuple(tiprack_slots), source_slots)
+                best_cost = cost
+    if best is None:
+        raise _no_room(plates, tipracks, sources)
+    _packed[key] = best
+    return best
+
+
+def describe(plan):
+    "One line with the slots of a DeckPlan, for a CONTROL comment"
+    plates = 'plate 1 in slot' if len(plan.plates) == 1 else 'plates 1-{} in slots'.format(len(plan.plates))
+    return 'ELISA {} {}; tipracks in {}; sources in {}'.format(
+        plates, ', '.join(plan.plates), ', '.join(plan.tipracks), ', '.join(plan.sources))
+
+
+def print_deck(plan, out=sys.stdout):
+    "The deck as seen from the front of the robot (slot 10 at the back left)"
+    names = {deck.TRASH_SLOT: 'trash'}
+    names.update((slot, 'plate {}'.format(number)) for number, slot in enumerate(plan.plates, 1))
+    names.update((slot, 'tiprack') for slot in plan.tipracks)
+    names.update((slot, 'source {}'.format(number) if len(plan.sources) > 1 else 'source')
+                 for number, slot in enumerate(plan.sources, 1))
+    for row in (10, 7, 4, 1):
+        out.write('  '.join('{:>2} {:<9}'.format(slot, names.get(str(slot), '-')) for slot in range(row, row + 3)) + '\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Deck slots of the plates, tipracks and sources of a run')
+    parser.add_argument('--plates', type=int, default=9)
+    parser.add_argument('--tipracks', type=int, default=1)
+    parser.add_argument('--sources', type=int, default=1)
+    parser.add_argument('--keep-behind-clear', action='store_true', help='partial nozzle layouts (multichannel primary antibody)')
+    parser.add_argument('--fixed', action='store_true', help='the old deck (auto_slots = False)')
+    args = parser.parse_args(argv)
+    try:
+        plan = (fixed_deck if args.fixed else pack_deck)(args.plates, args.tipracks, args.sources, args.keep_behind_clear)
+    except ValueError as error:
+        print(error)
+        return 1
+    print(describe(plan))
+    print_deck(plan)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
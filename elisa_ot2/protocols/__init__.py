@@ -0,0 +1,24 @@
+"""Protocol bodies shared by the scripts of both folders.
+
+The prep, blocking, secondary and primary antibody scripts of
+``Multiple_Plates_Scripts`` and ``8_plates_Scrips`` used to be diverged
+copies of each other. Their ``run`` now lives here, one module per
+protocol, and a script is a thin entry point: the metadata the OT-2 app
+reads, the explanation of the protocol, its settings and layouts, and
+
+    def run(protocol: protocol_api.ProtocolContext):
+        prep.run(protocol, globals())
+
+Each module lists the settings it reads (``SETTINGS``); a script must set
+all of them, so a fix or a speed-up reaches every script at once and the
+folders only differ in their settings.
+"""
+from types import SimpleNamespace
+
+
+def script_settings(namespace, names):
+    "The settings names of a script (its globals()), raises ValueError for the ones it does not set"
+    missing = [name for name in names if name not in namespace]
+    if missing:
+        raise ValueError('The script does not set {}'.format(', '.join(missing)))
+    return SimpleNamespace(**dict((name, namespace[name]) for name in names))
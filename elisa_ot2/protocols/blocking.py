@@ -0,0 +1,11 @@
+"""Blocking: blocking solution (TBS with 5% milk) from a 195 mL reservoir in every plate."""
+from . import bulk
+
+SETTINGS = bulk.SETTINGS
+RESERVOIR = 'nest_1_reservoir_195ml'
+DEAD_VOLUME = 13200  # ul the tips cannot reach in the flat 195 mL trough
+IMMERSION_DEPTH = 3
+
+
+def run(protocol, namespace):
+    return bulk.run(protocol, namespace, RESERVOIR, DEAD_VOLUME, IMMERSION_DEPTH)
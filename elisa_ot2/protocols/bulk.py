@@ -0,0 +1,52 @@
+"""Blocking and secondary antibody: a reagent from a reservoir in whole plate columns (see ``bulkfill``)."""
+from ..batches import load_plates, plan_batch
+from ..bulkfill import bulk_fill, fill_jobs, load_jobs, tip_loads
+from ..layout import parse_layout, validate
+from ..packing import describe
+from ..runlog import RunLog
+from ..tips import racks_needed
+from . import script_settings
+
+SETTINGS = ('number_plates', 'pipette', 'pipette_position', 'dispensevolume', 'one_tip', 'auto_slots',
+            'log_level', 'debug_log', 'plate_layout', 'reservoir_layout', 'plate_assignment')
+
+
+def run(protocol, namespace, reservoir, dead_volume, immersion_depth):
+    """Fill the plates of a script (namespace: its globals()) from reservoir (load name).
+
+    Every reservoir well keeps dead_volume, the tips go immersion_depth
+    into the liquid.
+    """
+    s = script_settings(namespace, SETTINGS)
+    log = RunLog(protocol, s.log_level, s.debug_log)
+    plate_map = validate(parse_layout(s.plate_layout), 'greinerbioone_96_wellplate_175ul')
+    reservoir_map = validate(parse_layout(s.reservoir_layout), reservoir)
+    # which reagent each plate gets (all of them the one of the plate layout unless plate_assignment says otherwise)
+    jobs = fill_jobs(plate_map, reservoir_map, s.number_plates, s.plate_assignment)
+
+    # DECK: slots of the plates, tipracks and reservoir, see python -m elisa_ot2.packing; more plates than
+    # fit on the deck go in deck loads (python -m elisa_ot2.batches), each one with its own tips
+    batch = plan_batch(s.number_plates, lambda loads: racks_needed(8 * sum(tip_loads(load_jobs(jobs, load), s.one_tip)
+                                                                           for load in loads)), 1, s.auto_slots)
+    deck_plan = batch.deck
+    protocol.comment("CONTROL: {}".format(describe(deck_plan)))
+    if len(batch.loads) > 1:
+        protocol.comment("CONTROL: {}".format(batch.describe()))
+    # LOAD tips and pipette
+    tipracks = [protocol.load_labware('opentrons_96_tiprack_300ul', slot) for slot in deck_plan.tipracks]
+    pipette_multi = protocol.load_instrument('p{}_multi'.format(s.pipette), s.pipette_position, tip_racks=tipracks)
+    # LOAD the reservoir
+    stock_reservoir = protocol.load_labware(reservoir, deck_plan.sources[0])
+
+    # LOAD our ELISA plates (the plates of every deck load share the labware of their slots)
+    elisa_plates = load_plates(protocol, batch)
+
+    # before the robot moves we plan the cycles of a plate (as many columns per aspiration as the tips
+    # hold, see elisa_ot2.cycles) and the aspiration schedule of the reservoir: for each plate the first
+    # time we aspirate an extra safety / disposal volume (the minimum volume of the pipette), then we
+    # keep aspirating what we dispense, and we blow out the safety volume at the end of the plate
+    # (this is a fix for P300 pipette tips problem). Each reagent goes in as few of its reservoir wells
+    # as it fits in, each one with just what we take from it plus its dead volume: when a well is done
+    # we go on with the next one, nothing is left to carry over (see elisa_ot2/bulkfill.py)
+    return bulk_fill(protocol, pipette_multi, stock_reservoir, reservoir_map, elisa_plates, jobs, s.dispensevolume, log,
+                     one_tip=s.one_tip, batch=batch, dead_volume=dead_volume, immersion_depth=immersion_depth)
@@ -0,0 +1,93 @@
+"""Plate prep: each antigen column of a deep well plate in its replicate columns of every plate."""
+from ..batches import load_plates, plan_batch
+from ..cycles import plan_cycles
+from ..geometry import NEST_DEEP_WELL_2ML, RATE_CALIBRATION
+from ..layout import columns, parse_layout, plate_transfers, validate
+from ..loading import load_source
+from ..packing import describe
+from ..runlog import RunLog
+from ..tips import racks_needed
+from ..tracking import TrackedSource, schedule_summary
+from . import script_settings
+
+SETTINGS = ('number_plates', 'pipette', 'pipette_position', 'dispensevolume', 'mix_stock', 'auto_tipracks', 'auto_slots',
+            'log_level', 'debug_log', 'plate_layout', 'stock_layout')
+STOCK = 'nest_96_wellplate_2ml_deep'
+DEAD_VOLUME = 200  # ul left in each antigen well of the deep well plate
+IMMERSION_DEPTH = 8  # mm the tips go below the surface, never closer than 0.1 mm to the bottom
+MIX = (5, 50)  # repetitions and ul of the mix of each antigen column before its first aspiration (mix_stock)
+
+
+def run(protocol, namespace):
+    "Run the plate prep with the settings of a script (namespace: its globals())"
+    s = script_settings(namespace, SETTINGS)
+    log = RunLog(protocol, s.log_level, s.debug_log)
+    plate_map = validate(parse_layout(s.plate_layout), 'greinerbioone_96_wellplate_175ul')
+    stock_map = validate(parse_layout(s.stock_layout), STOCK)
+    # DEFINE our blocks of destination columns as per the plate layout (one block per antigen column)
+    transfers = plate_transfers(plate_map, stock_map, 1)
+    dest_columns = [columns(transfer.destinations) for transfer in transfers]
+
+    # DECK: one column of tips per antigen column (and deck load), see python -m elisa_ot2.tips and elisa_ot2.packing;
+    # more plates than fit on the deck go in deck loads (python -m elisa_ot2.batches)
+    batch = plan_batch(s.number_plates, lambda loads: racks_needed(8 * len(transfers) * len(loads)) if s.auto_tipracks else 1,
+                       1, s.auto_slots)
+    deck_plan = batch.deck
+    protocol.comment("CONTROL: {}".format(describe(deck_plan)))
+    if len(batch.loads) > 1:
+        protocol.comment("CONTROL: {}".format(batch.describe()))
+    # LOAD tips and pipette
+    tipracks = [protocol.load_labware('opentrons_96_tiprack_300ul', slot) for slot in deck_plan.tipracks]
+
+    pipette_multi = protocol.load_instrument('p{}_multi'.format(s.pipette), s.pipette_position, tip_racks=tipracks)
+    # LOAD the stock plate containing antigens
+    stock_plate = protocol.load_labware(STOCK, deck_plan.sources[0])
+    # maybe also try usascientific_96_wellplate_2.4ml_deep
+    replicates = max(len(columns(wells)) for wells in plate_map.values())
+    # LOAD our ELISA plates (the plates of every deck load share the labware of their slots)
+    elisa_plates = load_plates(protocol, batch)
+
+    # each antigen column keeps track of its remaining volume, aspiration height and rate (from one deck load to the next)
+    sources = [TrackedSource([stock_plate.wells_by_name()[well] for well in transfer.sources], 0.0,
+                             NEST_DEEP_WELL_2ML.height, immersion_depth=IMMERSION_DEPTH, min_clearance=0.1,
+                             calibration=RATE_CALIBRATION[STOCK])
+               for transfer in transfers]
+    for index, load in enumerate(batch.loads):
+        # every well of the column of each antigen (see python -m elisa_ot2.loading), after the first
+        # deck load topped up with what the next one takes
+        reservoirFill = DEAD_VOLUME + replicates * s.dispensevolume * len(load)
+        for (antigen, wells), source in zip(stock_map.items(), sources):
+            load_source(protocol, stock_plate, wells, antigen, source.refill([reservoirFill])[0], channels=8, top_up=index > 0)
+        if index:
+            batch.swap(protocol, index)
+
+        # before the robot moves we plan the cycles and the aspiration schedule of each antigen column:
+        # as many dispenses per aspiration as the tips hold, the first time with an extra safety / disposal volume
+        cycle_plans = []
+        schedules = []
+        for source, destination in zip(sources, dest_columns):
+            dispenses = [(plate_number, col) for plate_number in load for col in destination]
+            cycle_plans.append(plan_cycles(pipette_multi, dispenses, s.dispensevolume))
+            schedules.append(source.plan(cycle_plans[-1].volumes()))
+
+        # we will now iterate blockwise so as to use a single tip for all replicates
+        # of the same antigen
+        for cycle_plan, schedule in zip(cycle_plans, schedules):
+            log.debug('schedules', summary=schedule_summary(schedule))
+            pipette_multi.pick_up_tip()
+            if s.mix_stock:
+                pipette_multi.mix(*MIX, schedule[0].location())
+            for cycle, aspiration in zip(cycle_plan.cycles, schedule):
+                pipette_multi.aspirate(aspiration.volume, aspiration.location(), rate=aspiration.rate)
+                log.debug('aspirations', well=aspiration.well.well_name, volume=aspiration.volume,
+                          clearance=aspiration.clearance, rate=aspiration.rate)
+                for (plate_number, col), volume in cycle.dispenses:
+                    pipette_multi.dispense(volume, elisa_plates[plate_number - 1].wells_by_name()['A{}'.format(col)], rate=1.0)
+                    log.debug('column dispenses', plate_number, column=col, volume=volume)
+            # when we finish this block we blow out the safety volume back to the source
+            pipette_multi.blow_out(schedule[0].well)
+            # dispose the tips
+            pipette_multi.drop_tip()
+        # every plate gets its last column with the last antigen
+        for plate_number in load:
+            log.plate_done(plate_number)
@@ -0,0 +1,185 @@
+"""Primary antibody: every serum of the tube rack in its wells of its plate, with a single-channel pipette."""
+import math
+from collections import OrderedDict
+from itertools import groupby
+
+from ..batches import load_plates, plan_batch
+from ..checkpoint import Checkpoint
+from ..cycles import plan_cycles
+from ..geometry import EPPENDORF_1_5ML, RATE_CALIBRATION
+from ..layout import parse_layout, plate_transfers, sample_index, samples_per_plate, validate
+from ..loading import load_source
+from ..packing import describe
+from ..routing import plan_dispense_route
+from ..runlog import RunLog
+from ..tips import racks_needed
+from ..tracking import TrackedSource, schedule_summary
+from . import script_settings
+
+SETTINGS = ('number_plates', 'pipette_position', 'optimise_route', 'auto_tipracks', 'auto_slots', 'log_level', 'debug_log',
+            'checkpoint', 'resume', 'plate_layout', 'tube_layout', 'immersion_depth', 'bottom_clearance_default')
+# a resumed run must have the plates, deck and layouts of the run of its checkpoint
+RUN_SETTINGS = ('number_plates', 'auto_tipracks', 'auto_slots', 'plate_layout', 'tube_layout')
+
+
+def run(protocol, namespace):
+    "Run the primary antibody protocol with the settings of a script (namespace: its globals())"
+    s = script_settings(namespace, SETTINGS)
+    # logic for liquid adjustment level is explained in the
+    # LIQUID-LEVEL-ADJUSTMENT-NOTES.md file in the repo
+    # the geometry models the conical section as well, so we only aspirate slowly (at the default
+    # clearance) when the liquid is too shallow to immerse the tip
+    log = RunLog(protocol, s.log_level, s.debug_log)
+    checkpoint = Checkpoint(protocol, s.checkpoint, [(name, getattr(s, name)) for name in RUN_SETTINGS], s.resume)
+    initial_volume_experimental_antibodies = 1200
+    dispensevolume = 25
+    safeVolume = 50 # extra volume aspirated with the first load, blown back into the source
+    plate_map = parse_layout(s.plate_layout)
+    tube_map = parse_layout(s.tube_layout)
+
+    # control serum: 25 ul per CS well of each plate, whole plates per tube so that we never run dry mid plate
+    control_per_plate = dispensevolume * len(plate_map['CS'])
+    volume_control_antibodies_dead = 100
+    plates_per_control_tube = (1500 - volume_control_antibodies_dead) // control_per_plate
+
+    # DECK: one tip per serum block (see python -m elisa_ot2.tips), slots from python -m elisa_ot2.packing; a deck
+    # load has no more plates than the tube rack has sera and control serum tubes for, more plates go in
+    # deck loads (python -m elisa_ot2.batches) with new sera: plate 1 of each load gets S1 + S2 of the tube rack
+    per_plate = samples_per_plate(plate_map)
+    sera = sum(1 for label in tube_map if sample_index(label, 1, 1) is not None)
+    max_plates = min(sera // per_plate if per_plate else s.number_plates, plates_per_control_tube * len(tube_map['CS']))
+    tips = len(plate_transfers(plate_map, tube_map, 1)) * s.number_plates
+    batch = plan_batch(s.number_plates, lambda loads: racks_needed(tips) if s.auto_tipracks else 1, 1, s.auto_slots,
+                       max_plates=max(max_plates, 1))
+    deck_plan = batch.deck
+    protocol.comment("CONTROL: {}".format(describe(deck_plan)))
+    if len(batch.loads) > 1:
+        protocol.comment("CONTROL: {}".format(batch.describe()))
+    number_control_reservoirs = math.ceil(len(batch.loads[0]) / plates_per_control_tube)
+    control_tube_names = tube_map['CS'][:number_control_reservoirs]
+
+    def control_fills(plates):
+        "ul in each control serum tube for a deck load of plates"
+        return [control_per_plate * (plates // number_control_reservoirs + (1 if tube < plates % number_control_reservoirs else 0))
+                + volume_control_antibodies_dead for tube in range(number_control_reservoirs)]
+
+    # LOAD tips and pipette
+    tipracks = [protocol.load_labware('opentrons_96_tiprack_300ul', slot) for slot in deck_plan.tipracks]
+    pipette_single = protocol.load_instrument('p300_single_gen2', s.pipette_position, tip_racks=tipracks)
+    checkpoint.start_tips(pipette_single)
+    #pipette_multi = protocol.load_instrument('p300_multi', 'left', tip_racks=tipracks)
+    # LOAD the tube rack containing the serum samples
+    # 1.5 mL tubes: the heights below come from their geometry (python -m elisa_ot2.dryrun checks them)
+    stock_plate = protocol.load_labware('opentrons_24_tuberack_eppendorf_1.5ml_safelock_snapcap', deck_plan.sources[0])
+
+    # LOAD our ELISA plates (the plates of every deck load share the labware of their slots)
+    elisa_plates = load_plates(protocol, batch)
+
+    # the layouts must only name wells that exist
+    validate(plate_map, elisa_plates[0])
+    validate(tube_map, stock_plate)
+
+    # the tubes keep track of their remaining volume and pipetting height
+    def eppendorf_source(tube_names, volumes, reserve=0):
+        return TrackedSource([stock_plate.wells_by_name()[name] for name in tube_names], volumes, EPPENDORF_1_5ML.height,
+                             immersion_depth=s.immersion_depth, min_clearance=s.bottom_clearance_default,
+                             calibration=RATE_CALIBRATION[stock_plate.load_name], reserve=reserve)
+    # the safety volume may dip into the dead volume of the control tubes, it goes back with the blow out;
+    # the control tubes stay from one deck load to the next (from what the checkpoint left when resuming)
+    control_source = eppendorf_source(control_tube_names, [checkpoint.volume(stock_plate.wells_by_name()[name], volume)
+                                                           for name, volume in zip(control_tube_names, control_fills(len(batch.loads[0])))],
+                                      volume_control_antibodies_dead - safeVolume)
+
+    # we dispense a block of wells with a single tip: as many wells per aspiration as the tip holds
+    # (see elisa_ot2.cycles), the first time we aspirate an extra 50 ul which will be our
+    # safety / disposal volume that we blow out back to the source when we finish the block.
+    # Before the robot moves on a deck load we plan every block: its cycles, the aspiration schedule of its source
+    # (where and how fast to aspirate) and the order in which we dispense its wells
+    def plan_block(plate_number, plate, dest_wells, source):
+        cycles = plan_cycles(pipette_single, dest_wells, dispensevolume, disposal_volume=safeVolume)
+        schedule = source.plan(cycles.volumes())
+        if s.optimise_route:
+            dest_wells = plan_dispense_route(plate, dest_wells, schedule[0].well, cycles.per_cycle).wells
+            cycles = plan_cycles(pipette_single, dest_wells, dispensevolume, disposal_volume=safeVolume)
+        return plate_number, plate, cycles, schedule
+
+    first = True
+    for index, load in enumerate(batch.loads):
+        # when resuming, the deck loads done are skipped and the run goes on with the wells the checkpoint did not fill
+        if all(plate_number in checkpoint.plates_done for plate_number in load):
+            continue
+        # a deck load after the first one starts with new sera and the control serum topped up,
+        # unless the run resumes in the middle of it
+        swap = index > 0 and not any(plate_number in checkpoint.plates_done or str(plate_number) in checkpoint.dispensed
+                                     for plate_number in load)
+        transfers = [(plate_number, transfer, checkpoint.to_do(plate_number, transfer.destinations)) for plate_number in load
+                     for transfer in plate_transfers(plate_map, tube_map, plate_number - load[0] + 1)]
+        serum_tubes = OrderedDict()  # tube name -> ul at the start of the load
+        for plate_number, transfer, destinations in transfers:
+            if destinations and transfer.source != 'CS':
+                for name in transfer.sources:
+                    serum_tubes.setdefault(name, initial_volume_experimental_antibodies if swap else
+                                           checkpoint.volume(stock_plate.wells_by_name()[name], initial_volume_experimental_antibodies))
+        control_added = control_source.refill(control_fills(len(load))) if swap else None
+
+        # what goes in the tube rack (see python -m elisa_ot2.loading), when resuming what should be left in it
+        if checkpoint.resumed and first:
+            protocol.comment("CONTROL: {}{}".format(checkpoint.describe(), '' if swap else '; leave the plates on the deck'))
+        first_sample = (load[0] - 1) * per_plate + 1
+        sera_name = 'sera' if len(batch.loads) == 1 else 'sera S{}-S{}'.format(first_sample, first_sample + len(load) * per_plate - 1)
+        serum_loads = OrderedDict()
+        for name, volume in serum_tubes.items():
+            serum_loads.setdefault(volume, []).append(name)
+        for volume, names in serum_loads.items():
+            load_source(protocol, stock_plate, names, sera_name, volume)
+        # (what goes on top of what is left, unless the run resumes at this deck load)
+        top_up = swap and not first
+        for tube, name in enumerate(control_tube_names):
+            load_source(protocol, stock_plate, [name], 'CS', control_added[tube] if top_up else control_source.volumes[tube], top_up=top_up)
+        if swap:
+            batch.swap(protocol, index)
+            for name, volume in list(serum_tubes.items()) + list(zip(control_tube_names, control_source.volumes)):
+                checkpoint.refilled(stock_plate.wells_by_name()[name], volume)
+        first = False
+
+        # we will now iterate platewise and within plates serumwise
+        # so we use a single tip for all assays with the same serum sample
+        blocks = []
+        serum_sources = []
+        for plate_number, transfer, destinations in transfers:
+            if not destinations:
+                continue
+            plate = elisa_plates[plate_number - 1]
+            if transfer.source == 'CS':
+                # the control serum comes last, the second tube takes over when the first one runs low
+                blocks.append(plan_block(plate_number, plate, destinations, control_source))
+            else:
+                serum_sources.append(eppendorf_source(transfer.sources, [serum_tubes[name] for name in transfer.sources]))
+                blocks.append(plan_block(plate_number, plate, destinations, serum_sources[-1]))
+        # a resumed run keeps the dead volume in its tubes, as a full run does (1200 ul for 1100 ul of serum)
+        checkpoint.check_volumes(serum_sources + [control_source], volume_control_antibodies_dead)
+
+        # every aspiration and dispense is a debug event (see log_level), each plate gets a summary when it is done;
+        # the checkpoint follows every tip, aspiration, dispense and blow out, and is saved after each block
+        for plate_number, plate_blocks in groupby(blocks, key=lambda block: block[0]):
+            for plate_number, plate, cycles, schedule in plate_blocks:
+                log.debug('blocks', plate_number, summary=schedule_summary(schedule))
+                pipette_single.pick_up_tip()
+                checkpoint.picked_up(pipette_single)
+                for cycle, aspiration in zip(cycles.cycles, schedule):
+                    pipette_single.aspirate(aspiration.volume, aspiration.location(), rate=aspiration.rate)
+                    checkpoint.aspirated(aspiration.well, aspiration.volume)
+                    log.debug('aspirations', plate_number, well=aspiration.well.well_name, volume=aspiration.volume,
+                              clearance=aspiration.clearance, rate=aspiration.rate)
+                    for well, volume in cycle.dispenses:
+                        pipette_single.dispense(volume, plate.wells_by_name()[well])
+                        checkpoint.dispensed_into(plate_number, well)
+                        log.debug('dispenses', plate_number, well=well, volume=volume)
+                # when we finish this block we blow out the safety volume back to the source
+                pipette_single.blow_out(schedule[-1].well)
+                checkpoint.returned(schedule[-1].well, cycles.disposal)
+                # dispose the tips
+                pipette_single.drop_tip()
+                checkpoint.block_done()
+            log.plate_done(plate_number)
+            checkpoint.plate_done(plate_number)
@@ -0,0 +1,11 @@
+"""Secondary antibody: from the columns of a 12-well reservoir in every plate."""
+from . import bulk
+
+SETTINGS = bulk.SETTINGS
+RESERVOIR = 'nest_12_reservoir_15ml'
+DEAD_VOLUME = 400  # ul left in each reservoir column
+IMMERSION_DEPTH = 3
+
+
+def run(protocol, namespace):
+    return bulk.run(protocol, namespace, RESERVOIR, DEAD_VOLUME, IMMERSION_DEPTH)
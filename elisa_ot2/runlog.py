@@ -0,0 +1,94 @@
+"""Run log of the protocol scripts: debug events and plate summaries.
+
+Every ``protocol.comment`` ends up in the run log of the app and of
+``opentrons_simulate``, and one comment per aspiration makes both slow
+on a 9-plate run. The scripts therefore report what they do through a
+``RunLog`` with a level, like the logging module:
+
+    DEBUG    every debug event (an aspiration, a dispense, a planned
+             schedule) goes, as one JSON object per line, to the side
+             log file (or, without a file, to a "DEBUG: " comment)
+    INFO     debug events are only counted, and each plate gets a
+             single summary comment when it is done (the default)
+    WARNING  no summaries either
+
+Loading instructions ("CONTROL: ...") are not log messages: the scripts
+comment them at every level.
+
+The side log file is only written on the robot, a plate at a time (or
+every ``FLUSH_EVENTS`` events): the OT-2 app and opentrons_simulate
+analyse a protocol by running it, which must not overwrite the log of
+the last run.
+"""
+import json
+from collections import OrderedDict
+
+LEVELS = {'DEBUG': 10, 'INFO': 20, 'WARNING': 30}
+FLUSH_EVENTS = 200  # debug events kept before they are appended to the file
+
+
+class RunLog:
+    "Debug events and per-plate summaries of a protocol run"
+
+    def __init__(self, protocol, level='INFO', path=None):
+        """level: DEBUG, INFO or WARNING; path: JSON-lines file for the debug events."""
+        if level not in LEVELS:
+            raise ValueError('Unknown log level {!r} (use {})'.format(level, ', '.join(sorted(LEVELS, key=LEVELS.get))))
+        self.protocol = protocol
+        self.level = LEVELS[level]
+        self.path = path
+        self.events = 0
+        # plate -> event -> [count, volume]
+        self.counts = OrderedDict()
+        self._lines = []  # debug events not in the file yet
+        self._written = False  # the file of this run exists (the first flush starts it over)
+
+    @property
+    def debugging(self):
+        return self.level <= LEVELS['DEBUG']
+
+    def debug(self, event, plate=None, **fields):
+        """Record a debug event (fields must be JSON values, e.g. well names, not wells).
+
+        A volume field adds to the volume of the plate summary.
+        """
+        self.events += 1
+        count = self.counts.setdefault(plate, OrderedDict()).setdefault(event, [0, 0.0])
+        count[0] += 1
+        count[1] += fields.get('volume') or 0.0
+        if not self.debugging:
+            return
+        record = OrderedDict([('n', self.events), ('event', event), ('plate', plate)])
+        record.update(fields)
+        line = json.dumps(record, separators=(',', ':'))
+        if not self.path:
+            self.protocol.comment('DEBUG: {}'.format(line))
+        elif not self.protocol.is_simulating():
+            self._lines.append(line + '\n')
+            if len(self._lines) >= FLUSH_EVENTS:
+                self.flush()
+
+    def flush(self):
+        "Append the debug events since the last flush to the file"
+        if not self._lines:
+            return
+        with open(self.path, 'a' if self._written else 'w') as log_file:
+            log_file.writelines(self._lines)
+        self._written = True
+        self._lines = []
+
+    def info(self, message):
+        if self.level <= LEVELS['INFO']:
+            self.protocol.comment(message)
+
+    def summary(self, plate):
+        "One line with the number (and volume) of each event of plate (None: the events of no plate)"
+        parts = []
+        for event, (count, volume) in self.counts.get(plate, {}).items():
+            parts.append('{} {}'.format(count, event) + (' ({:.0f} ul)'.format(volume) if volume else ''))
+        return '{}: {}'.format('RUN' if plate is None else 'PLATE {}'.format(plate), ', '.join(parts) if parts else 'nothing')
+
+    def plate_done(self, plate):
+        "Comment the summary of plate (at INFO and DEBUG) and write its debug events to the file"
+        self.info(self.summary(plate))
+        self.flush()
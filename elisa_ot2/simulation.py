@@ -0,0 +1,558 @@
+"""Recording stand-in for the Opentrons ``ProtocolContext``.
+
+``run_protocol`` loads one of our protocol scripts, calls its ``run``
+entry point with a ``RecordingContext`` and returns the context, which
+holds every step the robot would perform together with an estimate of
+how long each step takes. Nothing here talks to a robot or needs the
+``opentrons`` package, so it runs anywhere in a fraction of a second.
+
+The timing model is deliberately simple: the gantry travels in straight
+lines at constant speed, arcing over the tallest labware on the deck
+between labware, and the plunger moves at the pipette flow rate scaled
+by the ``rate`` argument. It is meant to compare versions of the same
+protocol (and to catch regressions), not to replace a stopwatch.
+"""
+import importlib.util
+import math
+import os
+import sys
+import types
+from collections import OrderedDict, namedtuple
+
+from . import deck
+
+# gantry and plunger model -----------------------------------------------------------
+# MOVE_OVERHEAD (acceleration, settling and command dispatch) was tuned so that the
+# estimates match the run times we used to note by hand in the scripts (e.g. ~35 minutes for
+# 8 plates of primary antibody, 3/8/2021)
+XY_SPEED = 400.0          # mm/s, default OT-2 gantry speed
+Z_SPEED = 125.0           # mm/s, default speed of the pipette mounts
+MOVE_OVERHEAD = 0.75      # s, per move
+ARC_MARGIN = 10.0         # mm above the tallest labware when travelling between labware
+WELL_MARGIN = 1.0         # mm above the labware when moving within the same labware
+TIP_PICKUP_SECONDS = 3.0  # press, shake and retract
+TIP_DROP_SECONDS = 2.0    # eject and home the plunger
+BLOW_OUT_SECONDS = 1.0
+PLUNGER_RESET_SECONDS = 0.3  # moving the plunger to the bottom before the first aspiration
+HOME_SECONDS = 8.0
+NOZZLE_PITCH = 9.0        # mm between the nozzles of a multichannel
+
+# name: (min volume, max volume, channels, aspirate, dispense, blow out flow rates in uL/s)
+PIPETTES = {
+    'p20_single_gen2': (1, 20, 1, 7.56, 7.56, 7.56),
+    'p20_multi_gen2': (1, 20, 8, 7.6, 7.6, 7.6),
+    'p50_multi': (5, 50, 8, 25.0, 50.0, 1000.0),
+    'p300_single': (30, 300, 1, 150.0, 300.0, 1000.0),
+    'p300_single_gen2': (20, 300, 1, 92.86, 92.86, 92.86),
+    'p300_multi': (30, 300, 8, 150.0, 300.0, 1000.0),
+    'p300_multi_gen2': (20, 300, 8, 94.0, 94.0, 94.0),
+    'p1000_single': (100, 1000, 1, 500.0, 1000.0, 1000.0),
+    'p1000_single_gen2': (100, 1000, 1, 274.7, 274.7, 274.7),
+}
+# GEN2 single-channel pipettes run at half speed below API 2.6
+HALF_SPEED_BEFORE_2_6 = ('p20_single_gen2', 'p300_single_gen2', 'p1000_single_gen2')
+
+# nozzle layouts of configure_nozzle_layout (opentrons.protocol_api constants)
+ALL = 'ALL'
+COLUMN = 'COLUMN'
+PARTIAL_COLUMN = 'PARTIAL_COLUMN'
+ROW = 'ROW'
+SINGLE = 'SINGLE'
+
+Point = namedtuple('Point', ['x', 'y', 'z'])
+# kind: 'aspirate', 'dispense', ...; target: human readable location; height: mm above the bottom
+# of the target well (None elsewhere); wells: the well of each active nozzle (volume is per nozzle)
+Step = namedtuple('Step', ['index', 'kind', 'pipette', 'volume', 'target', 'seconds', 'height', 'wells'])
+
+
+class OutOfTipsError(RuntimeError):
+    pass
+
+
+class Location:
+    def __init__(self, point, labware):
+        self.point = point
+        self.labware = labware
+
+    def __repr__(self):
+        return 'Location({}, {})'.format(tuple(round(v, 2) for v in self.point), self.labware)
+
+
+class Well:
+    def __init__(self, parent, name):
+        self.parent = parent
+        self.name = name
+        self._bottom = Point(*deck.well_position(parent.load_name, parent.slot, name))
+        self.depth = parent.dimensions.depth
+        self.max_volume = parent.dimensions.volume
+        self.has_tip = parent.is_tiprack
+
+    def bottom(self, z=0.0):
+        return Location(self._bottom._replace(z=self._bottom.z + z), self)
+
+    def top(self, z=0.0):
+        return Location(self._bottom._replace(z=self._bottom.z + self.depth + z), self)
+
+    def center(self):
+        return self.bottom(self.depth / 2)
+
+    @property
+    def well_name(self):
+        return self.name
+
+    @property
+    def display_name(self):
+        return '{} of {}'.format(self.name, self.parent)
+
+    def __repr__(self):
+        return self.display_name
+
+
+class Labware:
+    def __init__(self, load_name, slot, label=None):
+        if load_name not in deck.LABWARE:
+            raise KeyError('No labware definition for {}'.format(load_name))
+        self.load_name = load_name
+        self.slot = str(slot)
+        self.dimensions = deck.LABWARE[load_name]
+        self.is_tiprack = self.dimensions.is_tiprack
+        self.label = label or self.dimensions.display_name
+        self._wells = OrderedDict((name, Well(self, name)) for name in deck.well_names(load_name))
+
+    @property
+    def parent(self):
+        "Deck slot, as on the robot"
+        return self.slot
+
+    @property
+    def highest_z(self):
+        return self.dimensions.height
+
+    def wells(self, *names):
+        if names:
+            return [self._wells[name] for name in names]
+        return list(self._wells.values())
+
+    def wells_by_name(self):
+        return OrderedDict(self._wells)
+
+    def columns(self):
+        wells = self.wells()
+        rows = self.dimensions.rows
+        return [wells[i:i + rows] for i in range(0, len(wells), rows)]
+
+    def rows(self):
+        return [list(row) for row in zip(*self.columns())]
+
+    def __getitem__(self, name):
+        return self._wells[name]
+
+    def next_tip(self, num_tips=1, starting_tip=None):
+        "Return the first well of the first run of num_tips unused tips in a column (from starting_tip on)"
+        first = self.wells().index(starting_tip) if starting_tip is not None else 0
+        for index, column in enumerate(self.columns()):
+            for start in range(len(column) - num_tips + 1):
+                if index * len(column) + start < first:
+                    continue
+                if all(well.has_tip for well in column[start:start + num_tips]):
+                    return column[start]
+        return None
+
+    def use_tips(self, start_well, num_tips=1):
+        column = self.columns()[int(start_well.name[1:]) - 1]
+        start = ord(start_well.name[0]) - ord('A')
+        for well in column[start:start + num_tips]:
+            if not well.has_tip:
+                raise OutOfTipsError('No tip left at {}'.format(well))
+            well.has_tip = False
+
+    def __repr__(self):
+        return '{} on {}'.format(self.label, self.slot)
+
+
+class _Settings:
+    "Plain attribute holder standing in for flow_rate and well_bottom_clearance"
+
+    def __init__(self, **values):
+        self.__dict__.update(values)
+
+
+class InstrumentContext:
+    def __init__(self, ctx, name, mount, tip_racks):
+        if name not in PIPETTES:
+            raise KeyError('No pipette model {}'.format(name))
+        min_volume, max_volume, channels, aspirate, dispense, blow_out = PIPETTES[name]
+        if name in HALF_SPEED_BEFORE_2_6 and ctx.api_version < (2, 6):
+            aspirate, dispense, blow_out = aspirate / 2, dispense / 2, blow_out / 2
+        self._ctx = ctx
+        self.name = name
+        self.mount = mount
+        self.min_volume = min_volume
+        self.max_volume = max_volume
+        self.channels = channels
+        self.active_channels = channels
+        self.tip_racks = list(tip_racks or [])
+        self.flow_rate = _Settings(aspirate=aspirate, dispense=dispense, blow_out=blow_out)
+        self.well_bottom_clearance = _Settings(aspirate=1.0, dispense=1.0)
+        self.current_volume = 0.0
+        self.has_tip = False
+        self.tips_used = 0
+        self.starting_tip = None
+
+    def _location(self, location, clearance):
+        if location is None:
+            location = self._ctx.location
+            if location is None:
+                raise ValueError('{} has no location to move to'.format(self.name))
+            return location
+        if isinstance(location, Well):
+            return location.bottom(clearance)
+        return location
+
+    def _check_partial_clearance(self, location):
+        "With a partial column layout the unused nozzles hang over the slot behind the target"
+        if self.active_channels == self.channels or not isinstance(location.labware, Well):
+            return
+        target = location.labware.parent
+        behind = self._ctx.deck.get(str(int(target.slot) + 3))
+        if behind is not None and behind.highest_z > target.highest_z:
+            raise RuntimeError('Moving to {} with a partial nozzle layout collides with {}'.format(target, behind))
+
+    def _nozzle_wells(self, well):
+        "The well each active nozzle is in when the pipette goes to well"
+        labware = well.parent
+        if labware.dimensions.rows == 1:
+            return (well,) * self.active_channels
+        if self.active_channels == 1 or labware.dimensions.pitch[1] != NOZZLE_PITCH:
+            return (well,)
+        column = labware.columns()[int(well.name[1:]) - 1]
+        row = ord(well.name[0]) - ord('A')
+        # all nozzles: A1 goes to well; partial columns (from H1): H1 does, the others are behind it
+        first = row if self.active_channels == self.channels else row - self.active_channels + 1
+        return tuple(column[max(first, 0):first + self.active_channels])
+
+    def _record(self, kind, location, volume=0.0, seconds=0.0):
+        self._check_partial_clearance(location)
+        travel = self._ctx.move_to(location)
+        if travel:
+            self._ctx.record('travel', self.name, 0.0, location.labware, travel)
+        if isinstance(location.labware, Well):
+            well = location.labware
+            self._ctx.record(kind, self.name, volume, well, seconds, location.point.z - well._bottom.z, self._nozzle_wells(well))
+        else:
+            self._ctx.record(kind, self.name, volume, location.labware, seconds)
+
+    def move_to(self, location):
+        self._record('move_to', location)
+        return self
+
+    def configure_nozzle_layout(self, style, start=None, end=None, front_right=None, back_left=None,
+                                tip_racks=None):
+        "ALL and (OT-2, API 2.20) PARTIAL_COLUMN layouts of 8-channel pipettes"
+        if self.has_tip:
+            raise RuntimeError('Cannot change the nozzle layout of {} with a tip attached'.format(self.name))
+        if style == ALL:
+            self.active_channels = self.channels
+        elif style == PARTIAL_COLUMN and self.channels == 8:
+            if self._ctx.api_version < (2, 20):
+                raise RuntimeError('PARTIAL_COLUMN requires API level 2.20')
+            if start != 'H1' or end is None:
+                raise ValueError('OT-2 partial columns start at H1 and need an end nozzle')
+            self.active_channels = ord(start[0]) - ord(end[0]) + 1
+        else:
+            raise NotImplementedError('Nozzle layout {} is not modelled'.format(style))
+        if tip_racks is not None:
+            self.tip_racks = list(tip_racks)
+
+    def pick_up_tip(self, location=None):
+        if self.has_tip:
+            raise RuntimeError('{} already has a tip attached'.format(self.name))
+        if location is None:
+            racks = self.tip_racks
+            if self.starting_tip is not None:
+                # as on the robot: the racks before the one of starting_tip are skipped
+                racks = racks[racks.index(self.starting_tip.parent):]
+            for rack in racks:
+                start = self.starting_tip if self.starting_tip is not None and rack is self.starting_tip.parent else None
+                well = rack.next_tip(self.active_channels, start)
+                if well is not None:
+                    break
+            else:
+                if self._ctx.strict_tips:
+                    raise OutOfTipsError('{} ran out of tips'.format(self.name))
+                # keep going to count the tips the run needs, as if a rack had been refilled
+                self._ctx.tip_shortages.append((len(self._ctx.steps), self.name))
+                well = None
+        else:
+            well = location.labware if isinstance(location, Location) else location
+        if well is None:
+            location = (self.tip_racks[0].wells()[0].top() if self.tip_racks
+                        else Location(Point(*deck.trash_position()), 'Fixed Trash'))
+        else:
+            well.parent.use_tips(well, self.active_channels)
+            location = well.top()
+        self.tips_used += self.active_channels
+        self._record('pick_up_tip', location, seconds=TIP_PICKUP_SECONDS)
+        self.has_tip = True
+        self.current_volume = 0.0
+        return self
+
+    def drop_tip(self, location=None):
+        if not self.has_tip:
+            raise RuntimeError('{} has no tip to drop'.format(self.name))
+        if location is None:
+            location = Location(Point(*deck.trash_position()), 'Fixed Trash')
+        elif isinstance(location, Well):
+            location = location.top()
+        self._record('drop_tip', location, seconds=TIP_DROP_SECONDS)
+        self.has_tip = False
+        self.current_volume = 0.0
+        return self
+
+    def aspirate(self, volume=None, location=None, rate=1.0):
+        if not self.has_tip:
+            raise RuntimeError('{} cannot aspirate without a tip'.format(self.name))
+        if volume is None:
+            volume = self.max_volume - self.current_volume
+        if self.current_volume + volume > self.max_volume + 1e-6:
+            raise RuntimeError('{} cannot hold {} uL'.format(self.name, self.current_volume + volume))
+        location = self._location(location, self.well_bottom_clearance.aspirate)
+        seconds = volume / (self.flow_rate.aspirate * rate)
+        if self.current_volume == 0:
+            seconds += PLUNGER_RESET_SECONDS
+        self._record('aspirate', location, volume, seconds)
+        self.current_volume += volume
+        return self
+
+    def dispense(self, volume=None, location=None, rate=1.0):
+        if volume is None or volume > self.current_volume:
+            volume = self.current_volume
+        location = self._location(location, self.well_bottom_clearance.dispense)
+        self._record('dispense', location, volume, volume / (self.flow_rate.dispense * rate))
+        self.current_volume -= volume
+        return self
+
+    def blow_out(self, location=None):
+        if isinstance(location, Well):
+            location = location.top()
+        location = self._location(location, 0)
+        self._record('blow_out', location, self.current_volume, BLOW_OUT_SECONDS)
+        self.current_volume = 0.0
+        return self
+
+    def touch_tip(self, location=None, radius=1.0, v_offset=-1.0, speed=60.0):
+        if isinstance(location, Well):
+            location = location.top(v_offset)
+        location = self._location(location, 0)
+        self._record('touch_tip', location, seconds=4 * 4.0 / speed)
+        return self
+
+    def mix(self, repetitions=1, volume=None, location=None, rate=1.0):
+        if volume is None:
+            volume = self.max_volume
+        location = self._location(location, self.well_bottom_clearance.aspirate)
+        for _ in range(repetitions):
+            self.aspirate(volume, location, rate)
+            self.dispense(volume, location, rate)
+        return self
+
+    def transfer(self, volume, source, dest, new_tip='once', mix_before=None, mix_after=None,
+                 blow_out=False, touch_tip=False, **kwargs):
+        "Subset of InstrumentContext.transfer: one-to-one, one-to-many and many-to-one transfers"
+        sources = source if isinstance(source, (list, tuple)) else [source]
+        dests = dest if isinstance(dest, (list, tuple)) else [dest]
+        count = max(len(sources), len(dests))
+        sources = sources * count if len(sources) == 1 else sources
+        dests = dests * count if len(dests) == 1 else dests
+        volumes = volume if isinstance(volume, (list, tuple)) else [volume] * count
+        if new_tip == 'once' and not self.has_tip:
+            self.pick_up_tip()
+        for src, dst, vol in zip(sources, dests, volumes):
+            chunks = max(1, math.ceil(vol / self.max_volume))
+            for _ in range(chunks):
+                if new_tip == 'always':
+                    self.pick_up_tip()
+                if mix_before:
+                    self.mix(mix_before[0], mix_before[1], src)
+                self.aspirate(vol / chunks, src)
+                self.dispense(vol / chunks, dst)
+                if mix_after:
+                    self.mix(mix_after[0], mix_after[1], dst)
+                if blow_out:
+                    self.blow_out(dst)
+                if touch_tip:
+                    self.touch_tip(dst)
+                if new_tip == 'always':
+                    self.drop_tip()
+        if new_tip == 'once':
+            self.drop_tip()
+        return self
+
+    def __repr__(self):
+        return '{} on {} mount'.format(self.name, self.mount)
+
+
+class RecordingContext:
+    "Stand-in ProtocolContext that records every step and its estimated duration"
+
+    def __init__(self, api_version='2.9', strict_tips=True):
+        self.api_version = tuple(int(part) for part in str(api_version).split('.'))
+        # strict_tips: running out of tips raises OutOfTipsError, as on the robot; otherwise
+        # the run goes on and tip_shortages lists (step index, pipette) of every pick-up without a tip
+        self.strict_tips = strict_tips
+        self.tip_shortages = []
+        self.deck = OrderedDict()
+        self.loaded_instruments = OrderedDict()
+        self.steps = []
+        self.comments = []
+        self.loads = []  # what the protocol asks to load, see loading.load_source
+        self.load_steps = []  # the step each load was asked for at (before the run, or at a pause)
+        self.swaps = []  # (step, slots) of the labware put in place of the labware of slots, see batches
+        self.location = None
+        self.distance = 0.0  # mm of horizontal gantry travel
+        self._position = None
+
+    # labware and instruments
+    def load_labware(self, load_name, location, label=None):
+        slot = str(location)
+        if slot not in deck.SLOT_POSITIONS or slot == deck.TRASH_SLOT:
+            raise ValueError('Invalid deck slot {}'.format(location))
+        if slot in self.deck:
+            raise ValueError('Slot {} is already occupied by {}'.format(slot, self.deck[slot]))
+        labware = Labware(load_name, slot, label)
+        self.deck[slot] = labware
+        return labware
+
+    def load_instrument(self, instrument_name, mount, tip_racks=None, replace=False):
+        if mount in self.loaded_instruments and not replace:
+            raise RuntimeError('Instrument already present on {} mount'.format(mount))
+        instrument = InstrumentContext(self, instrument_name, mount, tip_racks)
+        self.loaded_instruments[mount] = instrument
+        return instrument
+
+    @property
+    def loaded_labwares(self):
+        return {int(slot): labware for slot, labware in self.deck.items()}
+
+    # bookkeeping
+    def is_simulating(self):
+        return True
+
+    def comment(self, msg):
+        self.comments.append(msg)
+        self.record('comment', None, 0.0, msg, 0.0)
+
+    def pause(self, msg=None):
+        self.record('pause', None, 0.0, msg, 0.0)
+
+    def delay(self, seconds=0, minutes=0, msg=None):
+        self.record('delay', None, 0.0, msg, minutes * 60 + seconds)
+
+    def home(self):
+        self._position = None
+        self.location = None
+        self.record('home', None, 0.0, None, HOME_SECONDS)
+
+    def record_swap(self, slots):
+        self.swaps.append((len(self.steps), list(slots)))
+
+    def record_load(self, load):
+        self.loads.append(load)
+        self.load_steps.append(len(self.steps))
+
+    def record(self, kind, pipette, volume, target, seconds, height=None, wells=()):
+        self.steps.append(Step(len(self.steps), kind, pipette, volume, target, seconds, height, wells))
+
+    @property
+    def elapsed(self):
+        "Estimated run time in seconds"
+        return sum(step.seconds for step in self.steps)
+
+    def tips_used(self):
+        return sum(1 for labware in self.deck.values() if labware.is_tiprack
+                   for well in labware.wells() if not well.has_tip)
+
+    # gantry model
+    def _travel_height(self):
+        return max([labware.highest_z for labware in self.deck.values()] + [deck.TRASH_OFFSET[2]]) + ARC_MARGIN
+
+    def move_to(self, location):
+        "Move the gantry to location and return the estimated travel time"
+        target = location.point
+        previous, self._position = self._position, target
+        previous_location, self.location = self.location, location
+        if previous is None:
+            self.distance += math.hypot(target.x, target.y)
+            return MOVE_OVERHEAD + math.hypot(target.x, target.y) / XY_SPEED
+        if previous == target:
+            return 0.0
+        same_labware = (previous_location is not None
+                        and _parent(previous_location.labware) is _parent(location.labware))
+        if same_labware and isinstance(location.labware, Well):
+            arc_z = location.labware.parent.highest_z + WELL_MARGIN
+        else:
+            arc_z = self._travel_height()
+        arc_z = max(arc_z, previous.z, target.z)
+        vertical = (arc_z - previous.z) + (arc_z - target.z)
+        horizontal = math.hypot(target.x - previous.x, target.y - previous.y)
+        self.distance += horizontal
+        return MOVE_OVERHEAD + horizontal / XY_SPEED + vertical / Z_SPEED
+
+
+def _parent(labware):
+    return labware.parent if isinstance(labware, Well) else labware
+
+
+# loading protocol scripts -----------------------------------------------------------
+
+def _opentrons_shim():
+    "Module standing in for opentrons.protocol_api so scripts import without the SDK"
+    opentrons = types.ModuleType('opentrons')
+    protocol_api = types.ModuleType('opentrons.protocol_api')
+    protocol_api.ProtocolContext = RecordingContext
+    protocol_api.InstrumentContext = InstrumentContext
+    protocol_api.Labware = Labware
+    protocol_api.Well = Well
+    for name in (ALL, COLUMN, PARTIAL_COLUMN, ROW, SINGLE):
+        setattr(protocol_api, name, name)
+    opentrons.protocol_api = protocol_api
+    return {'opentrons': opentrons, 'opentrons.protocol_api': protocol_api}
+
+
+def load_protocol(path):
+    "Import a protocol script (file names may contain spaces) and return the module"
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if repo_root not in sys.path:
+        sys.path.insert(0, repo_root)
+    shim = {}
+    if importlib.util.find_spec('opentrons') is None:
+        shim = {name: module for name, module in _opentrons_shim().items() if name not in sys.modules}
+        sys.modules.update(shim)
+    module_name = 'elisa_protocol_' + ''.join(c if c.isalnum() else '_' for c in os.path.basename(path))
+    spec = importlib.util.spec_from_file_location(module_name, path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        for name in shim:
+            sys.modules.pop(name, None)
+    return module
+
+
+def run_protocol(path, strict_tips=True, **settings):
+    """Run the protocol at path against a RecordingContext and return the context.
+
+    Keyword arguments override the module-level settings of the script
+    (e.g. ``number_plates=4``); unknown settings raise ``AttributeError``.
+    With strict_tips=False the run does not stop when a pipette runs out
+    of tips (see RecordingContext.tip_shortages).
+    """
+    module = load_protocol(path)
+    for name, value in settings.items():
+        if not hasattr(module, name):
+            raise AttributeError('{} has no setting {!r}'.format(os.path.basename(path), name))
+        setattr(module, name, value)
+    metadata = getattr(module, 'metadata', {})
+    ctx = RecordingContext(metadata.get('apiLevel', '2.9'), strict_tips)
+    module.run(ctx)
+    return ctx
@@ -0,0 +1,120 @@
+"""Tip budget: how many tips a protocol uses and whether its racks last.
+
+``tip_budget`` runs a script on the recording stand-in (see
+``simulation``) without stopping when a pipette runs out of tips, and
+reports for every pipette the tips it used, the tips loaded for it and
+where the run would have stopped on the robot. Running out of tips at
+plate 7 means a re-run, so check before a long run:
+
+    python -m elisa_ot2.tips --plates 1-9
+    python -m elisa_ot2.tips --no-auto Multiple_Plates_Scripts/elisa-plate-assay-primary-Ab-ot2.py
+
+Scripts with an ``auto_tipracks`` setting load as many racks as they
+need: the ones that pack their deck (see ``packing``) count their tips
+first and ask for that many racks, the others call ``add_tipracks`` once
+their plan is known, which loads the extra racks into free deck slots;
+``--no-auto`` checks them with their single rack.
+"""
+import argparse
+import math
+import sys
+from collections import namedtuple
+
+
+TIPS_PER_RACK = 96
+DECK_SLOTS = range(1, 12)
+
+# used and loaded are single tips (8 per column of a multichannel); short_at is None or
+# the first step the pipette would have started without a tip
+TipBudget = namedtuple('TipBudget', ['pipette', 'used', 'loaded', 'short_at'])
+
+
+def free_slots(protocol):
+    "Deck slots without labware, highest first (plates are loaded from slot 1 up)"
+    loaded = set(int(slot) for slot in protocol.loaded_labwares)
+    return [str(slot) for slot in reversed(DECK_SLOTS) if slot not in loaded]
+
+
+def racks_needed(tips):
+    return int(math.ceil(tips / float(TIPS_PER_RACK)))
+
+
+def add_tipracks(protocol, pipette, tips, load_name=None):
+    """Load extra tipracks for pipette into free slots so that it has tips (single tips) left.
+
+    load_name defaults to the rack the pipette already has. Returns the
+    slots of the racks loaded (none when the pipette has enough) and
+    raises ValueError when the deck has not enough free slots.
+    """
+    racks = list(pipette.tip_racks)
+    load_name = load_name or racks[0].load_name
+    missing = racks_needed(tips) - len(racks)
+    if missing <= 0:
+        return []
+    slots = free_slots(protocol)
+    if missing > len(slots):
+        raise ValueError('{} tips need {} more tipracks but only {} deck slots are free'.format(tips, missing, len(slots)))
+    new_racks = [protocol.load_labware(load_name, slot) for slot in slots[:missing]]
+    pipette.tip_racks = racks + new_racks
+    return slots[:missing]
+
+
+def _short_at(ctx, index):
+    "The first dispense (or any step) at or after step index, to tell where a run stopped"
+    steps = ctx.steps[index:]
+    for step in steps:
+        if step.kind == 'dispense':
+            return 'dispense into {}'.format(step.target)
+    return '{} {}'.format(steps[0].kind, steps[0].target) if steps else 'the end of the run'
+
+
+def tip_budget(path, **settings):
+    "Run the script on the stand-in and return a TipBudget for each pipette it loads"
+    # the protocols import racks_needed and add_tipracks on the robot, which does not need the stand-in simulator
+    from .simulation import run_protocol
+
+    ctx = run_protocol(path, strict_tips=False, **settings)
+    budgets = []
+    for pipette in ctx.loaded_instruments.values():
+        shortages = [index for index, name in ctx.tip_shortages if name == pipette.name]
+        budgets.append(TipBudget(pipette.name, pipette.tips_used, TIPS_PER_RACK * len(pipette.tip_racks),
+                                 _short_at(ctx, shortages[0]) if shortages else None))
+    return budgets
+
+
+def main(argv=None):
+    from .benchmark import default_scripts, script_key
+    from .simulation import load_protocol
+
+    parser = argparse.ArgumentParser(description='Tips used per script and runs that exhaust their tipracks')
+    parser.add_argument('scripts', nargs='*', help='protocol scripts (default: every script in the repo)')
+    parser.add_argument('--plates', default='1-9', help='range of number_plates to check, e.g. 1-9 or 8')
+    parser.add_argument('--no-auto', action='store_true', help='do not let scripts load extra tipracks (auto_tipracks = False)')
+    args = parser.parse_args(argv)
+
+    first, _, last = args.plates.partition('-')
+    short = 0
+    for path in args.scripts or default_scripts():
+        module = load_protocol(path)
+        settings = {'auto_tipracks': False} if args.no_auto and hasattr(module, 'auto_tipracks') else {}
+        plates = range(int(first), int(last or first) + 1) if hasattr(module, 'number_plates') else [None]
+        print(script_key(path))
+        for number_plates in plates:
+            if number_plates is not None:
+                settings['number_plates'] = number_plates
+            try:
+                budgets = tip_budget(path, **settings)
+            except Exception as error:  # same as the benchmark: a script that cannot run n plates is a result
+                print('  {:>6} {}: {}'.format(number_plates or '-', type(error).__name__, error))
+                continue
+            for budget in budgets:
+                status = 'ok' if budget.short_at is None else 'OUT OF TIPS at ' + budget.short_at
+                short += budget.short_at is not None
+                print('  {:>6} {:<18} {:>5} of {:>5} tips  {}'.format(
+                    number_plates or '-', budget.pipette, budget.used, budget.loaded, status))
+        print()
+    return 1 if short else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""Liquid-level tracking for source tubes, wells and reservoirs.
+
+A ``TrackedSource`` follows the remaining volume of a pool of source
+wells (e.g. the two control-serum tubes D5/D6, or the columns of a
+12-well reservoir). It computes where to aspirate from the liquid height
+given by the height function of the well geometry (see ``geometry``),
+slows aspiration down once the liquid is too shallow to immerse the tip
+(the tip of the cone of a tube; with a ``geometry.RateCalibration``, as
+the liquid left above the tip after the aspiration gets thin), and fails
+over to the next well of the pool when the current one cannot provide
+the next aspiration.
+
+Protocols plan the whole aspiration schedule of a source before the
+robot moves (``TrackedSource.plan``) and their pipetting loops only
+step through it. When the volumes are known before the wells are
+filled, ``TrackedSource.split`` fills the fewest wells of a pool with
+just what the schedule takes from each (``split_pool``), so the pool
+moves on to the next well without carrying anything over.
+"""
+from collections import namedtuple
+
+
+class Aspiration(namedtuple('Aspiration', ['well', 'volume', 'clearance', 'rate', 'previous', 'carried'])):
+    """One aspiration of a schedule.
+
+    previous is the well the pool switched away from just before this
+    aspiration (None if it did not switch) and carried the volume taken
+    along from it to well.
+    """
+
+    def location(self):
+        return self.well.bottom(self.clearance)
+
+
+def schedule_summary(schedule):
+    "One-line description of an aspiration schedule, for a protocol comment"
+    if not schedule:
+        return 'no aspirations'
+    wells = []
+    for aspiration in schedule:
+        if aspiration.well.well_name not in wells:
+            wells.append(aspiration.well.well_name)
+    return '{}: {} aspirations, {:.0f} ul, clearance {} to {} mm, rate {:.2f} to {:.2f}'.format(
+        '+'.join(wells), len(schedule), sum(aspiration.volume for aspiration in schedule),
+        schedule[0].clearance, schedule[-1].clearance, schedule[0].rate, schedule[-1].rate)
+
+
+def split_pool(volumes, capacity, reserve=0.0, channels=1):
+    """Initial fill of each well for a planned sequence of volumes (see TrackedSource.plan).
+
+    The wells are used in order, each one until the next aspiration
+    would take it below reserve, and get what they give plus reserve
+    (never more than capacity). Returns the fills of the fewest wells
+    that do; raises ValueError for an aspiration no well can provide.
+    """
+    room = capacity - reserve
+    fills, level, peak = [], 0.0, 0.0
+    for volume in volumes:
+        volume *= channels
+        if volume > room:
+            raise ValueError('{:.0f} ul do not fit in a {:.0f} ul well with {:.0f} ul of dead volume'.format(volume, capacity, reserve))
+        if volume > 0 and level + volume > room:
+            fills.append(peak + reserve)
+            level, peak = 0.0, 0.0
+        level += volume
+        peak = max(peak, level)
+    if peak > 0:
+        fills.append(peak + reserve)
+    return fills
+
+
+class TrackedSource:
+    "Remaining volume, aspiration height and rate of a pool of source wells"
+
+    __slots__ = ('wells', 'volumes', 'index', 'height', 'immersion_depth', 'min_clearance',
+                 'slow_rate', 'rate_function', 'calibration', 'reserve', 'channels')
+
+    def __init__(self, wells, volume, height, immersion_depth=0.0, min_clearance=1.0,
+                 slow_rate=1.0, rate=None, calibration=None, reserve=0.0, channels=1):
+        """wells: the pool, used in order; volume: initial volume of each well (or a list).
+
+        height: height function of the well geometry (e.g.
+        geometry.EPPENDORF_1_5ML.height); the tip goes immersion_depth
+        below the liquid surface but never lower than min_clearance.
+        Once the liquid is too shallow for that the tip aspirates at
+        slow_rate, unless a rate function of the remaining volume is
+        given. With a calibration (geometry.RATE_CALIBRATION of the
+        labware) the surface is the one the aspiration leaves, so the tip
+        stays immersed to the end, and the rate follows the liquid left
+        above the tip instead. A well is left
+        for the next one when an aspiration would take it below reserve.
+        channels is the number of tips aspirating from the same well
+        (8 for a multichannel in a reservoir trough).
+        """
+        self.wells = list(wells)
+        self.volumes = list(volume) if isinstance(volume, (list, tuple)) else [volume] * len(self.wells)
+        self.index = 0
+        self.height = height
+        self.immersion_depth = immersion_depth
+        self.min_clearance = min_clearance
+        self.slow_rate = slow_rate
+        self.rate_function = rate
+        self.calibration = calibration
+        self.reserve = reserve
+        self.channels = channels
+
+    @classmethod
+    def split(cls, wells, volumes, capacity, height, reserve=0.0, channels=1, **options):
+        """A pool of wells filled with just what volumes (planned per channel) take from each, see split_pool.
+
+        The wells the volumes do not need start empty. Raises ValueError
+        when the pool has not enough wells.
+        """
+        wells = list(wells)
+        fills = split_pool(volumes, capacity, reserve, channels)
+        if len(fills) > len(wells):
+            raise ValueError('{:.0f} ul need {} wells of {:.0f} ul but the pool has {}'.format(
+                sum(fills), len(fills), capacity, len(wells)))
+        return cls(wells, fills + [0.0] * (len(wells) - len(fills)), height, reserve=reserve, channels=channels, **options)
+
+    @property
+    def well(self):
+        return self.wells[self.index]
+
+    @property
+    def remaining(self):
+        "Volume left in the current well"
+        return self.volumes[self.index]
+
+    @property
+    def total(self):
+        "Volume left in the current and the following wells of the pool"
+        return sum(self.volumes[self.index:])
+
+    @property
+    def shallow(self):
+        "True when the liquid in the current well is too shallow to immerse the tip"
+        return self.height(self.remaining) - self.immersion_depth < self.min_clearance
+
+    def _level(self, volume):
+        "Liquid height the tip follows: with a calibration, the one at the end of an aspiration of volume"
+        if self.calibration is not None:
+            return self.height(self.remaining - volume * self.channels)
+        return self.height(self.remaining)
+
+    def clearance(self, volume=0.0):
+        "Bottom clearance (mm) to aspirate volume (per channel) from the current well"
+        return round(max(self._level(volume) - self.immersion_depth, self.min_clearance), 1)
+
+    def rate(self, volume=0.0):
+        "Relative rate of an aspiration of volume (per channel) from the current well"
+        if self.rate_function is not None:
+            return self.rate_function(self.remaining)
+        if self.calibration is not None:
+            # liquid still above the tip when the aspiration ends
+            return round(self.calibration.rate(self._level(volume) - self.clearance(volume)), 2)
+        return self.slow_rate if self.shallow else 1.0
+
+    def switch(self):
+        "Continue with the next well of the pool"
+        if self.index + 1 >= len(self.wells):
+            raise ValueError('No source left after {}'.format(self.well))
+        self.index += 1
+
+    def take(self, volume, carry_over=False):
+        """Account for an aspiration of volume (per channel) and return it as an Aspiration.
+
+        Fails over to the next well of the pool first if the current one
+        would go below its reserve; with carry_over what is left in the
+        wells we leave is taken along to the new one (the protocol has to
+        transfer it, see Aspiration.carried).
+        """
+        start = self.index
+        while self.remaining - volume * self.channels < self.reserve - 1e-6 and self.index + 1 < len(self.wells):
+            self.switch()
+        previous, carried = None, 0.0
+        if self.index != start:
+            previous = self.wells[self.index - 1]
+            if carry_over:
+                carried = sum(self.volumes[start:self.index])
+                self.volumes[start:self.index] = [0.0] * (self.index - start)
+                self.volumes[self.index] += carried
+        aspiration = Aspiration(self.well, volume, self.clearance(volume), self.rate(volume), previous, carried)
+        self.volumes[self.index] -= volume * self.channels
+        return aspiration
+
+    def plan(self, volumes, carry_over=False):
+        """Precompute the aspiration schedule of volumes (per channel), a list of Aspiration.
+
+        A negative volume is liquid returned to the current well (a blow
+        out) and does not produce an aspiration.
+        """
+        schedule = []
+        for volume in volumes:
+            if volume < 0:
+                self.give_back(-volume)
+            else:
+                schedule.append(self.take(volume, carry_over))
+        return schedule
+
+    def refill(self, fills):
+        """Top the wells of the pool up to fills (ul per well, in pool order) and start over at the first one.
+
+        A well that holds more keeps it. Returns the ul that go in each
+        well of fills (e.g. between two deck loads, see batches).
+        """
+        added = [max(fill - volume, 0.0) for fill, volume in zip(fills, self.volumes)]
+        for index, volume in enumerate(added):
+            self.volumes[index] += volume
+        self.index = 0
+        return added
+
+    def give_back(self, volume):
+        "Account for volume (per channel) returned to the current well, e.g. by a blow out"
+        self.volumes[self.index] += volume * self.channels
+
+    def __repr__(self):
+        return '{}: {:.0f} ul, clearance {} mm, rate {:.2f}'.format(
+            self.well.well_name, self.remaining, self.clearance(), self.rate())
@@ -0,0 +1,31 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
+
+
+class FakeWell(SimpleNamespace):
+    "A source well as TrackedSource and Checkpoint see it"
+
+    def __init__(self, well_name):
+        super().__init__(well_name=well_name)
+
+    def bottom(self, z):
+        return (self.well_name, z)
+
+
+@pytest.fixture
+def wells():
+    "FakeWells A1, A2, ... by name"
+    return lambda *names: [FakeWell(name) for name in names]
+
+
+@pytest.fixture
+def pipette():
+    "A loaded pipette as plan_cycles sees it: no tipracks, so the pipette volume is the capacity"
+    return lambda max_volume=300, min_volume=20: SimpleNamespace(max_volume=max_volume, min_volume=min_volume, tip_racks=[])
@@ -0,0 +1,86 @@
+import ast
+import sys
+
+import pytest
+
+from elisa_ot2 import bundle
+from elisa_ot2.benchmark import default_scripts, script_key
+from elisa_ot2.simulation import run_protocol
+
+
+def steps(ctx):
+    return [(step.kind, step.pipette, round(step.volume, 6), str(step.target), step.height) for step in ctx.steps]
+
+
+class _NoPackage:
+    "Finder that fails every import of elisa_ot2, as on the robot"
+
+    def find_spec(self, name, path=None, target=None):
+        if name == 'elisa_ot2' or name.startswith('elisa_ot2.'):
+            raise ModuleNotFoundError('No module named {!r}'.format(name))
+        return None
+
+
+@pytest.mark.parametrize('path', default_scripts(), ids=script_key)
+def test_bundle_runs_without_the_package(path, tmp_path, monkeypatch):
+    text, stats = bundle.bundle(path)
+    out = tmp_path / 'bundle.py'
+    out.write_text(text)
+    expected = run_protocol(path)
+
+    for name in [name for name in sys.modules if name == 'elisa_ot2' or name.startswith('elisa_ot2.')]:
+        monkeypatch.delitem(sys.modules, name)
+    monkeypatch.setattr(sys, 'meta_path', [_NoPackage()] + sys.meta_path)
+    ctx = run_protocol(str(out))
+    assert steps(ctx) == steps(expected)
+    assert ctx.comments == expected.comments
+
+
+def test_bundle_is_flat():
+    path = [path for path in default_scripts() if script_key(path) == 'Multiple_Plates_Scripts/elisa-plate-prep-ot2.py'][0]
+    text, stats = bundle.bundle(path)
+    tree = ast.parse(text)
+    imported = [alias.name for node in ast.walk(tree) if isinstance(node, ast.Import) for alias in node.names]
+    imported += [node.module for node in ast.walk(tree) if isinstance(node, ast.ImportFrom)]
+    assert not [name for name in imported if name.startswith('elisa_ot2')]
+    defined = [node.name for node in tree.body if isinstance(node, (ast.FunctionDef, ast.ClassDef))]
+    # the script keeps its run, the protocol body it calls is renamed after its module
+    assert defined.count('run') == 1 and 'prep_run' in defined
+    # the tree shaker leaves out the command line tools and the stand-in simulator
+    assert 'main' not in defined and 'RecordingContext' not in defined
+    assert 'elisa_ot2.simulation' not in stats.modules and stats.kept < stats.total
+    assert stats.size < stats.original
+
+
+def _package(tmp_path, monkeypatch, modules, script):
+    "Bundle script with a package of its own (module name -> source), return the bundle"
+    package = tmp_path / 'elisa_ot2'
+    package.mkdir()
+    (package / '__init__.py').write_text('')
+    for name, source in modules.items():
+        (package / (name + '.py')).write_text(source)
+    (tmp_path / 'script.py').write_text(script)
+    monkeypatch.setattr(bundle, 'PACKAGE_DIR', str(package))
+    monkeypatch.setattr(bundle, 'script_key', str)
+    return bundle.bundle(str(tmp_path / 'script.py'))[0]
+
+
+def test_renames_leave_locals_alone(tmp_path, monkeypatch):
+    text = _package(tmp_path, monkeypatch, {
+        'first': 'LIMIT = 3\n\n\ndef run(plates):\n    return [plates for plates in range(plates)]\n',
+        'second': 'from . import first\n\n\ndef run(limit=None):\n    run = [limit or first.LIMIT]\n    return first.run(run[0])\n',
+    }, 'from elisa_ot2 import second\n\n\ndef run(protocol):\n    return second.run()\n')
+    assert 'def first_run(plates):' in text and 'def second_run(limit=None):' in text
+    # the local run of second.run stays run
+    assert 'run = [limit or LIMIT]\n    return first_run(run[0])' in text
+    namespace = {}
+    exec(compile(text, 'bundle', 'exec'), namespace)
+    assert namespace['run'](None) == [0, 1, 2]
+
+
+def test_hidden_global_is_an_error(tmp_path, monkeypatch):
+    with pytest.raises(ValueError, match='first.LIMIT would be LIMIT in the bundle, which a local name there hides'):
+        _package(tmp_path, monkeypatch, {
+            'first': 'LIMIT = 3\n',
+            'second': 'from . import first\n\n\ndef run(limit=None):\n    LIMIT = limit or first.LIMIT\n    return LIMIT\n',
+        }, 'from elisa_ot2 import second\n\n\ndef run(protocol):\n    return second.run()\n')
@@ -0,0 +1,107 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from elisa_ot2.checkpoint import Checkpoint
+
+RUN = {'number_plates': 3, 'plate_layout': 'layout'}
+
+
+def protocol(simulating=False):
+    return SimpleNamespace(is_simulating=lambda: simulating)
+
+
+def tip_rack(count):
+    rack_wells = ['tip {}'.format(number) for number in range(count)]
+    return SimpleNamespace(wells=lambda: rack_wells)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'checkpoint.json')
+
+
+def stopped_run(path, wells):
+    "A run that finished plate 1 and stopped in plate 2 after filling A1"
+    tube, = wells('D5')
+    pipette = SimpleNamespace(name='p300_single_gen2', channels=1)
+    checkpoint = Checkpoint(protocol(), path, RUN)
+    assert checkpoint.volume(tube, 1000.0) == 1000.0
+    for plate in (1, 2):
+        checkpoint.picked_up(pipette)
+        checkpoint.aspirated(tube, 120.0)
+        checkpoint.dispensed_into(plate, 'A1')
+        checkpoint.returned(tube, 20.0)
+        if plate == 1:
+            checkpoint.dispensed_into(plate, 'B1')
+            checkpoint.plate_done(plate)
+        else:
+            checkpoint.block_done()
+    return tube
+
+
+def test_save_and_resume(path, wells):
+    tube = stopped_run(path, wells)
+    with open(path) as checkpoint_file:
+        state = json.load(checkpoint_file)
+    assert state['plates_done'] == [1]
+    assert state['dispensed'] == {'2': ['A1']}
+
+    resumed = Checkpoint(protocol(), path, RUN, resume=True)
+    assert resumed.to_do(1, ['A1', 'B1']) == []
+    assert resumed.to_do(2, ['A1', 'B1']) == ['B1']
+    assert resumed.to_do(3, ['A1', 'B1']) == ['A1', 'B1']
+    assert resumed.volume(tube, 1000.0) == 800.0
+    assert 'plates 1 done, 1 wells of plate 2, p300_single_gen2 2 tips' in resumed.describe()
+
+    pipette = SimpleNamespace(name='p300_single_gen2', tip_racks=[tip_rack(96)], starting_tip=None)
+    resumed.start_tips(pipette)
+    assert pipette.starting_tip == 'tip 2'
+
+
+def test_steps_between_blocks_are_not_saved(path, wells):
+    tube, = wells('D5')
+    checkpoint = Checkpoint(protocol(), path, RUN)
+    checkpoint.volume(tube, 1000.0)
+    checkpoint.aspirated(tube, 100.0)
+    checkpoint.dispensed_into(1, 'A1')
+    with pytest.raises(FileNotFoundError):
+        open(path)
+    checkpoint.block_done()
+    with open(path) as checkpoint_file:
+        assert json.load(checkpoint_file)['volumes'] == {'D5': 900.0}
+
+
+def test_analysis_does_not_write(path, wells):
+    tube, = wells('D5')
+    checkpoint = Checkpoint(protocol(simulating=True), path, RUN)
+    checkpoint.volume(tube, 1000.0)
+    checkpoint.plate_done(1)
+    with pytest.raises(FileNotFoundError):
+        open(path)
+
+
+def test_resume_checks_the_run(path, wells):
+    stopped_run(path, wells)
+    with pytest.raises(ValueError, match='checkpoint of another run \\(plate_layout changed\\)'):
+        Checkpoint(protocol(), path, dict(RUN, plate_layout='other'), resume=True)
+    with pytest.raises(ValueError, match='resume needs the checkpoint file'):
+        Checkpoint(protocol(), None, RUN, resume=True)
+
+
+def test_resume_a_finished_run(path):
+    checkpoint = Checkpoint(protocol(), path, RUN)
+    for plate in (1, 2, 3):
+        checkpoint.plate_done(plate)
+    with pytest.raises(ValueError, match='every plate of the run is done'):
+        Checkpoint(protocol(), path, RUN, resume=True)
+
+
+def test_resumed_volumes_are_checked(path, wells):
+    stopped_run(path, wells)
+    resumed = Checkpoint(protocol(), path, RUN, resume=True)
+    source = SimpleNamespace(wells=wells('D5'), volumes=[40.0])
+    with pytest.raises(ValueError, match='The resumed run needs 10 ul more in D5'):
+        resumed.check_volumes([source], dead_volume=50.0)
+    resumed.check_volumes([source], dead_volume=40.0)
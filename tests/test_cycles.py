@@ -0,0 +1,42 @@
+import pytest
+
+from elisa_ot2.cycles import plan_cycles, plan_fills
+
+
+def test_dispenses_share_aspirations(pipette):
+    plan = plan_cycles(pipette(), ['A{}'.format(column) for column in range(1, 13)], 50)
+    # 280 ul of room next to the 20 ul disposal volume: 5 dispenses per aspiration
+    assert [len(cycle.dispenses) for cycle in plan.cycles] == [5, 5, 2]
+    assert plan.cycles[0].volume == 270
+    assert plan.volumes() == [270, 250, 100, -20]
+    assert [destination for cycle in plan.cycles for destination in cycle.destinations] == \
+        ['A{}'.format(column) for column in range(1, 13)]
+
+
+def test_large_dispenses_are_split(pipette):
+    plan = plan_cycles(pipette(), ['A1', 'B1'], 400)
+    assert [cycle.dispenses for cycle in plan.cycles] == [[('A1', 200.0)], [('A1', 200.0)], [('B1', 200.0)], [('B1', 200.0)]]
+    assert plan.per_cycle == 1
+
+
+def test_disposal_volume_must_leave_room(pipette):
+    with pytest.raises(ValueError, match='leaves no room'):
+        plan_cycles(pipette(), ['A1'], 10, disposal_volume=300)
+
+
+def test_fills_stream_through_the_tip(pipette):
+    plan = plan_fills(pipette(), [('A1', 150), ('B1', 150), ('C1', 100)])
+    dispensed = {}
+    for cycle in plan.cycles:
+        assert cycle.volume <= plan.capacity
+        for destination, volume in cycle.dispenses:
+            assert volume >= 20
+            dispensed[destination] = dispensed.get(destination, 0) + volume
+    assert dispensed == {'A1': 150, 'B1': 150, 'C1': 100}
+    assert len(plan.cycles) == 2
+
+
+def test_fill_parts_are_not_below_the_minimum(pipette):
+    # 280 ul of room: the 10 ul left after A1 would make a dispense too small for the pipette
+    plan = plan_fills(pipette(), [('A1', 270), ('B1', 30)])
+    assert [cycle.dispenses for cycle in plan.cycles] == [[('A1', 270)], [('B1', 30)]]
@@ -0,0 +1,52 @@
+import pytest
+
+from elisa_ot2.dilutions import recipe
+
+FACTORS = {'1/100': 100, '1/50': 50}
+
+
+def row(name, to, dilution, tube='A1'):
+    return {'name': name, 'origin_stock': '1', 'from': tube, 'to': to, 'dilution': dilution}
+
+
+def test_pool_is_found_from_shared_wells():
+    rows = [row('P1', 'A1 B1', '1/100', 'A1'), row('P2', 'A1 B1', '1/100', 'A2'), row('P3', 'C1', '1/50', 'A3')]
+    result = recipe(rows, FACTORS, 200.0)
+    wells = dict((well.well, well) for well in result.wells)
+    assert wells['A1'].pooled and wells['B1'].pooled
+    assert wells['A1'].components == ['P1', 'P2']
+    assert not wells['C1'].pooled
+    # the pool gets the diluent of the whole well once
+    assert wells['A1'].stock == pytest.approx(4.0)
+    assert wells['A1'].diluent == pytest.approx(196.0)
+    assert wells['C1'].diluent == pytest.approx(196.0)
+
+
+def test_components_keep_their_destinations():
+    rows = [row('P1', 'A1 B1', '1/100'), row('P2', 'C1', '1/50')]
+    components = recipe(rows, FACTORS, 100.0).components
+    assert [(component.name, component.destinations, component.volume) for component in components] == [
+        ('P1', ['A1', 'B1'], 1.0), ('P2', ['C1'], 2.0)]
+
+
+def test_diluent_rows_have_no_stock():
+    result = recipe([row('BLANK', 'H12', 'PBS')], FACTORS, 100.0)
+    assert result.components == []
+    assert result.wells[0].diluent == 100.0
+    assert result.wells[0].components == []
+
+
+@pytest.mark.parametrize('rows, options, message', [
+    ([row('P1', 'A1', '1/7')], {}, 'No dilution factor for 1/7'),
+    ([row('P1', 'A1', '1/100')], {'min_volume': 2.0}, 'less than the 2.0 ul'),
+    ([row('P1', 'A1', '1/100')], {'max_volume': 50.0}, 'do not fit'),
+])
+def test_invalid_recipes(rows, options, message):
+    with pytest.raises(ValueError, match=message):
+        recipe(rows, FACTORS, 100.0, **options)
+
+
+def test_overfull_pool():
+    rows = [row('P{}'.format(number), 'A1', '1/2') for number in range(3)]
+    with pytest.raises(ValueError, match='leave no room for the diluent'):
+        recipe(rows, {'1/2': 2}, 100.0)
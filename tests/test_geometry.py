@@ -0,0 +1,39 @@
+import pytest
+
+from elisa_ot2 import geometry
+
+
+@pytest.mark.parametrize('name', sorted(geometry.LABWARE_GEOMETRY))
+def test_height_volume_round_trip(name):
+    well = geometry.LABWARE_GEOMETRY[name]
+    for fraction in (0.01, 0.1, 0.25, 0.5, 0.9, 0.99):
+        volume = well.max_volume * fraction
+        assert well.volume(well.height(volume)) == pytest.approx(volume, rel=1e-6)
+
+
+def test_height_is_capped_at_the_well():
+    well = geometry.EPPENDORF_1_5ML
+    assert well.height(0) == 0.0
+    assert well.height(-5) == 0.0
+    assert well.height(well.max_volume * 2) == well.depth
+    assert well.volume(well.depth + 10) == well.max_volume
+
+
+def test_height_follows_the_cone_of_a_tube():
+    well = geometry.EPPENDORF_1_5ML
+    assert well.bottom_volume == pytest.approx(geometry.Frustum(1.8, 4.35, 17.8).volume(17.8))
+    assert well.height(well.bottom_volume) == pytest.approx(17.8, abs=0.01)
+    assert well.height(1000) > well.height(500) > well.height(100)
+
+
+def test_box_volume():
+    box = geometry.WellGeometry('box', [geometry.Box(10.0, 5.0, 20.0)])
+    assert box.max_volume == pytest.approx(1000.0)
+    assert box.height(500.0) == pytest.approx(10.0)
+
+
+def test_rate_calibration():
+    calibration = geometry.RateCalibration(1.0, 0.4)
+    assert calibration.rate(2.0) == 1.0
+    assert calibration.rate(0.5) == pytest.approx(0.7)
+    assert calibration.rate(-1.0) == pytest.approx(0.4)
@@ -0,0 +1,62 @@
+import pytest
+
+from elisa_ot2.layout import assign_plates, columns, expand_wells, parse_layout, plate_numbers, plate_transfers
+
+
+def test_plate_numbers():
+    assert plate_numbers('1-4,6') == [1, 2, 3, 4, 6]
+    assert plate_numbers('2') == [2]
+    assert plate_numbers(3) == [3]
+    assert plate_numbers([5, '7']) == [5, 7]
+
+
+@pytest.mark.parametrize('spec', ['-3', 'a', '1-4;6', ''])
+def test_plate_numbers_rejects_other_specs(spec):
+    with pytest.raises(ValueError, match='is not a plate range'):
+        plate_numbers(spec)
+
+
+def test_assign_plates():
+    assert assign_plates({'ONE': '1-4', 'TWO': '5-8'}, 6) == {'ONE': [1, 2, 3, 4], 'TWO': [5, 6]}
+
+
+def test_assign_plates_overlap():
+    with pytest.raises(ValueError, match='plate 4 gets both ONE and TWO'):
+        assign_plates({'ONE': '1-4', 'TWO': '4-8'}, 8)
+
+
+def test_assign_plates_missing_plate():
+    with pytest.raises(ValueError, match='plate 5 gets no ONE / TWO'):
+        assign_plates({'ONE': '1-4', 'TWO': '6-8'}, 8)
+
+
+def test_assign_plates_unknown_source():
+    with pytest.raises(ValueError, match='the source layout has no TWO'):
+        assign_plates({'ONE': '1-4', 'TWO': '5-8'}, 8, {'ONE': ['A1']})
+
+
+def test_csv_and_json_layouts_agree():
+    grid = parse_layout(',1,2\nA,S1,S2\nB,S1,CS\n')
+    listed = parse_layout('{"S1": ["A1", "B1"], "S2": "A2", "CS": ["B2"]}')
+    assert grid == listed
+    assert list(grid) == ['S1', 'S2', 'CS']
+
+
+def test_well_in_two_labels():
+    with pytest.raises(ValueError, match='well A1 is in the layout twice'):
+        parse_layout('{"S1": ["A1:A2"], "S2": ["A1"]}')
+
+
+def test_ranges_and_columns():
+    assert expand_wells('A1:B2') == ['A1', 'A2', 'B1', 'B2']
+    assert columns(expand_wells('A11:H12') + ['C3']) == [3, 11, 12]
+
+
+def test_numbered_samples_move_with_the_plate():
+    plate_map = parse_layout('{"S1": ["A1:A2"], "S2": ["B1:B2"], "CS": ["H12"]}')
+    sources = parse_layout('{"S1": "A1", "S2": "A2", "S3": "A3", "S4": "A4", "CS": ["D5", "D6"]}')
+    transfers = plate_transfers(plate_map, sources, 2)
+    assert [(transfer.label, transfer.source, transfer.sources) for transfer in transfers] == [
+        ('S1', 'S3', ['A3']), ('S2', 'S4', ['A4']), ('CS', 'CS', ['D5', 'D6'])]
+    with pytest.raises(ValueError, match='plate 3 needs S1 but the source layout has no S5'):
+        plate_transfers(plate_map, sources, 3)
@@ -0,0 +1,36 @@
+import pytest
+
+from elisa_ot2.packing import _behind, _distance, fixed_deck, pack_deck
+
+
+def test_fixed_deck():
+    plan = fixed_deck(4, tipracks=2, sources=2)
+    assert plan.plates == ('1', '2', '3', '4')
+    assert plan.tipracks == ('10', '9')
+    assert plan.sources == ('11', '8')
+
+
+def test_pack_deck_uses_distinct_slots():
+    plan = pack_deck(8, tipracks=2, sources=1)
+    slots = plan.plates + plan.tipracks + plan.sources
+    assert len(set(slots)) == 11 and '12' not in slots
+    assert list(plan.plates) == sorted(plan.plates, key=int)
+
+
+def test_plates_surround_the_source():
+    plan = pack_deck(4)
+    source = plan.sources[0]
+    others = [slot for slot in map(str, range(1, 12)) if slot not in plan.plates + plan.sources]
+    assert max(_distance(slot, source) for slot in plan.plates) <= min(_distance(slot, source) for slot in others)
+
+
+def test_keep_behind_clear():
+    plan = pack_deck(3, tipracks=2, keep_behind_clear=True)
+    tall = set(plan.tipracks + plan.sources)
+    assert not any(_behind(slot) in tall for slot in plan.plates)
+
+
+@pytest.mark.parametrize('deck', [pack_deck, fixed_deck])
+def test_no_room(deck):
+    with pytest.raises(ValueError, match='10 plates, 1 tipracks and 1 sources do not fit on the deck'):
+        deck(10)
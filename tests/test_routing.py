@@ -0,0 +1,42 @@
+import itertools
+
+import pytest
+
+from elisa_ot2.routing import _two_opt, plan_route, route_length, tour_length, trip_sizes
+
+GRID = dict(('{}{}'.format(row, column), (column * 9.0, -'ABCDEFGH'.index(row) * 9.0))
+            for row in 'ABCDEFGH' for column in range(1, 13))
+
+
+def test_trip_sizes():
+    assert trip_sizes(10, 4) == [4, 4, 2]
+    assert trip_sizes(8, 4) == [4, 4]
+
+
+def test_two_opt_uncrosses_a_tour():
+    positions = {'a': (0, 10), 'b': (10, 0), 'c': (10, 10), 'd': (0, 0)}
+    crossed = ['a', 'b', 'c', 'd']
+    tour = _two_opt((-5, 5), crossed, positions)
+    assert sorted(tour) == sorted(crossed)
+    assert tour_length((-5, 5), [positions[name] for name in tour]) < \
+        tour_length((-5, 5), [positions[name] for name in crossed])
+
+
+def test_small_route_is_optimal():
+    positions = dict(itertools.islice(GRID.items(), 6))
+    depot = (-30.0, 20.0)
+    best = min(route_length(depot, positions, list(order), [3, 3]) for order in itertools.permutations(positions))
+    assert route_length(depot, positions, plan_route(depot, positions, [3, 3]), [3, 3]) == pytest.approx(best)
+
+
+def test_route_is_never_longer_than_reading_order():
+    depot = (150.0, 60.0)
+    sizes = trip_sizes(len(GRID), 5)
+    order = plan_route(depot, GRID, sizes)
+    assert sorted(order) == sorted(GRID)
+    assert route_length(depot, GRID, order, sizes) <= route_length(depot, GRID, list(GRID), sizes)
+
+
+def test_trip_sizes_must_cover_the_wells():
+    with pytest.raises(ValueError, match='trip sizes add up to 4 but there are 96 wells'):
+        plan_route((0, 0), GRID, [4])
@@ -0,0 +1,48 @@
+import json
+from types import SimpleNamespace
+
+from elisa_ot2 import runlog
+from elisa_ot2.runlog import RunLog
+
+
+def protocol(simulating=False):
+    comments = []
+    return SimpleNamespace(is_simulating=lambda: simulating, comment=comments.append, comments=comments)
+
+
+def test_debug_file_is_written_a_plate_at_a_time(tmp_path):
+    path = tmp_path / 'debug.jsonl'
+    path.write_text('the last run\n')
+    log = RunLog(protocol(), 'DEBUG', str(path))
+    log.debug('aspirations', 1, well='A1', volume=100.0)
+    assert path.read_text() == 'the last run\n'
+    log.plate_done(1)
+    log.debug('dispenses', 2, well='B1', volume=50.0)
+    log.plate_done(2)
+    events = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [(event['event'], event['plate']) for event in events] == [('aspirations', 1), ('dispenses', 2)]
+    assert log.protocol.comments == ['PLATE 1: 1 aspirations (100 ul)', 'PLATE 2: 1 dispenses (50 ul)']
+
+
+def test_long_plates_are_flushed(tmp_path, monkeypatch):
+    monkeypatch.setattr(runlog, 'FLUSH_EVENTS', 3)
+    path = tmp_path / 'debug.jsonl'
+    log = RunLog(protocol(), 'DEBUG', str(path))
+    for number in range(4):
+        log.debug('dispenses', 1, well='A{}'.format(number + 1))
+    assert len(path.read_text().splitlines()) == 3
+
+
+def test_analysis_leaves_the_file_alone(tmp_path):
+    path = tmp_path / 'debug.jsonl'
+    path.write_text('the last run\n')
+    log = RunLog(protocol(simulating=True), 'DEBUG', str(path))
+    log.debug('aspirations', 1, well='A1', volume=100.0)
+    log.plate_done(1)
+    assert path.read_text() == 'the last run\n'
+
+
+def test_debug_comments_without_a_file():
+    log = RunLog(protocol(), 'DEBUG')
+    log.debug('aspirations', 1, well='A1')
+    assert log.protocol.comments == ['DEBUG: {"n":1,"event":"aspirations","plate":1,"well":"A1"}']
@@ -0,0 +1,69 @@
+import pytest
+
+from elisa_ot2.geometry import EPPENDORF_1_5ML, NEST_12_RESERVOIR_15ML
+from elisa_ot2.tracking import TrackedSource, split_pool
+
+
+def test_pool_fails_over_to_the_next_well(wells):
+    source = TrackedSource(wells('D5', 'D6'), 1000, EPPENDORF_1_5ML.height, reserve=50)
+    schedule = source.plan([300, 300, 300, 300])
+    assert [aspiration.well.well_name for aspiration in schedule] == ['D5', 'D5', 'D5', 'D6']
+    assert schedule[3].previous.well_name == 'D5'
+    assert source.volumes == [100, 700]
+
+
+def test_failover_carries_what_is_left(wells):
+    source = TrackedSource(wells('D5', 'D6'), 400, EPPENDORF_1_5ML.height)
+    schedule = source.plan([300, 300], carry_over=True)
+    assert schedule[1].carried == 100
+    assert source.volumes == [0.0, 200]
+
+
+def test_clearance_follows_the_liquid(wells):
+    source = TrackedSource(wells('A1'), 1400, EPPENDORF_1_5ML.height, immersion_depth=2, min_clearance=1)
+    schedule = source.plan([200] * 7)
+    clearances = [aspiration.clearance for aspiration in schedule]
+    assert clearances == sorted(clearances, reverse=True)
+    assert clearances[0] == round(EPPENDORF_1_5ML.height(1400) - 2, 1)
+    # an empty tube: the tip stays min_clearance above the bottom
+    assert source.clearance() == 1
+
+
+def test_empty_pool(wells):
+    source = TrackedSource(wells('A1'), 100, EPPENDORF_1_5ML.height)
+    source.take(100)
+    with pytest.raises(ValueError, match='No source left'):
+        source.switch()
+
+
+def test_blow_out_goes_back_to_the_well(wells):
+    source = TrackedSource(wells('A1'), 1000, EPPENDORF_1_5ML.height)
+    source.plan([270, 250, -20])
+    assert source.remaining == 500
+
+
+def test_split_pool():
+    assert split_pool([5000, 5000, 5000], 15000, reserve=1000) == [11000, 6000]
+    # a multichannel takes 8 times the volume per channel from a trough
+    assert split_pool([100, 100], 15000, channels=8) == [1600]
+    with pytest.raises(ValueError, match='do not fit'):
+        split_pool([16000], 15000)
+
+
+def test_split_fills_only_what_the_schedule_takes(wells):
+    # 4800 ul per aspiration of 8 channels: two aspirations per trough
+    source = TrackedSource.split(wells('A1', 'A2', 'A3'), [600] * 4, 15000, NEST_12_RESERVOIR_15ML.height,
+                                 reserve=1000, channels=8)
+    assert source.volumes == [10600.0, 10600.0, 0.0]
+    source.plan([600] * 4)
+    assert source.volumes == [1000.0, 1000.0, 0.0]
+    with pytest.raises(ValueError, match='need 2 wells of 15000 ul but the pool has 1'):
+        TrackedSource.split(wells('A1'), [600] * 4, 15000, NEST_12_RESERVOIR_15ML.height, reserve=1000, channels=8)
+
+
+def test_refill_tops_up_and_starts_over(wells):
+    source = TrackedSource(wells('D5', 'D6'), [100, 700], EPPENDORF_1_5ML.height)
+    source.index = 1
+    assert source.refill([1000, 500]) == [900, 0.0]
+    assert source.volumes == [1000, 700]
+    assert source.index == 0